@@ -2,7 +2,8 @@ import argparse
 from tiktok_uploader import tiktok, Video
 from tiktok_uploader.basics import eprint
 from tiktok_uploader.Config import Config
-from tiktok_uploader.VideoEditor import VideoEditor
+from tiktok_uploader.VideoEditor import VideoEditor, PREVIEW_HEIGHT, PREVIEW_SECONDS, PREVIEW_FRAMES
+from tiktok_uploader.encode_profiles import PROFILES
 import sys, os
 
 if __name__ == "__main__":
@@ -29,6 +30,7 @@ if __name__ == "__main__":
     upload_parser.add_argument("-bc", "--brandcontent", type=int, default=0)
     upload_parser.add_argument("-ai", "--ailabel", type=int, default=0)
     upload_parser.add_argument("-p", "--proxy", default="")
+    upload_parser.add_argument("--profile", choices=sorted(PROFILES), help="Encode profile of downloaded videos, defaults to ENCODE_PROFILE in config")
 
     # Video editing options
     upload_parser.add_argument("--audio", help="Path to audio file to add")
@@ -62,6 +64,11 @@ if __name__ == "__main__":
     edit_parser.add_argument("-t", "--text", help="Text to add to video")
     edit_parser.add_argument("-tc", "--text-color", default="white", help="Text color")
     edit_parser.add_argument("-ts", "--text-size", type=int, default=70, help="Text font size")
+    edit_parser.add_argument("--profile", choices=sorted(PROFILES), help="Encode profile: preview, fast-batch, balanced or quality, defaults to ENCODE_PROFILE in config")
+    edit_parser.add_argument("-p", "--preview", choices=["clip", "sheet"], help="Only render a preview into the previews directory: a short low resolution clip, or a contact sheet image of key frames")
+    edit_parser.add_argument("--preview-height", type=int, default=PREVIEW_HEIGHT, help="Height of the preview clip (stills of the sheet are half of it)")
+    edit_parser.add_argument("--preview-seconds", type=float, default=PREVIEW_SECONDS, help="Length of the preview clip (seconds)")
+    edit_parser.add_argument("--preview-frames", type=int, default=PREVIEW_FRAMES, help="Number of stills of the contact sheet")
 
     # Show subcommand
     show_parser = subparsers.add_parser("show", help="Show users and videos available for system.")
@@ -91,7 +98,7 @@ if __name__ == "__main__":
             sys.exit(1)
 
         if args.youtube:
-            video_obj = Video(args.youtube, args.title)
+            video_obj = Video(args.youtube, args.title, profile=args.profile)
             video_obj.is_valid_file_format()
             video = video_obj.source_ref
             args.video = video
@@ -162,10 +169,22 @@ if __name__ == "__main__":
                     print("[-] Error adding text")
                     sys.exit(1)
             
+            if args.preview:
+                # Previews go to their own directory so they are never uploaded
+                name = os.path.splitext(args.output)[0] + (".jpg" if args.preview == "sheet" else ".mp4")
+                preview_path = os.path.join(os.getcwd(), Config.get().preview_dir, f"preview-{name}")
+                print(f"[-] Saving {args.preview} preview to: {preview_path}")
+                if not editor.preview(preview_path, mode=args.preview, height=args.preview_height,
+                                      seconds=args.preview_seconds, frames=args.preview_frames):
+                    print("[-] Error rendering preview")
+                    sys.exit(1)
+                print("[-] Preview completed successfully!")
+                sys.exit(0)
+
             # Save edited video to videos directory
             output_path = os.path.join(os.getcwd(), Config.get().videos_dir, args.output)
             print(f"[-] Saving edited video to: {output_path}")
-            if not editor.save(output_path):
+            if not editor.save(output_path, profile=args.profile):
                 print("[-] Error saving edited video")
                 sys.exit(1)
             print("[-] Video editing completed successfully!")
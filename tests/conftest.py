@@ -0,0 +1,49 @@
+import os
+import subprocess
+
+import pytest
+
+from tiktok_uploader.Config import Config
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def default_config(tmp_path, monkeypatch):
+    """Default Config, with the caches and scratch directories it points to inside tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Config, "_instance", None)
+    return Config.get()
+
+
+@pytest.fixture
+def ffmpeg():
+    imageio_ffmpeg = pytest.importorskip("imageio_ffmpeg")
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+@pytest.fixture
+def tone(tmp_path, ffmpeg):
+    """2.04s sine, a length the videos and loops of the tests are not multiples of"""
+    path = tmp_path / "tone.mp3"
+    subprocess.run([ffmpeg, "-loglevel", "error", "-y", "-f", "lavfi",
+                    "-i", "sine=frequency=440:duration=2.04", str(path)], check=True)
+    return str(path)
+
+
+@pytest.fixture
+def sample_video(tmp_path, ffmpeg):
+    """6s 320x568 H.264/AAC test pattern with a key frame every second"""
+    path = tmp_path / "sample.mp4"
+    subprocess.run([ffmpeg, "-loglevel", "error", "-y",
+                    "-f", "lavfi", "-i", "testsrc=size=320x568:rate=30:duration=6",
+                    "-f", "lavfi", "-i", "sine=frequency=220:duration=6",
+                    "-c:v", "libx264", "-g", "30", "-c:a", "aac", "-shortest", str(path)], check=True)
+    return str(path)
+
+
+@pytest.fixture
+def font(monkeypatch):
+    """Text edits use the repository font whatever the working directory"""
+    from tiktok_uploader import VideoEditor as video_editor
+    monkeypatch.setattr(video_editor, "TEXT_FONT", os.path.join(REPO_DIR, video_editor.TEXT_FONT))
@@ -0,0 +1,132 @@
+import threading
+import time
+
+import pytest
+
+from tiktok_uploader import main, tiktok
+from tiktok_uploader.async_upload import AsyncUploadEngine
+from tiktok_uploader.scheduler import PostScheduler
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    return PostScheduler(path=str(tmp_path / "post_schedule.json"))
+
+
+class _Uploads:
+    """Blocking fake upload recording which accounts were busy at the same time"""
+
+    def __init__(self, duration=0.05, result=None):
+        self.duration = duration
+        self.result = result
+        self.busy = set()
+        self.overlaps = []
+        self.accounts = []
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, account):
+        with self._lock:
+            if account in self.busy:
+                self.overlaps.append(account)
+            self.busy.add(account)
+            self.accounts.append(account)
+            self.peak = max(self.peak, len(self.busy))
+        time.sleep(self.duration)
+        with self._lock:
+            self.busy.discard(account)
+        return self.result
+
+
+def _job(uploads):
+    async def job(engine):
+        async with engine.reserve() as slot:
+            slot.result = await engine.call(uploads, slot.account)
+        return slot.account
+    return job
+
+
+def test_accounts_upload_concurrently_one_video_each(scheduler):
+    uploads = _Uploads()
+    engine = AsyncUploadEngine(["a", "b"], max_concurrency=4, scheduler=scheduler)
+    assert engine.max_concurrency == 2
+
+    started = time.monotonic()
+    results = engine.run([_job(uploads) for _ in range(6)])
+    assert time.monotonic() - started < 6 * uploads.duration
+    assert sorted(results) == ["a", "a", "a", "b", "b", "b"]
+    assert uploads.peak == 2
+    assert uploads.overlaps == []
+
+
+def test_failed_attempt_cools_the_account_down(scheduler):
+    engine = AsyncUploadEngine(["a"], scheduler=scheduler)
+    engine.run([_job(_Uploads(duration=0, result="You are posting too fast"))])
+    assert scheduler.ready_at("a") > time.time() + 60
+
+
+def test_cooldown_is_awaited_without_holding_a_thread(scheduler):
+    scheduler.record("a", "Posting too fast, try again in 1 second")
+    uploads = _Uploads(duration=0.2)
+    engine = AsyncUploadEngine(["a", "b"], scheduler=scheduler)
+
+    started = time.monotonic()
+    results = engine.run([_job(uploads), _job(uploads)])
+    # b uploads while a waits for its cooldown
+    assert sorted(results) == ["a", "b"]
+    assert time.monotonic() - started < 1.5
+
+
+def test_failing_job_does_not_stop_the_others(scheduler):
+    async def broken(engine):
+        async with engine.reserve() as slot:
+            await engine.call(lambda: 1 / 0)
+
+    engine = AsyncUploadEngine(["a", "b"], scheduler=scheduler)
+    results = engine.run([broken, _job(_Uploads(duration=0))])
+    assert results[0] is False and results[1] in ("a", "b")
+    # The exception counts as a failed upload of the account
+    assert sum(scheduler._state[account]["failures"] for account in "ab") == 1
+
+
+@pytest.fixture
+def videos(tmp_path, scheduler, monkeypatch):
+    videos_dir = tmp_path / "VideosDirPath"
+    videos_dir.mkdir()
+    for room_id in range(5):
+        (videos_dir / f"{room_id}_Ha Noi_3500000.mp4").write_bytes(b"video")
+    monkeypatch.setattr(main, "get_cookie_files", lambda: ["a", "b"])
+    monkeypatch.setattr(main, "get_post_scheduler", lambda: scheduler)
+    monkeypatch.setattr(main, "cleanup_after_upload", lambda should_archive=True: True)
+    return videos_dir
+
+
+def test_upload_videos_to_tiktok_runs_on_the_engine(videos, monkeypatch):
+    uploads = _Uploads()
+    titles = []
+
+    def upload_video(session_user, video, title, **kwargs):
+        titles.append(title)
+        return uploads(session_user)
+
+    monkeypatch.setattr(tiktok, "upload_video", upload_video)
+    assert main.upload_videos_to_tiktok(concurrency=2, batch_size=1)
+    assert len(uploads.accounts) == 5
+    assert set(uploads.accounts) == {"a", "b"}
+    assert uploads.overlaps == []
+    assert all(title.startswith("Mã phòng") for title in titles)
+
+
+@pytest.mark.parametrize("concurrency", [1, 2])
+def test_invalid_parameters_retries_without_hashtags(videos, monkeypatch, concurrency):
+    titles = []
+
+    def upload_video(session_user, video, title, **kwargs):
+        titles.append(title)
+        return "Invalid parameters" if "#" in title else None
+
+    monkeypatch.setattr(tiktok, "upload_video", upload_video)
+    for video in list(videos.iterdir())[1:]:
+        video.unlink()
+    assert main.upload_videos_to_tiktok(concurrency=concurrency, batch_size=1)
+    assert len(titles) == 2 and "#" not in titles[1]
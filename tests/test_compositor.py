@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from moviepy import VideoClip
+
+from tiktok_uploader.compositor import StaticOverlay, composite_static, resolve_position
+
+
+def _overlay_rgba(alpha, size=(2, 2), color=(200, 100, 0)):
+    rgba = np.zeros((size[1], size[0], 4), dtype=np.uint8)
+    rgba[:, :, :3] = color
+    rgba[:, :, 3] = alpha
+    return rgba
+
+
+def _reference(frame, rgba, x, y, opacity=1.0):
+    """Straight alpha blending of `rgba` at (x, y), computed on the whole frame"""
+    expected = frame.astype(np.float64)
+    h, w = rgba.shape[:2]
+    alpha = rgba[:, :, 3:4] / 255.0 * opacity
+    expected[y:y + h, x:x + w] = rgba[:, :, :3] * alpha + expected[y:y + h, x:x + w] * (1 - alpha)
+    return np.rint(expected).astype(np.uint8)
+
+
+@pytest.mark.parametrize("position, expected", [
+    ("center", (3, 4)),
+    (("left", "bottom"), (0, 8)),
+    (("right", "top"), (6, 0)),
+    ((1.4, 2), (1, 2)),
+])
+def test_resolve_position(position, expected):
+    assert resolve_position(position, (10, 10), (4, 2)) == expected
+
+
+@pytest.mark.parametrize("opacity", [1.0, 0.5])
+def test_blend_matches_alpha_blending(opacity):
+    frame = np.arange(8 * 6 * 3, dtype=np.uint8).reshape(6, 8, 3)
+    rgba = _overlay_rgba(128, size=(4, 2))
+    rgba[0, 0, 3] = 0
+    rgba[1, 3, 3] = 255
+    expected = _reference(frame, rgba, 1, 3, opacity)
+    StaticOverlay(rgba, position=(1, 3), opacity=opacity).blend(frame)
+    assert np.abs(frame.astype(int) - expected).max() <= 1
+
+
+def test_overlay_is_clipped_to_the_frame():
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    StaticOverlay(_overlay_rgba(255, size=(3, 3)), position=(2, -1)).blend(frame)
+    assert (frame[:2, 2:] == (200, 100, 0)).all()
+    assert not frame[2:].any() and not frame[:, :2].any()
+
+    outside = np.zeros((4, 4, 3), dtype=np.uint8)
+    StaticOverlay(_overlay_rgba(255), position=(10, 10)).blend(outside)
+    assert not outside.any()
+
+
+def test_read_only_frames_are_copied_before_blending():
+    source = np.full((6, 8, 3), 50, dtype=np.uint8)
+    source.flags.writeable = False
+    clip = VideoClip(lambda t: source, duration=2)
+    overlays = [StaticOverlay(_overlay_rgba(255), position=(0, 0), start=0, end=1),
+                StaticOverlay(_overlay_rgba(255, color=(0, 0, 255)), position=(6, 4), start=1)]
+    composited = composite_static(clip, overlays)
+
+    first = composited.get_frame(0.5)
+    assert (first[:2, :2] == (200, 100, 0)).all() and (first[4:, 6:] == 50).all()
+    second = composited.get_frame(1.5)
+    assert (second[:2, :2] == 50).all() and (second[4:, 6:] == (0, 0, 255)).all()
+    # The decoder's buffer is left untouched
+    assert (source == 50).all()
+
+
+def test_no_overlays_keeps_the_clip():
+    clip = VideoClip(lambda t: np.zeros((2, 2, 3), dtype=np.uint8), duration=1)
+    assert composite_static(clip, []) is clip
@@ -0,0 +1,94 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from tiktok_uploader.download_cache import DownloadStore
+
+
+class _Origin(BaseHTTPRequestHandler):
+    """Serves `content` with an ETag, honours If-None-Match and records every request"""
+    content = b""
+    etag = ""
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(self.content)))
+        self.end_headers()
+        self.wfile.write(self.content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def origin():
+    _Origin.content, _Origin.etag, _Origin.requests = b"first version", '"v1"', []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Origin)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield _Origin, f"http://127.0.0.1:{server.server_address[1]}/video.mp4"
+    server.shutdown()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DownloadStore(root=str(tmp_path / "store"), max_bytes=1024)
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_unchanged_url_is_revalidated_and_linked(origin, store, tmp_path):
+    handler, url = origin
+    session = requests.Session()
+    first = store.fetch(url, str(tmp_path / "a.mp4"), session=session)
+    second = store.fetch(url, str(tmp_path / "b.mp4"), session=session)
+
+    assert first["cached"] is False and second["cached"] is True
+    assert _read(tmp_path / "b.mp4") == b"first version"
+    assert handler.requests == [None, '"v1"']
+
+
+def test_changed_url_is_downloaded_with_a_single_request(origin, store, tmp_path):
+    handler, url = origin
+    session = requests.Session()
+    store.fetch(url, str(tmp_path / "a.mp4"), session=session)
+    handler.content, handler.etag = b"second version", '"v2"'
+    result = store.fetch(url, str(tmp_path / "b.mp4"), session=session)
+
+    assert result["cached"] is False
+    assert _read(tmp_path / "b.mp4") == b"second version"
+    # One conditional request, answered with the new content
+    assert handler.requests == [None, '"v1"']
+    assert store.lookup(url)["etag"] == '"v2"'
+
+
+def test_identical_content_is_stored_once(origin, store, tmp_path):
+    _, url = origin
+    session = requests.Session()
+    store.fetch(url, str(tmp_path / "a.mp4"), session=session)
+    store.fetch(url + "?copy=1", str(tmp_path / "b.mp4"), session=session)
+    assert len(os.listdir(store.objects_dir)) == 1
+
+
+def test_evicts_least_recently_used_objects(origin, tmp_path):
+    handler, url = origin
+    store = DownloadStore(root=str(tmp_path / "store"), max_bytes=30)
+    session = requests.Session()
+    for version in range(3):
+        handler.content, handler.etag = f"version {version} padded".encode(), f'"v{version}"'
+        store.fetch(f"{url}?v={version}", str(tmp_path / f"{version}.mp4"), session=session)
+    assert store.lookup(f"{url}?v=0") is None
+    assert store.lookup(f"{url}?v=2") is not None
@@ -0,0 +1,55 @@
+import pytest
+
+from tiktok_uploader.Config import Config
+from tiktok_uploader.encode_profiles import (DEFAULT_PROFILE, PROFILES, ffmpeg_args, get_profile,
+                                             write_videofile_kwargs)
+
+
+def test_default_profile_comes_from_the_config():
+    assert get_profile() == (DEFAULT_PROFILE, PROFILES[DEFAULT_PROFILE])
+
+
+def test_config_selects_the_profile(tmp_path):
+    path = tmp_path / "config.txt"
+    path.write_text("ENCODE_PROFILE= preview\n")
+    Config.load(str(path))
+    assert get_profile()[0] == "preview"
+    # An explicit name (--profile) wins over the config
+    assert get_profile("quality")[0] == "quality"
+
+
+def test_unknown_profile_falls_back_to_the_default(capsys):
+    assert get_profile("ludicrous") == (DEFAULT_PROFILE, PROFILES[DEFAULT_PROFILE])
+    assert "ludicrous" in capsys.readouterr().out
+
+
+def test_ffmpeg_args():
+    assert ffmpeg_args(PROFILES["preview"], fps=30) == [
+        "-c:v", "libx264", "-preset", "ultrafast", "-crf", "32", "-tune", "fastdecode",
+        "-g", "30", "-threads", "2", "-movflags", "+faststart"]
+    # No tune, no fps to derive the GOP from, every core
+    assert ffmpeg_args(PROFILES["balanced"]) == [
+        "-c:v", "libx264", "-preset", "medium", "-crf", "23", "-movflags", "+faststart"]
+
+
+@pytest.mark.parametrize("profile, fps, threads, expected", [
+    ("fast-batch", 25, None, 2),
+    ("fast-batch", 25, 6, 6),
+    ("quality", 25, None, None),
+    ("quality", 25, 3, 3),
+])
+def test_explicit_threads_win_over_the_profile(profile, fps, threads, expected):
+    kwargs = write_videofile_kwargs(PROFILES[profile], fps=fps, threads=threads)
+    assert kwargs["threads"] == expected
+    assert kwargs["preset"] == PROFILES[profile]["preset"]
+    args = ffmpeg_args(PROFILES[profile], fps, threads)
+    if expected:
+        assert args[args.index("-threads") + 1] == str(expected)
+    else:
+        assert "-threads" not in args
+
+
+def test_write_videofile_kwargs_carry_the_x264_options():
+    kwargs = write_videofile_kwargs(PROFILES["quality"], fps=29.97)
+    assert kwargs["codec"] == "libx264" and kwargs["audio_codec"] == "aac"
+    assert kwargs["ffmpeg_params"] == ["-crf", "18", "-tune", "film", "-g", "60", "-movflags", "+faststart"]
@@ -0,0 +1,59 @@
+import pytest
+
+from tiktok_uploader import encode_profiles, ffmpeg_render
+
+TEXT = {"op": "text", "text": "hi", "font": "font.ttf", "fontsize": 70, "color": "white",
+        "stroke_color": "black", "stroke_width": 2, "y_ratio": 0.2}
+MUSIC = {"op": "audio", "path": "music.mp3", "volume": 0.5}
+
+
+def _graph(command):
+    return command[command.index("-filter_complex") + 1]
+
+
+def test_text_is_overlaid_from_the_rasterised_image():
+    edits = [{"op": "speed", "factor": 1.5}, TEXT, MUSIC]
+    command = ffmpeg_render.build_command("in.mp4", edits, "out.mp4", duration=4, fps=30, has_audio=True,
+                                          text_image="text.png", profile=encode_profiles.PROFILES["balanced"])
+    assert command[command.index("-i") + 1:][:3] == ["in.mp4", "-i", "text.png"]
+    graph = _graph(command)
+    assert "drawtext" not in graph
+    assert "[0:v]setpts=PTS/1.5[base];[base][1:v]overlay=x=(W-w)/2:y=H*0.2[v]" in graph
+    # The music comes after the text image
+    assert "[2:a]volume=0.5,atrim=0:4.000" in graph
+
+
+def test_music_input_without_text():
+    command = ffmpeg_render.build_command("in.mp4", [MUSIC], "out.mp4", duration=4, fps=30, has_audio=True,
+                                          profile=encode_profiles.PROFILES["balanced"])
+    assert "[1:a]volume=0.5" in _graph(command)
+
+
+def test_preview_scales_after_the_text():
+    command = ffmpeg_render.build_command("in.mp4", [TEXT], "out.mp4", duration=4, fps=30, has_audio=False,
+                                          text_image="text.png", profile=encode_profiles.PROFILES["preview"],
+                                          height=360)
+    assert _graph(command).endswith("overlay=x=(W-w)/2:y=H*0.2,scale=-2:360[v]")
+
+
+def test_contact_sheet_decodes_key_frames_only():
+    command = ffmpeg_render.build_contact_sheet_command("in.mp4", [TEXT], "sheet.jpg", duration=12,
+                                                        text_image="text.png", frames=6, columns=3)
+    assert command[command.index("-skip_frame"):command.index("-skip_frame") + 4] == \
+        ["-skip_frame", "nokey", "-i", "in.mp4"]
+    assert _graph(command).endswith("tile=3x2:padding=4:margin=4[v]")
+    assert "[base][1:v]overlay" in _graph(command)
+
+
+@pytest.mark.parametrize("edits, source_info, target_size, expected", [
+    ([], {"video_codec": "h264", "audio_codec": "aac", "size": (720, 1280)}, (720, 1280), "copy"),
+    ([], {"video_codec": "h264", "audio_codec": None}, None, "copy"),
+    ([], {"video_codec": "h264", "audio_codec": "opus"}, None, "audio"),
+    ([MUSIC], {"video_codec": "h264", "audio_codec": "aac"}, None, "audio"),
+    ([TEXT], {"video_codec": "h264", "audio_codec": "aac"}, None, "full"),
+    ([{"op": "speed", "factor": 1.2}], {"video_codec": "h264", "audio_codec": "aac"}, None, "full"),
+    ([], {"video_codec": "hevc", "audio_codec": "aac"}, None, "full"),
+    ([], {"video_codec": "h264", "audio_codec": "aac", "size": (1080, 1920)}, (720, 1280), "full"),
+])
+def test_plan_encode(edits, source_info, target_size, expected):
+    assert ffmpeg_render.plan_encode(edits, source_info, target_size) == expected
@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+
+from tiktok_uploader import jobs
+from tiktok_uploader.jobs import JobStore, Quota
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(path=str(tmp_path / "jobs.sqlite3"), lease_seconds=60, max_attempts=2)
+    store.add_rooms([{"id": 1}, {"id": 2}])
+    yield store
+    store.close()
+
+
+def test_rooms_are_queued_once(store):
+    assert store.add_rooms([{"id": 2}, {"id": 3}]) == 1
+    assert store.summary() == {jobs.PENDING: 3}
+
+
+def test_a_leased_job_is_not_claimed_twice(store):
+    first = store.claim(jobs.PENDING, "worker-1")
+    second = store.claim(jobs.PENDING, "worker-2")
+    assert first["room_id"] != second["room_id"]
+    assert store.claim(jobs.PENDING, "worker-3") is None
+    assert store.count(jobs.PENDING, leased=True) == 2
+
+
+def test_expired_lease_is_claimable_again(store, monkeypatch):
+    job = store.claim(jobs.PENDING, "crashed")
+    store.claim(jobs.PENDING, "crashed")
+    now = time.time()
+    monkeypatch.setattr(jobs.time, "time", lambda: now + 61)
+    assert store.claim(jobs.PENDING, "worker")["room_id"] == job["room_id"]
+
+
+def test_reset_leases_frees_every_job(store):
+    store.claim(jobs.PENDING, "crashed")
+    store.reset_leases()
+    assert store.count(jobs.PENDING, leased=False) == 2
+
+
+def test_advance_moves_to_the_next_state(store):
+    job = store.claim(jobs.PENDING, "worker")
+    assert store.advance(job["room_id"], input_path="in.mp4", ignored="x") == jobs.DOWNLOADED
+    job = store.claim(jobs.DOWNLOADED, "worker")
+    assert job["input_path"] == "in.mp4"
+    assert job["room"] == {"id": job["room"]["id"]}
+
+
+def test_job_fails_after_max_attempts(store):
+    job = store.claim(jobs.PENDING, "worker")
+    assert store.fail(job["room_id"], "boom") is None
+    # A failed attempt releases the lease
+    assert store.claim(jobs.PENDING, "worker")["room_id"] != job["room_id"]
+    assert store.fail(job["room_id"], "boom again") == jobs.FAILED
+    assert store.summary() == {jobs.PENDING: 1, jobs.FAILED: 1}
+
+
+def test_quota_counts_jobs_in_flight():
+    quota = Quota(2)
+    assert quota.reserve() and quota.reserve()
+    assert not quota.reserve()
+    quota.release()
+    assert quota.reserve()
+    quota.release(succeeded=True)
+    quota.release(succeeded=True)
+    assert quota.done == 2 and not quota.reserve()
+
+
+def test_run_stage_advances_retries_and_fails_jobs(store):
+    store.add_rooms([{"id": 3}])
+    calls = []
+
+    def handler(job):
+        calls.append(job["room_id"])
+        if job["room_id"] == "2":
+            raise RuntimeError("download failed")
+        return {"input_path": f"{job['room_id']}.mp4"}
+
+    done = threading.Event()
+    done.set()
+    jobs.run_stage(store, jobs.PENDING, handler, "worker", done, poll_interval=0)
+    assert store.summary() == {jobs.DOWNLOADED: 2, jobs.FAILED: 1}
+    # max_attempts is 2
+    assert calls.count("2") == 2
+
+
+def test_run_stage_stops_at_the_quota(store):
+    store.add_rooms([{"id": 3}])
+    done = threading.Event()
+    done.set()
+    jobs.run_stage(store, jobs.PENDING, lambda job: {"input_path": "in.mp4"}, "worker", done,
+                   quota=Quota(2), poll_interval=0)
+    assert store.summary() == {jobs.DOWNLOADED: 2, jobs.PENDING: 1}
@@ -0,0 +1,50 @@
+import os
+import time
+
+from tiktok_uploader.Config import Config
+from tiktok_uploader.ledger import UploadLedger
+
+
+def _video(tmp_path, content=b"video"):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_parts_survive_a_restart(tmp_path):
+    video = _video(tmp_path)
+    ledger = UploadLedger.for_video(video, "account")
+    ledger.update(upload_id="upload")
+    ledger.add_part(1, "0a1b2c3d")
+
+    resumed = UploadLedger.for_video(video, "account")
+    assert resumed.get("upload_id") == "upload"
+    assert resumed.parts == {1: "0a1b2c3d"}
+
+
+def test_ledger_is_per_account_and_file_version(tmp_path):
+    video = _video(tmp_path)
+    UploadLedger.for_video(video, "account").update(upload_id="upload")
+    assert UploadLedger.for_video(video, "other").get("upload_id") is None
+
+    _video(tmp_path, b"edited video")
+    os.utime(video, (time.time() + 10, time.time() + 10))
+    assert UploadLedger.for_video(video, "account").get("upload_id") is None
+
+
+def test_expired_ledger_is_discarded(tmp_path):
+    video = _video(tmp_path)
+    ledger = UploadLedger.for_video(video, "account")
+    ledger.update(upload_id="upload", created_at=time.time() - Config.get().upload_ledger_ttl - 1)
+
+    assert UploadLedger.for_video(video, "account").data == {}
+    assert not os.path.exists(ledger.path)
+
+
+def test_unreadable_ledger_is_ignored(tmp_path):
+    video = _video(tmp_path)
+    path = UploadLedger.for_video(video, "account").path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write("{not json")
+    assert UploadLedger.for_video(video, "account").data == {}
@@ -0,0 +1,131 @@
+import threading
+import time
+
+import pytest
+
+from tiktok_uploader.bot_utils import crc32
+from tiktok_uploader.multipart import VideoParts, check_part_response, upload_parts
+
+
+class _Response:
+    def __init__(self, status_code=200, body=None):
+        self.status_code = status_code
+        self._body = body
+        self.text = str(body)
+
+    def json(self):
+        if self._body is None:
+            raise ValueError("no JSON body")
+        return self._body
+
+
+class _UploadNode:
+    """Accepts parts and echoes their CRC32, corrupting the first answer for the parts in `corrupt`"""
+
+    def __init__(self, corrupt=()):
+        self.corrupt = set(corrupt)
+        self.received = []
+        self._lock = threading.Lock()
+
+    def post(self, url, headers=None, data=None):
+        part_number = int(url.split("partNumber=")[1].split("&")[0])
+        with self._lock:
+            self.received.append(part_number)
+            if part_number in self.corrupt:
+                self.corrupt.discard(part_number)
+                return _Response(body={"code": 2000, "data": {"crc32": "00000000"}})
+        return _Response(body={"code": 2000, "data": {"crc32": crc32(data).upper()}})
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(bytes(range(256)) * 10)
+    return str(path)
+
+
+def test_parts_cover_the_file(video):
+    with VideoParts(video, part_size=1000) as parts:
+        assert len(parts) == 3
+        chunks = list(parts)
+    assert [len(chunk) for _, chunk, _ in chunks] == [1000, 1000, 560]
+    assert all(crc == crc32(chunk) for _, chunk, crc in chunks)
+
+
+def test_parts_are_read_on_demand(video):
+    with VideoParts(video, part_size=1000) as parts:
+        assert parts.read(3) == (bytes(range(256)) * 10)[2000:]
+        with pytest.raises(IndexError):
+            parts.read(4)
+
+
+def test_empty_file_has_no_parts(tmp_path):
+    path = tmp_path / "empty.mp4"
+    path.write_bytes(b"")
+    with VideoParts(str(path)) as parts:
+        assert len(parts) == 0
+        assert list(parts) == []
+
+
+@pytest.mark.parametrize("response, expected", [
+    (_Response(body={"code": 2000, "data": {"crc32": "0a1b2c3d"}}), True),
+    (_Response(body={"code": 2000, "data": {"crc32": "0A1B2C3D"}}), True),
+    (_Response(body={"code": 2000, "data": {"crc32": "ffffffff"}}), False),
+    (_Response(body={"code": 4000, "data": {}}), False),
+    (_Response(body={"code": 2000}), True),
+    (_Response(), True),
+    (_Response(status_code=500, body={"code": 2000}), False),
+])
+def test_check_part_response(response, expected):
+    assert check_part_response(response, "0a1b2c3d") is expected
+
+
+def test_part_with_a_wrong_crc_is_sent_again(video):
+    node = _UploadNode(corrupt={2})
+    with VideoParts(video, part_size=1000) as parts:
+        crcs = upload_parts(node, parts, "host", "uri", "id", "auth", workers=2, backoff=0)
+        assert crcs == [crc for _, _, crc in parts]
+    assert sorted(node.received) == [1, 2, 2, 3]
+
+
+def test_upload_fails_once_a_part_runs_out_of_retries(video):
+    class _Broken(_UploadNode):
+        def post(self, url, headers=None, data=None):
+            return _Response(status_code=500)
+
+    with VideoParts(video, part_size=1000) as parts:
+        assert upload_parts(_Broken(), parts, "host", "uri", "id", "auth", retries=1, backoff=0) is None
+
+
+def test_completed_parts_are_not_sent_again(video):
+    node = _UploadNode()
+    accepted = {}
+    with VideoParts(video, part_size=1000) as parts:
+        first_crc = crc32(parts.read(1))
+        crcs = upload_parts(node, parts, "host", "uri", "id", "auth", completed={1: first_crc},
+                            on_part=accepted.__setitem__)
+    assert crcs[0] == first_crc
+    assert sorted(node.received) == [2, 3]
+    assert sorted(accepted) == [2, 3]
+
+
+def test_parts_in_flight_are_bounded_by_workers(tmp_path):
+    class _SlowNode(_UploadNode):
+        in_flight = peak = 0
+
+        def post(self, url, headers=None, data=None):
+            with self._lock:
+                self.in_flight += 1
+                self.peak = max(self.peak, self.in_flight)
+            time.sleep(0.01)
+            with self._lock:
+                self.in_flight -= 1
+            return super().post(url, headers, data)
+
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"x" * 10000)
+    node = _SlowNode()
+    with VideoParts(str(path), part_size=500) as parts:
+        assert upload_parts(node, parts, "host", "uri", "id", "auth", workers=3) is not None
+    assert node.peak <= 3
+    assert sorted(node.received) == list(range(1, 21))
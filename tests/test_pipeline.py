@@ -0,0 +1,106 @@
+import threading
+import time
+
+from tiktok_uploader.pipeline import Pipeline, Stage
+
+
+def _run(pipeline, items, timeout=10):
+    """Run the pipeline in a thread, fails instead of hanging if it never shuts down"""
+    results = []
+    runner = threading.Thread(target=lambda: results.extend(pipeline.run(items)))
+    runner.start()
+    runner.join(timeout)
+    assert not runner.is_alive(), "pipeline did not shut down"
+    assert not [thread for thread in threading.enumerate() if thread.name.startswith("pipeline-")]
+    return results
+
+
+class _Source:
+    """Iterable recording how many items the pipeline pulled from it"""
+
+    def __init__(self, count):
+        self.count = count
+        self.pulled = 0
+
+    def __iter__(self):
+        for item in range(self.count):
+            self.pulled += 1
+            yield item
+
+
+def test_items_go_through_every_stage_and_the_pipeline_shuts_down():
+    pipeline = Pipeline([
+        Stage("download", lambda item: item * 10, workers=3),
+        Stage("render", lambda item: item + 1, workers=2),
+        Stage("upload", lambda item: f"posted {item}", workers=1),
+    ], queue_size=2)
+    results = _run(pipeline, range(20))
+    assert sorted(results) == sorted(f"posted {item * 10 + 1}" for item in range(20))
+
+
+def test_failing_item_is_dropped_and_recorded():
+    def render(item):
+        if item == 3:
+            raise RuntimeError("corrupt video")
+        return item
+
+    upload = Stage("upload", lambda item: item)
+    pipeline = Pipeline([Stage("render", render, workers=2), upload], queue_size=1)
+    assert sorted(_run(pipeline, range(6))) == [0, 1, 2, 4, 5]
+    assert pipeline.stages[0].failures == [(3, "corrupt video")]
+    assert upload.done == 5
+
+
+def test_full_downstream_queue_blocks_upstream():
+    release = threading.Event()
+    rendered = []
+
+    def render(item):
+        rendered.append(item)
+        return item
+
+    def upload(item):
+        release.wait()
+        return item
+
+    pipeline = Pipeline([Stage("render", render), Stage("upload", upload)], queue_size=1)
+    runner = threading.Thread(target=pipeline.run, args=(range(50),))
+    runner.start()
+    time.sleep(0.3)
+    # One item in upload, one waiting in its queue, one rendered and blocked on put()
+    assert len(rendered) <= 3
+    release.set()
+    runner.join(10)
+    assert not runner.is_alive()
+    assert sorted(pipeline.results) == list(range(50))
+
+
+def test_limit_waits_for_items_in_flight_and_stops_the_feed():
+    started = threading.Barrier(2)
+
+    def download(item):
+        if item < 2:
+            # Both items of the limit in flight at once, the first one fails
+            started.wait(timeout=5)
+            if item == 0:
+                time.sleep(0.05)
+                return None
+        return item
+
+    stage = Stage("download", download, workers=3, limit=2)
+    source = _Source(1000)
+    pipeline = Pipeline([stage], queue_size=1)
+    results = _run(pipeline, source)
+    assert len(results) == 2 and 1 in results and 0 not in results
+    assert stage.done == 2 and stage.in_flight == 0
+    assert stage.failures == []
+    # The failed item was replaced by the next one, then the feeder stopped
+    assert source.pulled < 20
+
+
+def test_limit_of_a_later_stage_stops_the_source():
+    source = _Source(1000)
+    upload = Stage("upload", lambda item: item, limit=3)
+    results = _run(Pipeline([Stage("download", lambda item: item, workers=2), upload], queue_size=1), source)
+    assert len(results) == 3
+    assert source.pulled < 20
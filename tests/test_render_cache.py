@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+from tiktok_uploader.render_cache import RenderCache
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = {}
+    for name, content in [("source.mp4", b"video"), ("music.mp3", b"music"), ("other.mp3", b"other")]:
+        paths[name] = str(tmp_path / name)
+        with open(paths[name], "wb") as f:
+            f.write(content)
+    return paths
+
+
+def test_key_follows_file_contents_not_paths(files, tmp_path):
+    edits = [{"op": "audio", "path": files["music.mp3"], "volume": 1.0}]
+    key = RenderCache.key(files["source.mp4"], edits)
+
+    copy = str(tmp_path / "copy.mp3")
+    with open(copy, "wb") as f:
+        f.write(b"music")
+    assert RenderCache.key(files["source.mp4"], [{"op": "audio", "path": copy, "volume": 1.0}]) == key
+    assert RenderCache.key(files["source.mp4"], [{"op": "audio", "path": files["other.mp3"], "volume": 1.0}]) != key
+
+
+def test_key_follows_edits_and_settings(files):
+    speed = [{"op": "speed", "factor": 1.2}]
+    key = RenderCache.key(files["source.mp4"], speed, backend="ffmpeg")
+    assert RenderCache.key(files["source.mp4"], speed, backend="ffmpeg") == key
+    assert RenderCache.key(files["source.mp4"], speed, backend="moviepy") != key
+    assert RenderCache.key(files["source.mp4"], [{"op": "speed", "factor": 1.5}], backend="ffmpeg") != key
+
+
+def test_put_then_get(files, tmp_path):
+    cache = RenderCache(root=str(tmp_path / "cache"), max_bytes=1024)
+    output_path = str(tmp_path / "out.mp4")
+    with open(output_path, "wb") as f:
+        f.write(b"rendered")
+    assert not cache.get("key", output_path)
+    cache.put("key", output_path)
+
+    placed = str(tmp_path / "videos" / "out.mp4")
+    assert cache.get("key", placed)
+    with open(placed, "rb") as f:
+        assert f.read() == b"rendered"
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = RenderCache(root=str(tmp_path / "cache"), max_bytes=20)
+    output_path = str(tmp_path / "out.mp4")
+
+    def render(key, mtime):
+        with open(output_path, "wb") as f:
+            f.write(b"0123456789")
+        cache.put(key, output_path)
+        os.remove(output_path)
+        os.utime(os.path.join(cache.root, f"{key}.mp4"), (mtime, mtime))
+
+    render("first", 1)
+    render("second", 2)
+    # A hit makes "first" the most recently used entry
+    assert cache.get("first", output_path)
+    render("third", 3)
+    assert sorted(os.listdir(cache.root)) == ["first.mp4", "third.mp4"]
+
+
+def test_choices_are_remembered_per_source_content(files, tmp_path):
+    cache = RenderCache(root=str(tmp_path / "cache"), max_bytes=1)
+    assert cache.get_choice(files["source.mp4"], "music") is None
+    cache.set_choice(files["source.mp4"], "music", files["music.mp3"])
+
+    copy = str(tmp_path / "copy.mp4")
+    with open(copy, "wb") as f:
+        f.write(b"video")
+    assert cache.get_choice(copy, "music") == files["music.mp3"]
+    assert cache.get_choice(files["other.mp3"], "music") is None
+    # Eviction only trims rendered outputs
+    cache.evict()
+    assert cache.get_choice(files["source.mp4"], "music") == files["music.mp3"]
+
+
+def test_rerun_of_render_video_hits_the_cache(sample_video, ffmpeg, font, tmp_path, monkeypatch, capsys):
+    import itertools
+    import shutil
+    import subprocess
+
+    from tiktok_uploader import main
+
+    music_dir = tmp_path / "MusicDirPath"
+    music_dir.mkdir()
+    for frequency in (330, 440, 550):
+        subprocess.run([ffmpeg, "-loglevel", "error", "-y", "-f", "lavfi",
+                        "-i", f"sine=frequency={frequency}:duration=2", str(music_dir / f"{frequency}.mp3")], check=True)
+    # Every draw picks another track, a hit can only come from the remembered one
+    tracks = itertools.cycle(sorted(music_dir.glob("*.mp3")))
+    monkeypatch.setattr(main.random, "choice", lambda files: next(tracks))
+
+    source = tmp_path / "1_Ha Noi_3500000.mp4"
+    shutil.copyfile(sample_video, source)
+    (tmp_path / "VideosDirPath").mkdir()
+
+    main.render_video(source)
+    assert "Reused cached render" not in capsys.readouterr().out
+    main.render_video(source)
+    assert "Reused cached render" in capsys.readouterr().out
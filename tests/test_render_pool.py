@@ -0,0 +1,27 @@
+from tiktok_uploader.Config import Config
+from tiktok_uploader.main import render_pool
+
+
+def _config_seen_by_worker():
+    config = Config.get()
+    return config.path, config.render_threads
+
+
+def test_render_pool_workers_load_the_config_file(tmp_path):
+    # With fork, the default on Linux, workers inherit the parent's Config and load the file again
+    path = tmp_path / "config.txt"
+    path.write_text("RENDER_THREADS= 3\n")
+    Config.load(str(path))
+
+    with render_pool(2) as pool:
+        assert pool.submit(_config_seen_by_worker).result(timeout=60) == (str(path), 3)
+
+
+def test_load_replaces_the_loaded_config(tmp_path):
+    first = tmp_path / "first.txt"
+    first.write_text("RENDER_THREADS= 3\n")
+    second = tmp_path / "second.txt"
+    second.write_text("RENDER_THREADS= 5\n")
+    Config.load(str(first))
+    assert Config.load(str(second)) is Config.get()
+    assert Config.get().render_threads == 5
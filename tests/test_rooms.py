@@ -0,0 +1,111 @@
+import re
+
+import pytest
+
+from tiktok_uploader import main
+from tiktok_uploader import rooms as rooms_module
+from tiktok_uploader.Config import Config
+from tiktok_uploader.rooms import RoomCache, fetch_rooms, iter_rooms
+
+
+class _Response:
+    def __init__(self, status_code, body=None, etag=None):
+        self.status_code = status_code
+        self._body = body
+        self.headers = {"ETag": etag} if etag else {}
+
+    def json(self):
+        return self._body
+
+
+class _RoomsAPI:
+    """Paged rooms API answering 304 to a matching If-None-Match"""
+
+    def __init__(self, rooms):
+        self.rooms = rooms
+        self.urls = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.urls.append(url)
+        limit, page = map(int, re.search(r"limit=(\d+)&page=(\d+)", url).groups())
+        body = self.rooms[(page - 1) * limit:page * limit]
+        etag = f'"{hash(str(body))}"'
+        if (headers or {}).get("If-None-Match") == etag:
+            return _Response(304)
+        return _Response(200, body, etag)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = RoomCache(path=str(tmp_path / "rooms.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def _rooms(count, price=1):
+    return [{"id": i, "price": price} for i in range(count)]
+
+
+def test_stops_after_max_rooms(cache):
+    api = _RoomsAPI(_rooms(10))
+    rooms = list(iter_rooms(cache, session=api, page_size=2, max_rooms=3))
+    assert [room["id"] for room in rooms] == [0, 1, 2]
+    assert len(api.urls) == 2
+
+
+def test_small_limit_shrinks_the_page(cache):
+    api = _RoomsAPI(_rooms(10))
+    assert len(list(iter_rooms(cache, session=api, page_size=100, max_rooms=4))) == 4
+    assert api.urls[0].endswith("?limit=4&page=1")
+
+
+def test_without_limit_reads_every_page(cache):
+    api = _RoomsAPI(_rooms(5))
+    assert len(list(iter_rooms(cache, session=api, page_size=2))) == 5
+    assert len(api.urls) == 3
+
+
+def test_unchanged_pages_come_from_the_cache(cache):
+    api = _RoomsAPI(_rooms(3))
+    list(iter_rooms(cache, session=api, page_size=2))
+    rooms = list(iter_rooms(cache, session=api, page_size=2))
+    assert [room["id"] for room in rooms] == [0, 1, 2]
+
+
+def test_changed_only_returns_new_and_updated_rooms(cache, monkeypatch):
+    api = _RoomsAPI(_rooms(4))
+    monkeypatch.setattr(rooms_module, "requests", api)
+    assert len(fetch_rooms(cache, changed_only=True, page_size=2, max_rooms=None)) == 4
+    assert fetch_rooms(cache, changed_only=True, page_size=2, max_rooms=None) == []
+
+    api.rooms[1] = {"id": 1, "price": 2}
+    assert fetch_rooms(cache, changed_only=True, page_size=2, max_rooms=None) == [{"id": 1, "price": 2}]
+
+
+def test_changed_only_checks_every_page_and_limits_the_changed_rooms(cache, monkeypatch):
+    api = _RoomsAPI(_rooms(4))
+    monkeypatch.setattr(rooms_module, "requests", api)
+    assert [room["id"] for room in fetch_rooms(cache, changed_only=True, page_size=3, max_rooms=2)] == [0, 1]
+    # Rooms beyond the limit are cached, the next run only reports the room that changed
+    api.rooms[3] = {"id": 3, "price": 2}
+    assert fetch_rooms(cache, changed_only=True, page_size=3, max_rooms=2) == [{"id": 3, "price": 2}]
+
+
+@pytest.fixture
+def fetched(monkeypatch):
+    calls = []
+    monkeypatch.setattr(main, "fetch_rooms", lambda **kwargs: calls.append(kwargs) or [])
+    return calls
+
+
+def test_room_limit_comes_from_the_config(fetched):
+    main.get_rooms_from_api(changed_only=True)
+    assert fetched == [{"changed_only": True, "max_rooms": 100}]
+
+
+def test_room_limit_zero_fetches_every_room(tmp_path, fetched):
+    path = tmp_path / "config.txt"
+    path.write_text("ROOMS_LIMIT= 0\n")
+    Config.load(str(path))
+    main.get_rooms_from_api()
+    assert fetched == [{"changed_only": False, "max_rooms": None}]
@@ -0,0 +1,70 @@
+import pytest
+
+from tiktok_uploader.scheduler import PostScheduler, parse_throttle
+
+
+@pytest.fixture
+def schedule_path(tmp_path):
+    return str(tmp_path / "post_schedule.json")
+
+
+@pytest.mark.parametrize("result, expected", [
+    (None, None),
+    (False, None),
+    ("HTTP 500", None),
+    ("You are posting too fast. Take a rest.", 0),
+    ("HTTP 429", 0),
+    ("Posting too fast, try again in 5 minutes", 300),
+    ("rate limit, retry after 30 seconds", 30),
+])
+def test_parse_throttle(result, expected):
+    assert parse_throttle(result) == expected
+
+
+def test_no_rate_limit_by_default(schedule_path):
+    scheduler = PostScheduler(path=schedule_path)
+    for _ in range(5):
+        account, delay = scheduler.reserve(["a"])
+        assert (account, delay) == ("a", 0)
+        scheduler.record(account, None)
+
+
+def test_token_bucket_spaces_posts(schedule_path):
+    scheduler = PostScheduler(path=schedule_path, interval=300, burst=2)
+    for _ in range(2):
+        _, delay = scheduler.reserve(["a"])
+        assert delay == 0
+        scheduler.record("a", None)
+    _, delay = scheduler.reserve(["a"])
+    assert delay == pytest.approx(300, abs=1)
+
+
+def test_reserve_prefers_the_account_ready_first(schedule_path):
+    scheduler = PostScheduler(path=schedule_path, interval=300, burst=1)
+    scheduler.reserve(["a"])
+    scheduler.record("a", None)
+    account, delay = scheduler.reserve(["a", "b"])
+    assert (account, delay) == ("b", 0)
+
+
+def test_throttle_backs_off_exponentially(schedule_path):
+    scheduler = PostScheduler(path=schedule_path, throttle_cooldown=100)
+    scheduler.reserve(["a"])
+    scheduler.record("a", "You are posting too fast")
+    assert scheduler.ready_at("a") - scheduler._state["a"]["updated_at"] == pytest.approx(100, abs=1)
+    scheduler.reserve(["a"])
+    scheduler.record("a", "You are posting too fast")
+    assert scheduler.ready_at("a") - scheduler._state["a"]["updated_at"] == pytest.approx(200, abs=1)
+    # A success resets the backoff, not the running cooldown
+    scheduler.reserve(["a"])
+    scheduler.record("a", None)
+    assert scheduler._state["a"]["throttles"] == 0
+
+
+def test_state_survives_restarts(schedule_path):
+    scheduler = PostScheduler(path=schedule_path)
+    scheduler.reserve(["a"])
+    scheduler.record("a", "HTTP 429")
+    restarted = PostScheduler(path=schedule_path)
+    _, delay = restarted.reserve(["a"])
+    assert delay > 0
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from tiktok_uploader import sessions
+from tiktok_uploader.cookies import save_cookies_to_file
+from tiktok_uploader.sessions import SessionPool
+
+
+class _UserAgent:
+    random = "test-agent"
+
+
+@pytest.fixture
+def pool(default_config, monkeypatch):
+    monkeypatch.setattr(sessions, "UserAgent", _UserAgent)
+    os.makedirs(default_config.cookies_dir)
+    pool = SessionPool()
+    yield pool
+    pool.close()
+
+
+def _login(session_user, session_id, mtime=None):
+    save_cookies_to_file([{"name": "sessionid", "value": session_id}, {"name": "tt-target-idc", "value": "useast"}],
+                         f"tiktok_session-{session_user}")
+    if mtime is not None:
+        path = os.path.join(os.getcwd(), "CookiesDir", f"tiktok_session-{session_user}.cookie")
+        os.utime(path, (mtime, mtime))
+
+
+def test_account_session_is_reused(pool):
+    _login("alice", "first", mtime=1000)
+    account = pool.get("alice")
+    assert pool.get("alice") is account
+    assert account.session_id == "first"
+    assert account.session.cookies.get("sessionid", domain=".tiktok.com") == "first"
+    assert account.session.headers["User-Agent"] == "test-agent"
+
+
+def test_sessions_are_per_account_and_proxy(pool):
+    _login("alice", "a")
+    _login("bob", "b")
+    account = pool.get("alice")
+    assert pool.get("bob") is not account
+    proxied = pool.get("alice", proxy="http://proxy:8080")
+    assert proxied is not account
+    assert proxied.session.proxies == {"http": "http://proxy:8080", "https": "http://proxy:8080"}
+
+
+def test_new_login_replaces_the_session(pool):
+    _login("alice", "first", mtime=1000)
+    account = pool.get("alice")
+    _login("alice", "second", mtime=2000)
+    fresh = pool.get("alice")
+    assert fresh is not account
+    assert fresh.session_id == "second"
+
+
+def test_unknown_account_has_no_session_id(pool):
+    assert pool.get("nobody").session_id is None
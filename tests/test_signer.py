@@ -0,0 +1,109 @@
+import json
+import shutil
+import threading
+
+import pytest
+
+from tiktok_uploader import signer as signer_module
+from tiktok_uploader.signer import SignerPool, SignerProcess, StubSigner, get_signer, set_signer
+
+# Stand-in for tiktok-signature/worker.js: same line protocol, with urls that make it
+# hang, fail or exit instead of driving a browser
+FAKE_WORKER = """
+const readline = require("readline");
+console.log(JSON.stringify({status: "ready"}));
+readline.createInterface({input: process.stdin}).on("line", (line) => {
+  const request = JSON.parse(line);
+  if (request.url.includes("hang")) return;
+  if (request.url.includes("exit")) process.exit(1);
+  if (request.url.includes("fail")) {
+    console.log(JSON.stringify({id: request.id, status: "error", error: "boom"}));
+    return;
+  }
+  console.log(JSON.stringify({id: request.id, status: "ok", data: {signed_url: request.url + "&X-Bogus=x", pid: process.pid}}));
+});
+"""
+
+
+@pytest.fixture
+def worker_js(tmp_path):
+    if shutil.which("node") is None:
+        pytest.skip("node is not installed")
+    path = tmp_path / "worker.js"
+    path.write_text(FAKE_WORKER)
+    return str(path)
+
+
+@pytest.fixture
+def process(worker_js):
+    process = SignerProcess(worker_js, timeout=1)
+    yield process
+    process.close()
+
+
+def test_worker_signs_several_requests(process):
+    first = json.loads(process.sign("https://a/?x=1", "ua"))
+    second = json.loads(process.sign("https://b/?x=1", "ua"))
+    assert first == {"status": "ok", "data": {"signed_url": "https://a/?x=1&X-Bogus=x", "pid": first["data"]["pid"]}}
+    assert second["data"]["pid"] == first["data"]["pid"]
+
+
+def test_worker_error_keeps_the_worker(process):
+    assert process.sign("https://fail/", "ua") is None
+    assert process.alive
+    assert process.sign("https://ok/", "ua") is not None
+
+
+def test_timed_out_worker_is_closed(process):
+    assert process.sign("https://hang/", "ua") is None
+    assert not process.alive
+
+
+def test_dead_worker_is_detected(process):
+    assert process.sign("https://exit/", "ua") is None
+    process._proc.wait(timeout=5)
+    assert not process.alive
+
+
+def test_pool_replaces_a_dead_worker(worker_js):
+    pool = SignerPool(size=1, factory=lambda: SignerProcess(worker_js, timeout=1))
+    try:
+        first = json.loads(pool.sign("https://a/", "ua"))["data"]["pid"]
+        assert pool.sign("https://hang/", "ua") is None
+        second = json.loads(pool.sign("https://a/", "ua"))["data"]["pid"]
+        assert second != first
+        assert pool._started == 1
+    finally:
+        pool.close()
+
+
+def test_pool_shares_at_most_size_signers():
+    created = []
+    pool = SignerPool(size=2, factory=lambda: created.append(StubSigner()) or created[-1])
+    threads = [threading.Thread(target=pool.sign, args=(f"https://a/?{i}", "ua")) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert 1 <= len(created) <= 2
+    assert sum(len(signer.requests) for signer in created) == 10
+
+
+def test_pool_reports_a_worker_that_cannot_start():
+    def factory():
+        raise RuntimeError("Signature worker did not start")
+
+    pool = SignerPool(size=1, factory=factory)
+    assert pool.sign("https://a/", "ua") is None
+    assert pool._started == 0
+
+
+def test_signer_mode_stub(default_config, monkeypatch):
+    monkeypatch.setattr(signer_module, "_signer", None)
+    monkeypatch.setitem(default_config._options, "SIGNER_MODE", "stub")
+    assert isinstance(get_signer(), StubSigner)
+    assert get_signer() is get_signer()
+
+    replacement = StubSigner()
+    set_signer(replacement)
+    assert get_signer() is replacement
@@ -0,0 +1,51 @@
+import requests
+
+from tiktok_uploader.tag_resolver import TagResolver
+
+
+class _Response:
+    def __init__(self, body, status_code=200):
+        self.status_code = status_code
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+class _Session:
+    """Answers the hashtag suggestion and user search APIs, dropping the connection for the names in `failing`"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.keywords = []
+
+    def get(self, url, params=None, **kwargs):
+        keyword = params["keyword"]
+        self.keywords.append(keyword)
+        if keyword in self.failing:
+            raise requests.ConnectionError(f"connection to {url} reset")
+        if "challenge/sug" in url:
+            return _Response({"sug_list": [{"cha_name": keyword.lower()}]})
+        return _Response({"user_list": [{"user_info": {"unique_id": keyword, "uid": f"uid-{keyword}"}}]})
+
+
+def _resolver(tmp_path):
+    return TagResolver(path=str(tmp_path / "tags.json"), ttl=60, workers=2)
+
+
+def test_failed_hashtag_lookup_leaves_only_that_tag_unresolved(tmp_path):
+    resolver = _resolver(tmp_path)
+    session = _Session(failing={"Broken"})
+    assert resolver.hashtags(["Fun", "Broken", "Cats"], session) == {"Fun": "fun", "Broken": None, "Cats": "cats"}
+
+    # The failure is not cached, the next upload looks the tag up again
+    session.failing.clear()
+    session.keywords.clear()
+    assert resolver.hashtags(["Fun", "Broken"], session) == {"Fun": "fun", "Broken": "broken"}
+    assert session.keywords == ["Broken"]
+
+
+def test_failed_user_search_leaves_only_that_user_unresolved(tmp_path):
+    resolver = _resolver(tmp_path)
+    session = _Session(failing={"bob"})
+    assert resolver.users(["alice", "bob"], session) == {"alice": ["alice", "uid-alice"], "bob": None}
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from tiktok_uploader.text_sprites import TextSpriteCache
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Options passed to TextClip, each render gives a distinct 4x2 sprite"""
+    calls = []
+
+    def render(options):
+        calls.append(options)
+        return np.full((2, 4, 4), len(calls), dtype=np.uint8)
+
+    monkeypatch.setattr(TextSpriteCache, "render", staticmethod(render))
+    return calls
+
+
+def test_same_text_is_rendered_once(tmp_path, renders):
+    cache = TextSpriteCache(directory=str(tmp_path / "sprites"))
+    sprite = cache.get(text="hello", font_size=40, color="white")
+    assert cache.get(color="white", font_size=40, text="hello") is sprite
+    assert len(renders) == 1
+    assert sprite.size == (4, 2)
+
+
+def test_any_option_change_is_a_miss(tmp_path, renders):
+    cache = TextSpriteCache(directory=str(tmp_path / "sprites"))
+    cache.get(text="hello", font_size=40)
+    cache.get(text="hello", font_size=41)
+    cache.get(text="hello!", font_size=40)
+    assert len(renders) == 3
+
+
+def test_sprites_on_disk_are_shared_by_new_caches(tmp_path, renders):
+    directory = str(tmp_path / "sprites")
+    first = TextSpriteCache(directory=directory).get(text="hello")
+    second = TextSpriteCache(directory=directory).get(text="hello")
+    assert len(renders) == 1
+    assert np.array_equal(first.rgba, second.rgba)
+
+
+def test_replaced_font_file_is_a_miss(tmp_path, renders):
+    font = tmp_path / "font.ttf"
+    font.write_bytes(b"font")
+    cache = TextSpriteCache(directory=str(tmp_path / "sprites"))
+    cache.get(text="hello", font=str(font))
+    font.write_bytes(b"other font")
+    cache.get(text="hello", font=str(font))
+    assert len(renders) == 2
+
+
+def test_empty_directory_only_caches_in_memory(tmp_path, renders):
+    cache = TextSpriteCache(directory="")
+    assert cache.get(text="hello") is cache.get(text="hello")
+    assert len(renders) == 1
+    assert list(tmp_path.iterdir()) == []
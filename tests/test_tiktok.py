@@ -0,0 +1,152 @@
+from types import SimpleNamespace
+
+import pytest
+
+from tiktok_uploader import tiktok
+
+
+def _media(n):
+    return {"video": f"v{n}.mp4", "creation_id": f"creation-{n}", "project_id": f"project-{n}",
+            "video_id": f"video-{n}", "ledger": None}
+
+
+def test_post_data_uses_the_media_project():
+    data = tiktok.build_post_data(_media(1), "title #tag", [{"type": 1}])
+    assert data["post_common_info"]["creation_id"] == "creation-1"
+    assert "is_uploaded_in_batch" not in data["post_common_info"]
+    assert data["feature_common_info_list"][0]["vedit_common_info"]["video_id"] == "video-1"
+    assert "schedule_time" not in data["feature_common_info_list"][0]
+    post = data["single_post_req_list"][0]
+    assert post["video_id"] == "video-1"
+    assert post["single_post_feature_info"]["text_extra"] == [{"type": 1}]
+
+
+def test_post_data_schedule_time():
+    data = tiktok.build_post_data(_media(1), "title", [], schedule_time=3600)
+    assert data["feature_common_info_list"][0]["schedule_time"] > 3600
+
+
+def test_batch_post_data_shares_one_project():
+    items = [(_media(n), f"title {n}", [{"type": n}]) for n in range(3)]
+    data = tiktok.build_batch_post_data("creation-batch", items)
+    assert data["post_common_info"]["creation_id"] == "creation-batch"
+    assert [info["vedit_common_info"]["video_id"] for info in data["feature_common_info_list"]] == \
+        ["video-0", "video-1", "video-2"]
+    posts = data["single_post_req_list"]
+    assert [post["batch_index"] for post in posts] == [0, 1, 2]
+    assert [post["video_id"] for post in posts] == ["video-0", "video-1", "video-2"]
+    assert [post["single_post_feature_info"]["text"] for post in posts] == ["title 0", "title 1", "title 2"]
+    assert posts[2]["single_post_feature_info"]["text_extra"] == [{"type": 2}]
+
+
+class _Ledger:
+    def __init__(self):
+        self.data = {}
+        self.discarded = False
+
+    def update(self, **fields):
+        self.data.update(fields)
+
+    def discard(self):
+        self.discarded = True
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    """Offline account: projects, media uploads and post requests are recorded, posts answer from `answers`"""
+    env = SimpleNamespace(projects=[], media=[], posts=[], answers=[])
+
+    def create_project(session):
+        env.projects.append((f"creation-{len(env.projects)}", f"project-{len(env.projects)}"))
+        return env.projects[-1]
+
+    def upload_media(account, session_user, video, project=None):
+        env.media.append({"video": video, "creation_id": project[0], "project_id": project[1],
+                          "video_id": f"video-{video}", "ledger": _Ledger()})
+        return env.media[-1]
+
+    def post_project(account, data, schedule_time=0):
+        env.posts.append(data)
+        return env.answers.pop(0)
+
+    monkeypatch.setattr(tiktok, "get_account", lambda session_user, proxy=None: SimpleNamespace(session=None))
+    monkeypatch.setattr(tiktok, "create_project", create_project)
+    monkeypatch.setattr(tiktok, "upload_media", upload_media)
+    monkeypatch.setattr(tiktok, "convert_tags", lambda title, session: (title, []))
+    monkeypatch.setattr(tiktok, "post_project", post_project)
+    return env
+
+
+VIDEOS = [("v1.mp4", "a"), ("v2.mp4", "b"), ("v3.mp4", "c")]
+THROTTLED = "You are posting too fast. Take a rest."
+
+
+def _posted(data):
+    return [post["video_id"] for post in data["single_post_req_list"]]
+
+
+def test_batch_is_published_with_one_request(batch):
+    batch.answers = [None]
+    assert tiktok.upload_videos_batch("account", VIDEOS) == [None, None, None]
+    assert batch.projects == [("creation-0", "project-0")]
+    assert len(batch.posts) == 1
+    assert batch.posts[0]["post_common_info"]["creation_id"] == "creation-0"
+    assert _posted(batch.posts[0]) == ["video-v1.mp4", "video-v2.mp4", "video-v3.mp4"]
+    assert all(media["ledger"].discarded for media in batch.media)
+
+
+def test_refused_batch_falls_back_to_single_posts(batch):
+    batch.answers = ["Invalid parameters", None, None, None]
+    assert tiktok.upload_videos_batch("account", VIDEOS) == [None, None, None]
+    assert len(batch.posts) == 4
+    singles = batch.posts[1:]
+    assert [_posted(data) for data in singles] == [["video-v1.mp4"], ["video-v2.mp4"], ["video-v3.mp4"]]
+    # Every single post comes from a project of its own, not from the refused batch's
+    creation_ids = [data["post_common_info"]["creation_id"] for data in singles]
+    assert creation_ids == ["creation-1", "creation-2", "creation-3"]
+    assert [media["ledger"].data["batch"] for media in batch.media] == [False, False, False]
+
+
+def test_throttled_batch_is_not_posted_one_by_one(batch):
+    batch.answers = [THROTTLED]
+    assert tiktok.upload_videos_batch("account", VIDEOS) == [THROTTLED] * 3
+    assert len(batch.posts) == 1
+    assert not any(media["ledger"].discarded for media in batch.media)
+
+
+def test_single_posts_stop_when_throttled(batch):
+    batch.answers = ["Invalid parameters", None, THROTTLED]
+    assert tiktok.upload_videos_batch("account", VIDEOS) == [None, THROTTLED, THROTTLED]
+    assert len(batch.posts) == 3
+
+
+def test_batch_of_one_video_is_a_single_post(batch):
+    batch.answers = [None]
+    assert tiktok.upload_videos_batch("account", VIDEOS[:1]) == [None]
+    assert len(batch.posts) == 1 and _posted(batch.posts[0]) == ["video-v1.mp4"]
+    assert batch.projects == [("creation-0", "project-0")]
+
+
+def test_single_upload_does_not_reuse_a_batch_project(tmp_path, monkeypatch):
+    videos_dir = tmp_path / "VideosDirPath"
+    videos_dir.mkdir()
+    (videos_dir / "v.mp4").write_bytes(b"video")
+    projects = iter([("creation-single", "project-single")])
+    monkeypatch.setattr(tiktok, "create_project", lambda session: next(projects))
+
+    def upload_to_tiktok(video, session, ledger):
+        return "video-id", "key", "upload", ["crc"], "host", "uri", "auth", None
+
+    def finish_upload(session, ledger, *args):
+        ledger.update(committed=True, video_id="video-id")
+        return True
+
+    monkeypatch.setattr(tiktok, "upload_to_tiktok", upload_to_tiktok)
+    monkeypatch.setattr(tiktok, "finish_upload", finish_upload)
+    account = SimpleNamespace(session=None)
+
+    media = tiktok.upload_media(account, "account", "v.mp4", project=("creation-batch", "project-batch"))
+    assert media["creation_id"] == "creation-batch"
+    # The batch was never published: a single retry gets its own project, then keeps it
+    assert tiktok.upload_media(account, "account", "v.mp4")["creation_id"] == "creation-single"
+    assert tiktok.upload_media(account, "account", "v.mp4")["creation_id"] == "creation-single"
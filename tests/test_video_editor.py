@@ -0,0 +1,69 @@
+import pytest
+
+moviepy = pytest.importorskip("moviepy")
+
+from tiktok_uploader.VideoEditor import VideoEditor
+
+
+@pytest.mark.parametrize("duration", [5.0, 7.3])
+def test_loop_audio_non_integral_duration(tone, duration):
+    audio = moviepy.AudioFileClip(tone)
+    looped = VideoEditor._loop_audio(audio, duration)
+    assert looped.duration == pytest.approx(duration)
+    samples = looped.to_soundarray(fps=22050)
+    assert len(samples) == pytest.approx(duration * 22050, abs=2)
+    audio.close()
+
+
+@pytest.mark.parametrize("backend", ["ffmpeg", "moviepy"])
+def test_save_speed_music_and_text(sample_video, tone, font, tmp_path, backend):
+    editor = VideoEditor(sample_video)
+    assert editor.change_speed(1.2)
+    assert editor.add_audio(tone)
+    assert editor.add_text("Xin chào phòng trọ")
+    output_path = str(tmp_path / f"out-{backend}.mp4")
+    assert editor.save(output_path, backend=backend)
+
+    output = moviepy.VideoFileClip(output_path)
+    assert output.duration == pytest.approx(5.0, abs=0.1)
+    assert output.audio is not None
+    output.close()
+
+
+@pytest.mark.parametrize("backend", ["ffmpeg", "moviepy"])
+def test_preview_clip_is_short_and_small(sample_video, font, tmp_path, backend):
+    editor = VideoEditor(sample_video)
+    assert editor.add_text("Xin chào")
+    output_path = str(tmp_path / "preview.mp4")
+    assert editor.preview(output_path, mode="clip", height=240, seconds=2, backend=backend)
+
+    output = moviepy.VideoFileClip(output_path)
+    assert output.duration == pytest.approx(2, abs=0.1)
+    assert output.size[1] == 240
+    output.close()
+
+
+@pytest.mark.parametrize("backend", ["ffmpeg", "moviepy"])
+def test_preview_sheet_tiles_stills(sample_video, font, tmp_path, backend):
+    from PIL import Image
+    editor = VideoEditor(sample_video)
+    assert editor.add_text("Xin chào")
+    output_path = str(tmp_path / "sheet.jpg")
+    assert editor.preview(output_path, mode="sheet", height=200, frames=6, backend=backend)
+
+    # Six stills of 100px high on two rows of four
+    with Image.open(output_path) as sheet:
+        assert sheet.height == 2 * 100 + 3 * 4
+
+
+def test_render_cache_is_per_backend(sample_video, tmp_path, capsys):
+    def save(backend):
+        editor = VideoEditor(sample_video)
+        editor.change_speed(1.5)
+        assert editor.save(str(tmp_path / f"out-{backend}.mp4"), backend=backend)
+        return "Reused cached render" in capsys.readouterr().out
+
+    assert not save("ffmpeg")
+    assert not save("moviepy")
+    assert save("ffmpeg")
+    assert save("moviepy")
@@ -16,7 +16,44 @@ class Config:
         "LANG": "en", 
         "TIKTOK_BASE_URL": "https://www.tiktok.com/upload?lang=", 
         "IMAGEMAGICK_BINARY": "",
-        "MUSIC_DIR": "./MusicDirPath"
+        "MUSIC_DIR": "./MusicDirPath",
+        "UPLOAD_WORKERS": 4,
+        "UPLOAD_PART_RETRIES": 3,
+        "UPLOAD_LEDGER_DIR": "./UploadLedger",
+        "UPLOAD_LEDGER_TTL": 3600,
+        "SIGNER_MODE": "pool",
+        "SIGNER_POOL_SIZE": 2,
+        "UPLOAD_CONCURRENCY": 1,
+        "RENDER_WORKERS": 1,
+        "RENDER_THREADS": 0,
+        "WORKSPACE_DIR": "",
+        "RENDER_BACKEND": "auto",
+        "DOWNLOAD_CHUNK_SIZE": 1048576,
+        "DOWNLOAD_WORKERS": 4,
+        "DOWNLOAD_PER_HOST": 4,
+        "ROOMS_API_URL": "https://staynow.id.vn/api/v1/rooms",
+        "ROOMS_PAGE_SIZE": 100,
+        "ROOMS_LIMIT": 100,
+        "ROOMS_CACHE_PATH": "./rooms_cache.sqlite3",
+        "DOWNLOAD_CACHE_DIR": "./DownloadCache",
+        "DOWNLOAD_CACHE_MAX_BYTES": 10737418240,
+        "RENDER_CACHE_DIR": "./RenderCache",
+        "RENDER_CACHE_MAX_BYTES": 5368709120,
+        "JOBS_DB_PATH": "./jobs.sqlite3",
+        "JOB_LEASE_SECONDS": 1800,
+        "JOB_MAX_ATTEMPTS": 3,
+        "PIPELINE_QUEUE_SIZE": 2,
+        "POST_INTERVAL": 0,
+        "POST_BURST": 2,
+        "POST_THROTTLE_COOLDOWN": 1800,
+        "POST_SCHEDULE_PATH": "./post_schedule.json",
+        "UPLOAD_BATCH_SIZE": 1,
+        "TAG_CACHE_PATH": "./tag_cache.json",
+        "TAG_CACHE_TTL": 86400,
+        "TAG_LOOKUP_WORKERS": 4,
+        "TEXT_SPRITE_DIR": "./TextSprites",
+        "ENCODE_PROFILE": "balanced",
+        "PREVIEW_DIR": "./Previews"
     }
 
     _EXCLUDE = ["#"]
@@ -24,14 +61,14 @@ class Config:
     _instance = None
 
     def __init__(self, path=None) -> None:
+        if not path:
+            self._options = Config._DEFAULT_OPTIONS
+            self.path = None
+        else:
+            self.path = path
+            self._options = {}
         if not Config._instance:
             Config._instance = self
-            if not path:
-                self._options = Config._DEFAULT_OPTIONS
-                self.path = None
-            else:
-                self.path = path
-                self._options = {}
 
     @staticmethod
     def get():
@@ -141,3 +178,192 @@ class Config:
     def video_input_dir(self):
         """Directory where input videos are stored"""
         return self.get_option_by_name("VIDEO_INPUT_DIR")
+
+    @property
+    def upload_workers(self) -> int:
+        """Number of video parts uploaded in parallel"""
+        return int(self.get_option_by_name("UPLOAD_WORKERS") or Config._DEFAULT_OPTIONS["UPLOAD_WORKERS"])
+
+    @property
+    def upload_part_retries(self) -> int:
+        """Number of retries for a single failed video part"""
+        value = self.get_option_by_name("UPLOAD_PART_RETRIES")
+        return int(value if value is not None else Config._DEFAULT_OPTIONS["UPLOAD_PART_RETRIES"])
+
+    @property
+    def upload_ledger_dir(self):
+        """Directory where the state of interrupted uploads is kept"""
+        return self.get_option_by_name("UPLOAD_LEDGER_DIR") or Config._DEFAULT_OPTIONS["UPLOAD_LEDGER_DIR"]
+
+    @property
+    def upload_ledger_ttl(self) -> int:
+        """Seconds after which an interrupted upload is started over instead of resumed"""
+        return int(self.get_option_by_name("UPLOAD_LEDGER_TTL") or Config._DEFAULT_OPTIONS["UPLOAD_LEDGER_TTL"])
+
+    @property
+    def signer_mode(self):
+        """How X-Bogus/_signature are generated: pool (resident node workers), subprocess or stub"""
+        return self.get_option_by_name("SIGNER_MODE") or Config._DEFAULT_OPTIONS["SIGNER_MODE"]
+
+    @property
+    def signer_pool_size(self) -> int:
+        """Number of resident signature workers"""
+        return int(self.get_option_by_name("SIGNER_POOL_SIZE") or Config._DEFAULT_OPTIONS["SIGNER_POOL_SIZE"])
+
+    @property
+    def upload_concurrency(self) -> int:
+        """Number of videos published at the same time, on different accounts"""
+        return int(self.get_option_by_name("UPLOAD_CONCURRENCY") or Config._DEFAULT_OPTIONS["UPLOAD_CONCURRENCY"])
+
+    @property
+    def render_workers(self) -> int:
+        """Number of videos rendered in parallel (one process each)"""
+        return int(self.get_option_by_name("RENDER_WORKERS") or Config._DEFAULT_OPTIONS["RENDER_WORKERS"])
+
+    @property
+    def render_threads(self) -> int:
+        """Number of ffmpeg threads per render process, 0 splits the CPU cores between processes"""
+        return int(self.get_option_by_name("RENDER_THREADS") or Config._DEFAULT_OPTIONS["RENDER_THREADS"])
+
+    @property
+    def workspace_dir(self):
+        """Directory for per-job render workspaces: empty for the system temp dir, "tmpfs" for /dev/shm"""
+        return self.get_option_by_name("WORKSPACE_DIR") or Config._DEFAULT_OPTIONS["WORKSPACE_DIR"]
+
+    @property
+    def render_backend(self):
+        """Video renderer: auto (ffmpeg filter graph, moviepy as fallback), ffmpeg or moviepy"""
+        return self.get_option_by_name("RENDER_BACKEND") or Config._DEFAULT_OPTIONS["RENDER_BACKEND"]
+
+    @property
+    def download_chunk_size(self) -> int:
+        """Buffer size in bytes used when streaming downloads to disk"""
+        return int(self.get_option_by_name("DOWNLOAD_CHUNK_SIZE") or Config._DEFAULT_OPTIONS["DOWNLOAD_CHUNK_SIZE"])
+
+    @property
+    def download_workers(self) -> int:
+        """Number of rooms whose videos are downloaded in parallel"""
+        return int(self.get_option_by_name("DOWNLOAD_WORKERS") or Config._DEFAULT_OPTIONS["DOWNLOAD_WORKERS"])
+
+    @property
+    def download_per_host(self) -> int:
+        """Maximum number of concurrent downloads from the same host"""
+        return int(self.get_option_by_name("DOWNLOAD_PER_HOST") or Config._DEFAULT_OPTIONS["DOWNLOAD_PER_HOST"])
+
+    @property
+    def rooms_api_url(self):
+        """StayNow rooms API endpoint"""
+        return self.get_option_by_name("ROOMS_API_URL") or Config._DEFAULT_OPTIONS["ROOMS_API_URL"]
+
+    @property
+    def rooms_page_size(self) -> int:
+        """Number of rooms requested per page"""
+        return int(self.get_option_by_name("ROOMS_PAGE_SIZE") or Config._DEFAULT_OPTIONS["ROOMS_PAGE_SIZE"])
+
+    @property
+    def rooms_limit(self) -> int:
+        """Maximum number of rooms of a run, the first ones of the API (or the first changed ones), 0 for every room"""
+        return int(self.get_option_by_name("ROOMS_LIMIT") or Config._DEFAULT_OPTIONS["ROOMS_LIMIT"])
+
+    @property
+    def rooms_cache_path(self):
+        """SQLite file caching the rooms fetched from the API"""
+        return self.get_option_by_name("ROOMS_CACHE_PATH") or Config._DEFAULT_OPTIONS["ROOMS_CACHE_PATH"]
+
+    @property
+    def download_cache_dir(self):
+        """Content-addressed store of downloaded videos, empty to disable it"""
+        value = self.get_option_by_name("DOWNLOAD_CACHE_DIR")
+        return Config._DEFAULT_OPTIONS["DOWNLOAD_CACHE_DIR"] if value is None else value
+
+    @property
+    def download_cache_max_bytes(self) -> int:
+        """Size above which the least recently used downloads are evicted"""
+        return int(self.get_option_by_name("DOWNLOAD_CACHE_MAX_BYTES") or Config._DEFAULT_OPTIONS["DOWNLOAD_CACHE_MAX_BYTES"])
+
+    @property
+    def render_cache_dir(self):
+        """Cache of rendered videos keyed by source and edits, empty to disable it"""
+        value = self.get_option_by_name("RENDER_CACHE_DIR")
+        return Config._DEFAULT_OPTIONS["RENDER_CACHE_DIR"] if value is None else value
+
+    @property
+    def render_cache_max_bytes(self) -> int:
+        """Size above which the least recently used renders are evicted"""
+        return int(self.get_option_by_name("RENDER_CACHE_MAX_BYTES") or Config._DEFAULT_OPTIONS["RENDER_CACHE_MAX_BYTES"])
+
+    @property
+    def jobs_db_path(self):
+        """SQLite file tracking each room through the download/render/upload/archive states"""
+        return self.get_option_by_name("JOBS_DB_PATH") or Config._DEFAULT_OPTIONS["JOBS_DB_PATH"]
+
+    @property
+    def job_lease_seconds(self) -> int:
+        """Time after which a job claimed by a worker that died can be claimed again"""
+        return int(self.get_option_by_name("JOB_LEASE_SECONDS") or Config._DEFAULT_OPTIONS["JOB_LEASE_SECONDS"])
+
+    @property
+    def job_max_attempts(self) -> int:
+        """Number of failed attempts after which a job is marked as failed"""
+        return int(self.get_option_by_name("JOB_MAX_ATTEMPTS") or Config._DEFAULT_OPTIONS["JOB_MAX_ATTEMPTS"])
+
+    @property
+    def pipeline_queue_size(self) -> int:
+        """Maximum number of items waiting between two pipeline stages"""
+        return int(self.get_option_by_name("PIPELINE_QUEUE_SIZE") or Config._DEFAULT_OPTIONS["PIPELINE_QUEUE_SIZE"])
+
+    @property
+    def post_interval(self) -> int:
+        """Seconds for an account to earn back one post, 0 to not limit the posting rate"""
+        return int(self.get_option_by_name("POST_INTERVAL") or Config._DEFAULT_OPTIONS["POST_INTERVAL"])
+
+    @property
+    def post_burst(self) -> int:
+        """Number of posts an idle account may make in a row (when POST_INTERVAL > 0)"""
+        return int(self.get_option_by_name("POST_BURST") or Config._DEFAULT_OPTIONS["POST_BURST"])
+
+    @property
+    def post_throttle_cooldown(self) -> int:
+        """Pause after TikTok answers "posting too fast", doubled each time it happens again"""
+        return int(self.get_option_by_name("POST_THROTTLE_COOLDOWN") or Config._DEFAULT_OPTIONS["POST_THROTTLE_COOLDOWN"])
+
+    @property
+    def post_schedule_path(self):
+        """JSON file keeping the rate limit state of every account across restarts"""
+        return self.get_option_by_name("POST_SCHEDULE_PATH") or Config._DEFAULT_OPTIONS["POST_SCHEDULE_PATH"]
+
+    @property
+    def upload_batch_size(self) -> int:
+        """Number of videos of one account published with a single post request, 1 handles videos one by one"""
+        return int(self.get_option_by_name("UPLOAD_BATCH_SIZE") or Config._DEFAULT_OPTIONS["UPLOAD_BATCH_SIZE"])
+
+    @property
+    def tag_cache_path(self):
+        """JSON file caching the ids of @mentions and #hashtags"""
+        return self.get_option_by_name("TAG_CACHE_PATH") or Config._DEFAULT_OPTIONS["TAG_CACHE_PATH"]
+
+    @property
+    def tag_cache_ttl(self) -> int:
+        """Seconds a resolved mention or hashtag stays cached"""
+        return int(self.get_option_by_name("TAG_CACHE_TTL") or Config._DEFAULT_OPTIONS["TAG_CACHE_TTL"])
+
+    @property
+    def tag_lookup_workers(self) -> int:
+        """Number of mentions/hashtags looked up in parallel"""
+        return int(self.get_option_by_name("TAG_LOOKUP_WORKERS") or Config._DEFAULT_OPTIONS["TAG_LOOKUP_WORKERS"])
+
+    @property
+    def text_sprite_dir(self):
+        """Where rendered text overlays are cached as PNG, empty to only cache them in memory"""
+        value = self.get_option_by_name("TEXT_SPRITE_DIR")
+        return Config._DEFAULT_OPTIONS["TEXT_SPRITE_DIR"] if value is None else value
+
+    @property
+    def encode_profile(self):
+        """libx264 encode profile of the renders: preview, fast-batch, balanced or quality"""
+        return self.get_option_by_name("ENCODE_PROFILE") or Config._DEFAULT_OPTIONS["ENCODE_PROFILE"]
+
+    @property
+    def preview_dir(self):
+        """Where `cli.py edit --preview` writes previews, apart from the videos to upload"""
+        return self.get_option_by_name("PREVIEW_DIR") or Config._DEFAULT_OPTIONS["PREVIEW_DIR"]
@@ -1,15 +1,21 @@
 from .Config import Config
-from moviepy import VideoFileClip, AudioFileClip, TextClip, CompositeVideoClip, ColorClip
+from .Workspace import Workspace
+from .text_sprites import get_text_sprite_cache
+from . import encode_profiles
+from moviepy import VideoFileClip, AudioFileClip, CompositeVideoClip, ColorClip
 from pytube import YouTube
 import time
 import os
+import uuid
 import requests
 
 class Video:
-    def __init__(self, source_ref, video_text):
+    def __init__(self, source_ref, video_text, profile=None):
         self.config = Config.get()
         self.source_ref = source_ref
         self.video_text = video_text
+        # libx264 settings of every file written, ENCODE_PROFILE when None
+        _, self.encode_profile = encode_profiles.get_profile(profile)
 
         self.source_ref = self.downloadIfYoutubeURL()
         # Wait until self.source_ref is found in the file system.
@@ -21,14 +27,14 @@ class Video:
     def crop(self, start_time, end_time, saveFile=False):
         if end_time > self.clip.duration:
             end_time = self.clip.duration
-        save_path = os.path.join(os.getcwd(), self.config.videos_dir, "processed") + ".mp4"
+        save_path = Workspace.unique_path(os.path.join(os.getcwd(), self.config.videos_dir), "processed")
         self.clip = self.clip.subclip(t_start=start_time, t_end=end_time)
         if saveFile:
-            self.clip.write_videofile(save_path,
-                                    codec='libx264',
-                                    audio_codec='aac',
-                                    temp_audiofile='temp-audio.m4a',
-                                    remove_temp=True)
+            with Workspace("crop") as workspace:
+                self.clip.write_videofile(save_path,
+                                        temp_audiofile=workspace.temp_audiofile(),
+                                        remove_temp=True,
+                                        **encode_profiles.write_videofile_kwargs(self.encode_profile, self.clip.fps))
         return self.clip
 
     def createVideo(self):
@@ -45,8 +51,8 @@ class Video:
         
         if self.video_text:
             try:
-                # Create text overlay with new API
-                meme_overlay = (TextClip(
+                # Create text overlay, rendered once per text and reused from the sprite cache
+                meme_overlay = get_text_sprite_cache().get(
                     text=self.video_text,
                     font=self.config.imagemagick_font,
                     font_size=self.config.imagemagick_font_size,
@@ -55,8 +61,7 @@ class Video:
                     method='caption',
                     size=(900, None),
                     align='center'
-                )
-                .with_duration(self.clip.duration))
+                ).clip(self.clip.duration)
                 
             except OSError as e:
                 print("Please make sure that ImageMagick is installed on your computer, or (for Windows users) that you specified the correct path to the ImageMagick binary")
@@ -72,15 +77,15 @@ class Video:
             ])
 
         # Save final video
-        output_path = os.path.join(self.config.post_processing_video_path, "post-processed") + ".mp4"
-        self.clip.write_videofile(
-            output_path,
-            codec='libx264',
-            audio_codec='aac',
-            temp_audiofile='temp-audio.m4a',
-            remove_temp=True,
-            fps=24
-        )
+        output_path = Workspace.unique_path(self.config.post_processing_video_path, "post-processed")
+        with Workspace("create") as workspace:
+            self.clip.write_videofile(
+                output_path,
+                temp_audiofile=workspace.temp_audiofile(),
+                remove_temp=True,
+                fps=24,
+                **encode_profiles.write_videofile_kwargs(self.encode_profile, 24)
+            )
         return output_path, self.clip
 
     def is_valid_file_format(self):
@@ -95,15 +100,15 @@ class Video:
         if filtered_streams:
             selected_stream = filtered_streams[0]
             print("Starting Download for Video...")
-            selected_stream.download(output_path=os.path.join(os.getcwd(), Config.get().videos_dir), filename="pre-processed.mp4")
-            filename = os.path.join(os.getcwd(), Config.get().videos_dir, "pre-processed"+".mp4")
+            filename = Workspace.unique_path(os.path.join(os.getcwd(), Config.get().videos_dir), "pre-processed")
+            selected_stream.download(output_path=os.path.dirname(filename), filename=os.path.basename(filename))
             return filename
 
         video = YouTube(url).streams.filter(file_extension="mp4", adaptive=True).first()
         audio = YouTube(url).streams.filter(file_extension="webm", only_audio=True, adaptive=True).first()
         if video and audio:
-            random_filename = str(int(time.time()))  # extension is added automatically.
-            video_path = os.path.join(os.getcwd(), Config.get().videos_dir, "pre-processed.mp4")
+            random_filename = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"  # extension is added automatically.
+            video_path = Workspace.unique_path(os.path.join(os.getcwd(), Config.get().videos_dir), "pre-processed")
             resolution = int(video.resolution[:-1])
             if resolution >= 360:
                 downloaded_v_path = video.download(output_path=os.path.join(os.getcwd(), self.config.videos_dir), filename=random_filename)
@@ -123,13 +128,13 @@ class Video:
                 video_clip = VideoFileClip(downloaded_v_path)
                 audio_clip = AudioFileClip(downloaded_a_path)
                 composite_video = video_clip.with_audio(audio_clip)
-                composite_video.write_videofile(
-                    video_path,
-                    codec='libx264',
-                    audio_codec='aac',
-                    temp_audiofile='temp-audio.m4a',
-                    remove_temp=True
-                )
+                with Workspace("youtube") as workspace:
+                    composite_video.write_videofile(
+                        video_path,
+                        temp_audiofile=workspace.temp_audiofile(),
+                        remove_temp=True,
+                        **encode_profiles.write_videofile_kwargs(self.encode_profile, composite_video.fps)
+                    )
                 
                 # Clean up resources
                 video_clip.close()
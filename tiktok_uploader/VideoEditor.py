@@ -1,17 +1,43 @@
-from moviepy import VideoFileClip, AudioFileClip, TextClip, CompositeVideoClip, CompositeAudioClip
+from moviepy import VideoFileClip, AudioFileClip, CompositeVideoClip, CompositeAudioClip, concatenate_audioclips
 import moviepy.video.fx as vfx
+from .Workspace import Workspace
+from .Config import Config
+from .render_cache import get_render_cache
+from .text_sprites import get_text_sprite_cache
+from .compositor import StaticOverlay, composite_static
+from . import encode_profiles, ffmpeg_render
+import math
 import os
 import cv2
 import numpy as np
+from PIL import Image
+
+# Font used for text overlays
+TEXT_FONT = "font/Be_Vietnam_Pro/BeVietnamPro-Bold.ttf"
+
+# Preview defaults: output height, length of the clip and stills of the contact sheet
+PREVIEW_HEIGHT = 360
+PREVIEW_SECONDS = 5
+PREVIEW_FRAMES = 12
+PREVIEW_COLUMNS = 4
 
 class VideoEditor:
     def __init__(self, video_path):
         """Initialize video editor with input video path"""
         print(f"Loading video from: {video_path}")
-        self.video = VideoFileClip(video_path)
+        self.source_path = str(video_path)
+        self.video = VideoFileClip(self.source_path)
         print(f"Video loaded. Duration: {self.video.duration}s, Size: {self.video.size}")
         self.audio = None
-        self.text_clip = None
+        # Time-invariant overlays (static images) blended into every frame by the moviepy backend
+        self.static_overlays = []
+        # Ordered list of the edits applied so far, compiled by the ffmpeg backend
+        self.edits = []
+
+    def _replace_edit(self, edit):
+        """Record `edit`, replacing a previous edit of the same kind (audio and text can only be set once)"""
+        self.edits = [e for e in self.edits if e["op"] != edit["op"]]
+        self.edits.append(edit)
         
     def change_speed(self, speed_factor):
         """Change video speed - should be called first"""
@@ -26,6 +52,7 @@ class VideoEditor:
             ])
             
             print(f"New video duration after speed change: {self.video.duration}s")
+            self.edits.append({"op": "speed", "factor": speed_factor})
             return True
         except Exception as e:
             print(f"Error changing speed: {str(e)}")
@@ -39,78 +66,79 @@ class VideoEditor:
             audio = AudioFileClip(audio_path)
             print(f"Audio duration: {audio.duration}s, Video duration: {self.video.duration}s")
             
-            # Create a new audio clip with the correct duration
+            # Fit the audio to the video without mutating the loaded clip
             if audio.duration > self.video.duration:
                 print(f"Trimming audio from {audio.duration}s to {self.video.duration}s")
-                # Set duration directly
-                audio.duration = self.video.duration
+                audio = audio.with_duration(self.video.duration)
             elif audio.duration < self.video.duration:
                 print(f"Looping audio to match video duration of {self.video.duration}s")
-                # Calculate how many times we need to loop
-                repeats = int(self.video.duration / audio.duration) + 1
-                # Create a list of audio clips
-                audio_clips = []
-                current_time = 0
-                while current_time < self.video.duration:
-                    audio_clips.append(audio.copy())
-                    current_time += audio.duration
-                # Combine them into one clip
-                audio = audio_clips[0]
-                for clip in audio_clips[1:]:
-                    audio = audio.concatenate_audioclips([audio, clip])
-                # Set final duration
-                audio.duration = self.video.duration
+                audio = self._loop_audio(audio, self.video.duration)
+
+            if volume != 1.0:
+                audio = audio.with_volume_scaled(volume)
             
             # Store the audio
             self.audio = audio
+            self._replace_edit({"op": "audio", "path": str(audio_path), "volume": volume})
             return True
         except Exception as e:
             print(f"Error adding audio: {str(e)}")
             return False
 
+    @staticmethod
+    def _loop_audio(audio, duration):
+        """
+        Repeat `audio` until `duration`: one flat concatenation of the copies needed, cut to `duration`
+        (reading the track at t modulo its length makes moviepy's audio reader fail on the last
+        partial loop)
+        """
+        repeats = math.ceil(duration / audio.duration)
+        return concatenate_audioclips([audio] * repeats).subclipped(0, duration)
+
     def add_effects(self, effects_list):
         """Add visual effects to video"""
         try:
             effects = []
+            applied = []
             for effect, value in effects_list:
                 print(f"Adding effect: {effect} with value {value}")
                 if effect == "mirror_x":
                     effects.append(vfx.MirrorX())
                 elif effect == "mirror_y":
                     effects.append(vfx.MirrorY())
-                # Add more effects as needed
+                else:
+                    # Add more effects as needed
+                    continue
+                applied.append((effect, value))
             
             if effects:
                 self.video = self.video.with_effects(effects)
+                self.edits.append({"op": "effects", "effects": applied})
             return True
         except Exception as e:
             print(f"Error adding effects: {str(e)}")
             return False
 
     def add_text(self, text, color="white", fontsize=35):
-        """Add text to video at specified position (centered horizontally, 3/4 from top)"""
+        """Add text to video at specified position (centered horizontally, 1/5 from top)"""
         try:
             print(f"Adding text: '{text}' with color {color} and size {fontsize}")
             
             # Get video dimensions
             w, h = self.video.size
             print(f"Video dimensions: {w}x{h}")
-            
-            # Create text clip with new API
-            self.text_clip = (
-                TextClip(
-                    text=text,
-                    font_size=fontsize,
-                    color=color,
-                    stroke_color="black",
-                    stroke_width=2,
-                    method='caption',
-                    size=(w, None),
-                    font="font/Be_Vietnam_Pro/BeVietnamPro-Bold.ttf"  # Width of video, auto-height
-                )
-                .with_duration(self.video.duration)
-                .with_position(("center", h * 0.2))  # Center horizontally, 1/4 from top
-            )
+
+            # The text is rasterised at render time, both backends composite the same image
+            self._replace_edit({
+                "op": "text",
+                "text": text,
+                "color": color,
+                "fontsize": fontsize,
+                "stroke_color": "black",
+                "stroke_width": 2,
+                "font": TEXT_FONT,
+                "y_ratio": 0.2,
+            })
             
             print("Text overlay created successfully")
             return True
@@ -118,51 +146,203 @@ class VideoEditor:
             print(f"Error adding text: {str(e)}")
             return False
 
-    def save(self, output_path):
-        """Save edited video"""
+    def text_sprite(self):
+        """Rasterised text edit (TextSprite), None without text. Both backends composite this image"""
+        edit = next((e for e in self.edits if e["op"] == "text"), None)
+        if edit is None:
+            return None
+        w, h = self.video.size
+        # Rendered once per caption/style and reused from the sprite cache
+        return get_text_sprite_cache().get(
+            text=edit["text"],
+            font_size=edit["fontsize"],
+            color=edit["color"],
+            stroke_color=edit["stroke_color"],
+            stroke_width=edit["stroke_width"],
+            method='caption',
+            size=(w, None),  # Width of video, auto-height
+            font=edit["font"]
+        )
+
+    def _build_text_overlay(self):
+        """Static overlay of the text edit, if any"""
+        sprite = self.text_sprite()
+        if sprite is None:
+            return None
+        edit = next(e for e in self.edits if e["op"] == "text")
+        # Center horizontally, 1/5 from top
+        return StaticOverlay(sprite.rgba, ("center", self.video.size[1] * edit["y_ratio"]),
+                             premultiplied=sprite.premultiplied)
+
+    def save(self, output_path, threads=None, backend=None, target_size=None, profile=None):
+        """
+        Save edited video, `threads` is the number of threads given to ffmpeg (the profile's when None)
+        profile: name of the libx264 encode profile (preset, CRF...), defaults to ENCODE_PROFILE in Config
+        backend: "auto" (ffmpeg filter graph when possible, moviepy otherwise), "ffmpeg" or "moviepy",
+        defaults to RENDER_BACKEND in Config. The ffmpeg backend remuxes (or only encodes the audio)
+        when the edits leave the picture untouched and the source is H.264 of `target_size` (any size if None).
+        Outputs are cached by source content, edits, encode settings and renderer (RENDER_CACHE_DIR),
+        a cache hit skips rendering
+        """
+        profile_name, profile = encode_profiles.get_profile(profile)
+        print(f"Encode profile: {profile_name}")
+        backend = backend or Config.get().render_backend
+        use_ffmpeg = backend in ("auto", "ffmpeg") and ffmpeg_render.supports(self.edits)
+
+        cache = get_render_cache()
+
+        def cache_key(renderer):
+            # The renderers encode differently, an output of one is never served for the other
+            return cache.key(self.source_path, self.edits, target_size=target_size, encode=profile, backend=renderer)
+
+        if cache is not None and cache.get(cache_key("ffmpeg" if use_ffmpeg else "moviepy"), output_path):
+            self.close()
+            print(f"Reused cached render for: {output_path}")
+            return True
+
+        saved = False
+        renderer = "moviepy"
+        if use_ffmpeg:
+            try:
+                if ffmpeg_render.render(self, output_path, threads=threads, target_size=target_size,
+                                        profile=profile):
+                    self.close()
+                    print("Video saved successfully!")
+                    saved = True
+                    renderer = "ffmpeg"
+            except Exception as e:
+                print(f"Error rendering with ffmpeg: {str(e)}")
+            if not saved:
+                print("Falling back to moviepy renderer...")
+        if not saved:
+            saved = self._save_moviepy(output_path, threads, profile)
+
+        if saved and cache is not None:
+            try:
+                cache.put(cache_key(renderer), output_path)
+            except OSError as e:
+                print(f"Could not cache render: {str(e)}")
+        return saved
+
+    def close(self):
+        """Release the clips held by the editor"""
+        if self.audio:
+            self.audio.close()
+        self.video.close()
+
+    def preview(self, output_path, mode="clip", height=PREVIEW_HEIGHT, seconds=PREVIEW_SECONDS,
+                frames=PREVIEW_FRAMES, backend=None):
+        """
+        Cheap render of the edit list to check text positions and effects
+        - mode "clip": the first `seconds` of the video, downscaled to `height`, with the "preview" encode profile
+        - mode "sheet": one image tiling `frames` stills of the whole video, only key frames are decoded
+        Previews are never cached. backend as in save
+        """
+        backend = backend or Config.get().render_backend
+        if backend in ("auto", "ffmpeg") and ffmpeg_render.supports(self.edits):
+            try:
+                if mode == "sheet":
+                    rendered = ffmpeg_render.render_contact_sheet(
+                        self, output_path, frames=frames, columns=PREVIEW_COLUMNS, height=height // 2)
+                else:
+                    rendered = ffmpeg_render.render(
+                        self, output_path, profile=encode_profiles.PROFILES["preview"], duration=seconds,
+                        height=height)
+                if rendered:
+                    self.close()
+                    print(f"Preview saved to: {output_path}")
+                    return True
+            except Exception as e:
+                print(f"Error rendering preview with ffmpeg: {str(e)}")
+            print("Falling back to moviepy renderer...")
+
+        try:
+            final = self._compose()
+            if mode == "sheet":
+                self._save_contact_sheet(final, output_path, frames, height // 2)
+            else:
+                final = final.subclipped(0, min(seconds, final.duration)).resized(height=height)
+                with Workspace("preview") as workspace:
+                    tmp_output = workspace.output_for(output_path)
+                    final.write_videofile(
+                        tmp_output,
+                        temp_audiofile=workspace.temp_audiofile(),
+                        remove_temp=True,
+                        fps=self.video.fps,
+                        **encode_profiles.write_videofile_kwargs(encode_profiles.PROFILES["preview"],
+                                                                 self.video.fps)
+                    )
+                    workspace.commit(tmp_output, output_path)
+            final.close()
+            self.close()
+            print(f"Preview saved to: {output_path}")
+            return True
+        except Exception as e:
+            print(f"Error saving preview: {str(e)}")
+            return False
+
+    @staticmethod
+    def _save_contact_sheet(clip, output_path, frames, height):
+        """Tile `frames` stills of `clip`, taken at evenly spaced times, into one image"""
+        rows = -(-frames // PREVIEW_COLUMNS)
+        width = int(round(clip.w * height / clip.h))
+        padding = 4
+        sheet = Image.new("RGB", (PREVIEW_COLUMNS * (width + padding) + padding,
+                                  rows * (height + padding) + padding))
+        for i in range(frames):
+            t = (i + 0.5) * clip.duration / frames
+            still = Image.fromarray(clip.get_frame(t).astype(np.uint8)).resize((width, height))
+            row, column = divmod(i, PREVIEW_COLUMNS)
+            sheet.paste(still, (padding + column * (width + padding), padding + row * (height + padding)))
+        with Workspace("sheet") as workspace:
+            tmp_output = workspace.output_for(output_path)
+            sheet.save(tmp_output)
+            workspace.commit(tmp_output, output_path)
+
+    def _compose(self):
+        """Edited clip of the moviepy backend: static overlays, text and audio applied"""
+        # Static overlays then text, blended in place inside their bounding box only
+        overlays = list(self.static_overlays)
+        text_overlay = self._build_text_overlay()
+        if text_overlay:
+            print("Adding text overlay...")
+            overlays.append(text_overlay)
+        
+        # Create final composition
+        final = composite_static(self.video, overlays)
+        
+        # Add audio if exists
+        if self.audio:
+            print("Adding audio track...")
+            final = final.with_audio(self.audio)
+        return final
+
+    def _save_moviepy(self, output_path, threads=None, profile=None):
+        """Save edited video frame by frame with moviepy"""
         try:
             print("\nStarting video export process...")
-            
-            # Start with base video
-            clips = [self.video]
-            
-            # Add text if exists
-            if self.text_clip:
-                print("Adding text overlay...")
-                clips.append(self.text_clip)
-            
-            # Create final composition
-            final = CompositeVideoClip(clips)
-            
-            # Add audio if exists
-            if self.audio:
-                print("Adding audio track...")
-                final = final.with_audio(self.audio)
+            final = self._compose()
             
             print(f"Writing final video to: {output_path}")
             print(f"Final video properties: Duration={final.duration}s, Size={final.size}")
             
-            # Ensure output directory exists
-            os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
-            
-            # Write output file
-            final.write_videofile(
-                output_path,
-                codec='libx264',
-                audio_codec='aac',
-                temp_audiofile='temp-audio.m4a',
-                remove_temp=True,
-                fps=self.video.fps
-            )
+            # Write into a private workspace first so concurrent renders never share temp files
+            with Workspace("render") as workspace:
+                tmp_output = workspace.output_for(output_path)
+                final.write_videofile(
+                    tmp_output,
+                    temp_audiofile=workspace.temp_audiofile(),
+                    remove_temp=True,
+                    fps=self.video.fps,
+                    **encode_profiles.write_videofile_kwargs(profile or encode_profiles.get_profile()[1],
+                                                             self.video.fps, threads)
+                )
+                workspace.commit(tmp_output, output_path)
             
             # Clean up
             print("Cleaning up resources...")
-            if self.text_clip:
-                self.text_clip.close()
-            if self.audio:
-                self.audio.close()
             final.close()
-            self.video.close()
+            self.close()
             
             print("Video saved successfully!")
             return True
@@ -178,20 +358,26 @@ class VideoEditor:
         - opacity: độ trong suốt (0.0 -> 1.0)
         """
         try:
-            if overlay_path.endswith(('.png', '.jpg', '.jpeg')):
-                overlay = ImageClip(overlay_path)
+            if overlay_path.lower().endswith(('.png', '.jpg', '.jpeg')):
+                # A still image never changes: blend it with the static compositor at save time
+                with Image.open(overlay_path) as image:
+                    rgba = np.array(image.convert("RGBA"))
+                end_time = start_time + duration if duration else None
+                self.static_overlays.append(StaticOverlay(rgba, position, opacity, start_time, end_time))
             else:
                 overlay = VideoFileClip(overlay_path)
-            
-            if duration:
-                overlay = overlay.set_duration(duration)
-            
-            overlay = (overlay
-                      .set_position(position)
-                      .set_start(start_time)
-                      .set_opacity(opacity))
-            
-            self.video = CompositeVideoClip([self.video, overlay])
+                
+                if duration:
+                    overlay = overlay.with_duration(duration)
+                
+                overlay = (overlay
+                          .with_position(position)
+                          .with_start(start_time)
+                          .with_opacity(opacity))
+                
+                self.video = CompositeVideoClip([self.video, overlay])
+            self.edits.append({"op": "overlay", "path": overlay_path, "position": position,
+                               "start": start_time, "duration": duration, "opacity": opacity})
             return self.video
         except Exception as e:
             print(f"Error adding overlay: {str(e)}")
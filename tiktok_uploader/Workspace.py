@@ -0,0 +1,56 @@
+from .Config import Config
+import os
+import shutil
+import tempfile
+import uuid
+
+
+class Workspace:
+    """Private scratch directory of a single render job.
+
+    Every job gets its own temp audio file and writes its output inside the
+    workspace before moving it into place, so several renders can run in the
+    same working directory without overwriting each other's files."""
+
+    def __init__(self, prefix="job", base_dir=None):
+        if base_dir is None:
+            base_dir = Config.get().workspace_dir
+        if base_dir == "tmpfs":
+            # RAM backed scratch space when available
+            base_dir = "/dev/shm" if os.path.isdir("/dev/shm") else ""
+        if base_dir:
+            os.makedirs(base_dir, exist_ok=True)
+        self.path = tempfile.mkdtemp(prefix=f"{prefix}-", dir=base_dir or None)
+        self.job_id = os.path.basename(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+
+    def file(self, name):
+        """Path of `name` inside the workspace"""
+        return os.path.join(self.path, name)
+
+    def temp_audiofile(self, ext=".m4a"):
+        return self.file(f"temp-audio{ext}")
+
+    def output_for(self, final_path):
+        """Temporary output path for `final_path`, to be moved in place with `commit`"""
+        return self.file("output" + os.path.splitext(final_path)[1])
+
+    @staticmethod
+    def commit(tmp_path, final_path):
+        """Move a finished output into place (also across filesystems, e.g. from tmpfs)"""
+        os.makedirs(os.path.dirname(os.path.abspath(final_path)), exist_ok=True)
+        shutil.move(tmp_path, final_path)
+        return final_path
+
+    @staticmethod
+    def unique_path(directory, stem, suffix=".mp4"):
+        """Output path in `directory` that no other job will use, e.g. processed-1a2b3c4d.mp4"""
+        return os.path.join(directory, f"{stem}-{uuid.uuid4().hex[:8]}{suffix}")
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
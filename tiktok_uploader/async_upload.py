@@ -0,0 +1,80 @@
+import asyncio
+import contextlib
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from tiktok_uploader.scheduler import get_post_scheduler
+
+
+class UploadSlot:
+    """Account reserved for one upload attempt, `result` is what PostScheduler.record receives"""
+
+    def __init__(self, account):
+        self.account = account
+        self.result = False
+
+
+class AsyncUploadEngine:
+    """
+    asyncio engine publishing on several accounts at the same time.
+
+    Accounts are handed out by PostScheduler, so an account never runs two uploads
+    at once, and the wait for an account's rate limit or cooldown is awaited on the
+    event loop instead of holding a thread. The upload flow itself (requests sessions
+    with AWS SigV4 auth, upload ledger, signer pool) is blocking and runs in a pool of
+    `max_concurrency` threads, neither httpx nor aiohttp is a dependency.
+    """
+
+    def __init__(self, accounts, max_concurrency=4, scheduler=None):
+        self.accounts = list(accounts)
+        # More uploads than accounts would only wait for an account to be released
+        self.max_concurrency = max(1, min(max_concurrency, len(self.accounts)))
+        self.scheduler = scheduler or get_post_scheduler()
+        self._executor = None
+        self._semaphore = None
+
+    @contextlib.asynccontextmanager
+    async def reserve(self, posts=1):
+        """
+        Reserve the account that can post soonest for `posts` posts and wait until it may post,
+        the account is given back with `slot.result` when the block exits
+        """
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            account, delay = await loop.run_in_executor(None, self.scheduler.reserve, self.accounts, posts)
+            slot = UploadSlot(account)
+            try:
+                if delay > 0:
+                    print(f"Tài khoản {account} có thể đăng sau {int(delay)} giây, đang chờ...")
+                    await asyncio.sleep(delay)
+                yield slot
+            except Exception as e:
+                slot.result = e
+                raise
+            finally:
+                self.scheduler.record(account, slot.result)
+
+    async def call(self, func, *args):
+        """Run the blocking `func(*args)` in the upload threads"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    async def run_async(self, jobs):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            self._executor = executor
+            try:
+                results = await asyncio.gather(*[job(self) for job in jobs], return_exceptions=True)
+            finally:
+                self._executor = None
+        for index, result in enumerate(results):
+            if isinstance(result, Exception):
+                print(f"Lỗi khi upload: {str(result)}")
+                results[index] = False
+        return results
+
+    def run(self, jobs):
+        """
+        :param jobs: Danh sách hàm async job(engine), ví dụ upload_video_async gắn với một video
+        :return: Kết quả của từng job, theo đúng thứ tự của jobs (False nếu job bị lỗi)
+        """
+        return asyncio.run(self.run_async(jobs))
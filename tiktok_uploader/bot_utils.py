@@ -1,5 +1,6 @@
 import requests, secrets, string, uuid, zlib, json, re, time, subprocess
 from requests_auth_aws_sigv4 import AWSSigV4
+from tiktok_uploader.tag_resolver import get_tag_resolver
 
 
 user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
@@ -65,16 +66,7 @@ def convert_tags(text, session):
 			end += len(match.group(1)) + 1
 			return "<h id=\"" + str(i) + "\">#" + match.group(1) + "</h>"
 		elif match.group(2):
-			url = "https://www.tiktok.com/@" + match.group(2)
-			headers = {
-				'authority': 'www.tiktok.com',
-				'accept': '*/*',
-				'accept-language': 'q=0.9,en-US;q=0.8,en;q=0.7,zh-CN;q=0.6,zh;q=0.5,vi;q=0.4',
-				'user-agent': user_agent
-			}
-
-			r = session.request("GET", url, headers=headers)
-			user_id = r.text.split('webapp.user-detail":{"userInfo":{"user":{"id":"')[1].split('"')[0]
+			user_id = user_ids.get(match.group(2)) or ""
 			text_extra.append(text_extra_block(end, end + len(match.group(2)) + 1, 0, "", user_id, str(i)))
 			end += len(match.group(2)) + 1
 			return "<m id=\"" + str(i) + "\">@" + match.group(2) + "</m>"
@@ -82,7 +74,12 @@ def convert_tags(text, session):
 			end += len(match.group(3))
 			return match.group(3)
 
-	result = re.sub(r'#(\w+)|@([\w.-]+)|([^#@]+)', convert, text)
+	pattern = r'#(\w+)|@([\w.-]+)|([^#@]+)'
+	# Every mention of the title is resolved up front, concurrently and through the cache
+	mentions = [m.group(2) for m in re.finditer(pattern, text) if m.group(2)]
+	user_ids = get_tag_resolver().user_ids(mentions, session) if mentions else {}
+
+	result = re.sub(pattern, convert, text)
 	return result, text_extra
 
 
@@ -104,31 +101,20 @@ def assertSuccess(url, r):
 
 def getTagsExtra(title, tags, users, session):
 	text_extra = []
+	resolver = get_tag_resolver()
+	verified_tags = resolver.hashtags(tags, session) if tags else {}
+	verified_users = resolver.users(users, session) if users else {}
 	for tag in tags:
-		url = "https://www.tiktok.com/api/upload/challenge/sug/"
-		params = {"keyword": tag}
-		r = session.get(url, params=params)
-		if not assertSuccess(url, r):
+		verified_tag = verified_tags[tag]
+		if verified_tag is None:
 			return False
-		try:
-			verified_tag = r.json()["sug_list"][0]["cha_name"]
-		except:
-			verified_tag = tag
 		title += " #"+verified_tag
 		text_extra.append({"start": len(title)-len(verified_tag)-1, "end": len(
 			title), "user_id": "", "type": 1, "hashtag_name": verified_tag})
 	for user in users:
-		url = "https://us.tiktok.com/api/upload/search/user/"
-		params = {"keyword": user}
-		r = session.get(url, params=params)
-		if not assertSuccess(url, r):
+		if verified_users[user] is None:
 			return False
-		try:
-			verified_user = r.json()["user_list"][0]["user_info"]["unique_id"]
-			verified_user_id = r.json()["user_list"][0]["user_info"]["uid"]
-		except:
-			verified_user = user
-			verified_user_id = ""
+		verified_user, verified_user_id = verified_users[user]
 		title += " @"+verified_user
 		text_extra.append({"start": len(title)-len(verified_user)-1, "end": len(
 			title), "user_id": verified_user_id, "type": 0, "hashtag_name": verified_user})
@@ -0,0 +1,160 @@
+from .Config import Config
+from .downloader import download_file, get_download_session
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+
+class DownloadStore:
+    """
+    Content-addressed store of downloaded videos.
+
+    Files are kept once under objects/<sha256>.mp4 and an index maps each source
+    URL to its object and the ETag/Last-Modified it was served with. A known URL
+    is downloaded with a conditional request: on 304 the stored file is hard-linked
+    (or copied, across filesystems) to the destination, otherwise the same response
+    brings the new content.
+    The store is trimmed to `max_bytes`, least recently used objects first.
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        # The store is shared by the process, it must not follow later changes of working directory
+        self.root = os.path.abspath(root or Config.get().download_cache_dir)
+        self.max_bytes = max_bytes or Config.get().download_cache_max_bytes
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.incoming_dir = os.path.join(self.root, "incoming")
+        self.index_path = os.path.join(self.root, "index.json")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.incoming_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, f"{digest}.mp4")
+
+    @staticmethod
+    def _url_key(url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _file_digest(path, chunk_size=1024 * 1024):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def lookup(self, url):
+        """Index entry of `url` if its object is still in the store"""
+        with self._lock:
+            entry = self._index.get(url)
+        if entry and os.path.exists(self._object_path(entry["digest"])):
+            return entry
+        return None
+
+    @staticmethod
+    def _link(source, dest_path):
+        """Hard-link `source` to `dest_path`, copying when linking is not possible"""
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        try:
+            os.link(source, dest_path)
+        except OSError:
+            shutil.copyfile(source, dest_path)
+        # Mark the object as recently used for eviction
+        os.utime(source)
+        return dest_path
+
+    def _add(self, url, incoming_path, etag, last_modified):
+        digest = self._file_digest(incoming_path)
+        object_path = self._object_path(digest)
+        if os.path.exists(object_path):
+            # Same content already stored under another URL
+            os.remove(incoming_path)
+        else:
+            os.replace(incoming_path, object_path)
+        with self._lock:
+            self._index[url] = {
+                "digest": digest,
+                "etag": etag,
+                "last_modified": last_modified,
+                "size": os.path.getsize(object_path),
+                "stored_at": time.time(),
+            }
+            self._save_index()
+        return digest
+
+    def fetch(self, url, dest_path, session=None, limiter=None):
+        """
+        Place the content of `url` at `dest_path`, downloading it only when the
+        store has no copy or the server reports a change
+        :return: {"path", "digest", "cached"} or None if the download failed
+        """
+        session = session or get_download_session()
+        entry = self.lookup(url)
+        if entry and not entry.get("etag") and not entry.get("last_modified"):
+            # Nothing to revalidate with, media URLs are not reused for other content
+            self._link(self._object_path(entry["digest"]), dest_path)
+            return {"path": dest_path, "digest": entry["digest"], "cached": True}
+
+        incoming_path = os.path.join(self.incoming_dir, f"{self._url_key(url)}.mp4")
+        result = download_file(url, incoming_path, session=session, limiter=limiter, validators=entry)
+        if not result:
+            return None
+        if result.get("not_modified"):
+            self._link(self._object_path(entry["digest"]), dest_path)
+            return {"path": dest_path, "digest": entry["digest"], "cached": True}
+        digest = self._add(url, incoming_path, result["etag"], result["last_modified"])
+        self._link(self._object_path(digest), dest_path)
+        self.evict()
+        return {"path": dest_path, "digest": digest, "cached": False}
+
+    def evict(self):
+        """Delete least recently used objects until the store fits in max_bytes"""
+        with self._lock:
+            objects = []
+            for name in os.listdir(self.objects_dir):
+                path = os.path.join(self.objects_dir, name)
+                stat = os.stat(path)
+                objects.append((stat.st_mtime, stat.st_size, name))
+            total = sum(size for _, size, _ in objects)
+            if total <= self.max_bytes:
+                return
+            removed = set()
+            for _, size, name in sorted(objects):
+                if total <= self.max_bytes:
+                    break
+                os.remove(os.path.join(self.objects_dir, name))
+                removed.add(os.path.splitext(name)[0])
+                total -= size
+            self._index = {url: entry for url, entry in self._index.items() if entry["digest"] not in removed}
+            self._save_index()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_download_store():
+    """Shared DownloadStore, None when DOWNLOAD_CACHE_DIR is empty"""
+    global _store
+    with _store_lock:
+        if _store is None and Config.get().download_cache_dir:
+            _store = DownloadStore()
+        return _store
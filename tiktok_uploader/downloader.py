@@ -0,0 +1,147 @@
+from .Config import Config
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+import json
+import os
+import re
+import requests
+import threading
+
+
+class HostLimiter:
+    """Caps the number of concurrent requests made to the same host"""
+
+    def __init__(self, per_host=4):
+        self.per_host = max(1, per_host)
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def limit(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.setdefault(host, threading.BoundedSemaphore(self.per_host))
+        with semaphore:
+            yield
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_download_session():
+    """Keep-alive session shared by all downloads, its pool fits DOWNLOAD_WORKERS connections per host"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            pool_size = max(10, Config.get().download_workers)
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(meta_path, meta):
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+
+
+def _remove(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def download_file(url, dest_path, session=None, chunk_size=None, timeout=60, limiter=None, validators=None):
+    """
+    Stream `url` into `dest_path` without buffering the body in memory.
+
+    The body is written to `dest_path + ".part"` and only renamed into place once
+    its length matches Content-Length. An interrupted download is resumed with an
+    HTTP Range request, guarded by If-Range so a changed file (new ETag or
+    Last-Modified) is downloaded from scratch instead of being spliced.
+    validators ({"etag", "last_modified"} of a stored copy) make the request conditional:
+    the same request downloads the file if it changed, or is answered 304 if not.
+    :return: {"path", "etag", "last_modified", "size"}, {"not_modified": True} on a 304
+             or None if the download failed
+    """
+    if limiter is not None:
+        with limiter.limit(url):
+            return download_file(url, dest_path, session, chunk_size, timeout, validators=validators)
+
+    session = session or get_download_session()
+    chunk_size = chunk_size or Config.get().download_chunk_size
+    part_path = dest_path + ".part"
+    meta_path = part_path + ".json"
+
+    headers = {}
+    offset = 0
+    meta = _read_meta(meta_path)
+    validator = meta.get("etag") or meta.get("last_modified")
+    if os.path.exists(part_path) and meta.get("url") == url and validator:
+        offset = os.path.getsize(part_path)
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = validator
+    if validators and not offset:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as r:
+        if r.status_code == 304 and validators:
+            return {"not_modified": True}
+        if r.status_code == 416 and offset:
+            # Nothing left to fetch, or the file shrank: start over next time
+            total = re.search(r"/(\d+)$", r.headers.get("Content-Range", ""))
+            if total and int(total.group(1)) == offset:
+                os.replace(part_path, dest_path)
+                _remove(meta_path)
+                return {"path": dest_path, "etag": meta.get("etag"), "last_modified": meta.get("last_modified"), "size": offset}
+            _remove(part_path, meta_path)
+            return None
+        if r.status_code == 206 and offset:
+            start = re.match(r"bytes (\d+)-", r.headers.get("Content-Range", ""))
+            if not start or int(start.group(1)) != offset:
+                _remove(part_path, meta_path)
+                return None
+            mode = "ab"
+            print(f"Resuming download at {offset} bytes: {url}")
+        elif r.status_code == 200:
+            offset = 0
+            mode = "wb"
+        else:
+            print(f"Failed to download {url}: HTTP {r.status_code}")
+            return None
+
+        etag = r.headers.get("ETag")
+        last_modified = r.headers.get("Last-Modified")
+        content_length = r.headers.get("Content-Length")
+        expected_size = offset + int(content_length) if content_length is not None else None
+        _write_meta(meta_path, {"url": url, "etag": etag, "last_modified": last_modified})
+
+        with open(part_path, mode, buffering=chunk_size) as f:
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    f.write(chunk)
+
+    size = os.path.getsize(part_path)
+    if expected_size is not None and size != expected_size:
+        # Keep the partial file, the next attempt resumes from here
+        print(f"Incomplete download of {url}: {size}/{expected_size} bytes")
+        return None
+
+    os.replace(part_path, dest_path)
+    _remove(meta_path)
+    return {"path": dest_path, "etag": etag, "last_modified": last_modified, "size": size}
@@ -0,0 +1,94 @@
+from .Config import Config
+
+# Named libx264 settings, from fastest to best looking.
+# threads: libx264 threads per encode (None lets ffmpeg use every core),
+# gop_seconds: keyframe interval, faststart: moov atom moved to the front of the mp4
+PROFILES = {
+    "preview": {
+        "preset": "ultrafast",
+        "crf": 32,
+        "tune": "fastdecode",
+        "threads": 2,
+        "gop_seconds": 1,
+        "faststart": True,
+    },
+    "fast-batch": {
+        "preset": "veryfast",
+        "crf": 23,
+        "tune": None,
+        "threads": 2,
+        "gop_seconds": 2,
+        "faststart": True,
+    },
+    # libx264's own defaults (preset medium, CRF 23)
+    "balanced": {
+        "preset": "medium",
+        "crf": 23,
+        "tune": None,
+        "threads": None,
+        "gop_seconds": 2,
+        "faststart": True,
+    },
+    "quality": {
+        "preset": "slow",
+        "crf": 18,
+        "tune": "film",
+        "threads": None,
+        "gop_seconds": 2,
+        "faststart": True,
+    },
+}
+
+DEFAULT_PROFILE = "balanced"
+
+
+def get_profile(name=None):
+    """
+    Settings of the profile `name`, ENCODE_PROFILE in Config when None
+    :return: (profile name, settings), the default profile if the name is unknown
+    """
+    name = name or Config.get().encode_profile
+    if name not in PROFILES:
+        print(f"Unknown encode profile '{name}', using '{DEFAULT_PROFILE}'. Available: {', '.join(PROFILES)}")
+        name = DEFAULT_PROFILE
+    return name, PROFILES[name]
+
+
+def _threads(profile, threads):
+    """An explicit thread count (RENDER_THREADS, --threads) wins over the profile's"""
+    return threads if threads else profile["threads"]
+
+
+def _x264_params(profile, fps):
+    """Encoder options moviepy has no argument for"""
+    params = ["-crf", str(profile["crf"])]
+    if profile["tune"]:
+        params += ["-tune", profile["tune"]]
+    if fps:
+        params += ["-g", str(max(1, int(round(fps * profile["gop_seconds"]))))]
+    return params
+
+
+def mux_args(profile):
+    """Muxer options, also used when the streams are only copied"""
+    return ["-movflags", "+faststart"] if profile["faststart"] else []
+
+
+def ffmpeg_args(profile, fps=None, threads=None):
+    """ffmpeg output options encoding the video with libx264 according to `profile`"""
+    args = ["-c:v", "libx264", "-preset", profile["preset"]] + _x264_params(profile, fps)
+    threads = _threads(profile, threads)
+    if threads:
+        args += ["-threads", str(threads)]
+    return args + mux_args(profile)
+
+
+def write_videofile_kwargs(profile, fps=None, threads=None):
+    """Keyword arguments of moviepy's write_videofile encoding according to `profile`"""
+    return {
+        "codec": "libx264",
+        "audio_codec": "aac",
+        "preset": profile["preset"],
+        "threads": _threads(profile, threads),
+        "ffmpeg_params": _x264_params(profile, fps) + mux_args(profile),
+    }
@@ -0,0 +1,280 @@
+from .Workspace import Workspace
+from . import encode_profiles
+from PIL import Image
+import os
+import re
+import subprocess
+
+# Edits the filter graph backend knows how to compile
+SUPPORTED_EDITS = {"speed", "audio", "effects", "text"}
+
+# Edits that change the picture, any of them requires re-encoding the video stream
+VIDEO_EDITS = {"speed", "effects", "text", "overlay"}
+
+# Audio codecs that can be copied as-is into the mp4 output
+COPYABLE_AUDIO_CODECS = {"aac", "mp3"}
+
+# VideoEditor effects and their ffmpeg filter
+_EFFECT_FILTERS = {
+    "mirror_x": "hflip",
+    "mirror_y": "vflip",
+}
+
+
+def ffmpeg_binary():
+    """ffmpeg executable shipped with imageio-ffmpeg (used by moviepy), or the one on PATH"""
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except (ImportError, RuntimeError):
+        return "ffmpeg"
+
+
+def supports(edits):
+    """True if every edit of the list can be compiled into a filter graph"""
+    for edit in edits:
+        if edit["op"] not in SUPPORTED_EDITS:
+            return False
+        if edit["op"] == "effects" and any(name not in _EFFECT_FILTERS for name, _ in edit["effects"]):
+            return False
+    return True
+
+
+def probe(path):
+    """
+    Read codec and size of the first video/audio streams from ffmpeg's stream info
+    :return: {"video_codec": "h264", "size": (w, h), "audio_codec": "aac" or None}
+    """
+    result = subprocess.run([ffmpeg_binary(), "-hide_banner", "-i", str(path)], stderr=subprocess.PIPE, text=True)
+    info = {"video_codec": None, "size": None, "audio_codec": None}
+    video = re.search(r"Stream #\d+:\d+.*?: Video: (\w+).*?, (\d{2,5})x(\d{2,5})", result.stderr)
+    if video:
+        info["video_codec"] = video.group(1)
+        info["size"] = (int(video.group(2)), int(video.group(3)))
+    audio = re.search(r"Stream #\d+:\d+.*?: Audio: (\w+)", result.stderr)
+    if audio:
+        info["audio_codec"] = audio.group(1)
+    return info
+
+
+def plan_encode(edits, source_info, target_size=None):
+    """
+    Pick the cheapest way to produce the output of an edit list:
+    "copy" remuxes both streams, "audio" copies the video and only encodes the new audio,
+    "full" re-encodes everything
+    """
+    if any(edit["op"] in VIDEO_EDITS for edit in edits):
+        return "full"
+    if source_info.get("video_codec") != "h264":
+        return "full"
+    if target_size and tuple(source_info.get("size") or ()) != tuple(target_size):
+        return "full"
+    if any(edit["op"] == "audio" for edit in edits):
+        return "audio"
+    if source_info.get("audio_codec") not in COPYABLE_AUDIO_CODECS | {None}:
+        return "audio"
+    return "copy"
+
+
+def atempo_chain(factor):
+    """atempo only accepts factors between 0.5 and 2.0, chain several for larger changes"""
+    filters = []
+    while factor > 2.0:
+        filters.append("atempo=2.0")
+        factor /= 2.0
+    while factor < 0.5:
+        filters.append("atempo=0.5")
+        factor /= 0.5
+    filters.append(f"atempo={factor:.6f}")
+    return filters
+
+
+def compile_edits(edits):
+    """
+    Filters of an edit list: setpts/atempo for speed and hflip/vflip for effects.
+    The text is not a filter, it is overlaid from an image (see video_graph)
+    :return: (video filters, audio filters, the audio edit replacing the original sound or None, the text edit or None)
+    """
+    video_filters = []
+    audio_filters = []
+    music = None
+    text = None
+
+    for edit in edits:
+        op = edit["op"]
+        if op == "speed":
+            video_filters.append(f"setpts=PTS/{edit['factor']}")
+            audio_filters.extend(atempo_chain(edit["factor"]))
+        elif op == "effects":
+            video_filters.extend(_EFFECT_FILTERS[name] for name, _ in edit["effects"])
+        elif op == "text":
+            text = edit
+        elif op == "audio":
+            music = edit
+    return video_filters, audio_filters, music, text
+
+
+def video_graph(video_filters, text=None, text_input=None, output_filters=()):
+    """
+    Filter graph of the video stream ending in [v]: the edit filters, then the rasterised text
+    (input `text_input`, an RGBA image) overlaid like the moviepy backend does, centered
+    horizontally at y_ratio of the height, then `output_filters` (scaling, sampling...)
+    """
+    output_filters = list(output_filters)
+    if text is None or text_input is None:
+        return f"[0:v]{','.join(video_filters + output_filters) or 'null'}[v]"
+    overlay = ",".join([f"overlay=x=(W-w)/2:y=H*{text['y_ratio']}"] + output_filters)
+    return f"[0:v]{','.join(video_filters) or 'null'}[base];[base][{text_input}:v]{overlay}[v]"
+
+
+def write_text_image(editor, workspace):
+    """PNG of the text edit of `editor`, rendered by the text sprite cache, None without text"""
+    sprite = editor.text_sprite()
+    if sprite is None:
+        return None
+    path = workspace.file("text.png")
+    Image.fromarray(sprite.rgba).save(path)
+    return path
+
+
+def build_command(source_path, edits, output_path, duration, fps, has_audio, text_image=None, threads=None,
+                  mode="full", profile=None, height=None):
+    """
+    Compile an edit list into a single ffmpeg invocation:
+    setpts/atempo for speed, hflip/vflip for effects, the `text_image` PNG overlaid for text
+    and a looped, trimmed music input replacing the original audio.
+    mode is the result of plan_encode, "copy" and "audio" keep the video stream as-is.
+    profile is the encode_profiles settings of the video encode (ENCODE_PROFILE if None),
+    height downscales the output after the edits (previews), it requires the "full" mode
+    """
+    if profile is None:
+        _, profile = encode_profiles.get_profile()
+    if mode == "copy":
+        return [ffmpeg_binary(), "-y", "-loglevel", "error", "-i", str(source_path),
+                "-map", "0:v:0", "-map", "0:a:0?", "-c", "copy"] + encode_profiles.mux_args(profile) + [str(output_path)]
+
+    inputs = ["-i", str(source_path)]
+    video_filters, audio_filters, music, text = compile_edits(edits)
+
+    if mode == "audio":
+        filter_graph = []
+        maps = ["-map", "0:v:0"]
+    else:
+        text_input = None
+        if text and text_image:
+            inputs += ["-i", str(text_image)]
+            text_input = 1
+        filter_graph = [video_graph(video_filters, text, text_input, [f"scale=-2:{height}"] if height else [])]
+        maps = ["-map", "[v]"]
+    if music:
+        # Loop the music for as long as needed, then cut it to the video length
+        music_input = len(inputs) // 2
+        inputs += ["-stream_loop", "-1", "-i", str(music["path"])]
+        filter_graph.append(
+            f"[{music_input}:a]volume={music['volume']},atrim=0:{duration:.3f},asetpts=PTS-STARTPTS[a]"
+        )
+        maps += ["-map", "[a]"]
+    elif has_audio:
+        filter_graph.append(f"[0:a]{','.join(audio_filters) or 'anull'}[a]")
+        maps += ["-map", "[a]"]
+
+    command = [ffmpeg_binary(), "-y", "-loglevel", "error"] + inputs
+    if filter_graph:
+        command += ["-filter_complex", ";".join(filter_graph)]
+    command += maps
+    if mode == "audio":
+        command += ["-c:v", "copy", "-c:a", "aac", "-t", f"{duration:.3f}"]
+        if threads:
+            command += ["-threads", str(threads)]
+        command += encode_profiles.mux_args(profile)
+    else:
+        command += encode_profiles.ffmpeg_args(profile, fps, threads)
+        command += ["-c:a", "aac", "-r", str(fps), "-t", f"{duration:.3f}"]
+    command.append(str(output_path))
+    return command
+
+
+def build_contact_sheet_command(source_path, edits, output_path, duration, text_image=None, frames=12, columns=4,
+                                height=240):
+    """
+    ffmpeg invocation writing a single image tiling `frames` stills of the edited video.
+    Only key frames are decoded (-skip_frame nokey), the edits are applied to those and
+    the first one of every duration / frames seconds of the output timeline is kept.
+    """
+    video_filters, _, _, text = compile_edits(edits)
+    inputs = ["-skip_frame", "nokey", "-i", str(source_path)]
+    if text and text_image:
+        inputs += ["-i", str(text_image)]
+    interval = duration / max(frames, 1)
+    rows = -(-frames // columns)
+    graph = video_graph(video_filters, text, 1 if text and text_image else None, [
+        # First key frame of every interval, key frames rarely fall exactly `interval` apart
+        f"select='isnan(prev_selected_t)+gt(floor(t/{interval:.3f}),floor(prev_selected_t/{interval:.3f}))'",
+        f"scale=-2:{height}",
+        f"tile={columns}x{rows}:padding=4:margin=4",
+    ])
+    return [ffmpeg_binary(), "-y", "-loglevel", "error"] + inputs + [
+            "-filter_complex", graph, "-map", "[v]", "-frames:v", "1", "-q:v", "3", str(output_path)]
+
+
+def _run(command, tmp_output, output_path, workspace):
+    """Run an ffmpeg command writing `tmp_output` and move the result to `output_path`"""
+    if "-filter_complex" in command:
+        print(f"Rendering with ffmpeg filter graph: {command[command.index('-filter_complex') + 1]}")
+    result = subprocess.run(command, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0 or not os.path.exists(tmp_output):
+        print(f"ffmpeg render failed: {result.stderr.strip()}")
+        return False
+    workspace.commit(tmp_output, output_path)
+    return True
+
+
+def render(editor, output_path, threads=None, target_size=None, profile=None, duration=None, height=None):
+    """
+    Render the edit list of a VideoEditor with one native ffmpeg process,
+    remuxing instead of re-encoding whenever the edits allow it.
+    duration cuts the output after that many seconds and height downscales it (previews)
+    :return: True if the video was written, False otherwise
+    """
+    if not supports(editor.edits):
+        return False
+    mode = "full" if height else plan_encode(editor.edits, probe(editor.source_path), target_size)
+    print({
+        "copy": "No re-encode needed, remuxing streams",
+        "audio": "Video stream unchanged, only encoding the audio",
+        "full": "Re-encoding video and audio",
+    }[mode])
+    with Workspace("ffmpeg") as workspace:
+        tmp_output = workspace.output_for(output_path)
+        command = build_command(
+            editor.source_path, editor.edits, tmp_output,
+            duration=min(duration, editor.video.duration) if duration else editor.video.duration,
+            fps=editor.video.fps,
+            has_audio=editor.video.audio is not None,
+            text_image=write_text_image(editor, workspace),
+            threads=threads,
+            mode=mode,
+            profile=profile,
+            height=height,
+        )
+        return _run(command, tmp_output, output_path, workspace)
+
+
+def render_contact_sheet(editor, output_path, frames=12, columns=4, height=240):
+    """
+    Write a contact sheet (one image of `frames` stills) of the edit list of a VideoEditor
+    :return: True if the image was written, False otherwise
+    """
+    if not supports(editor.edits):
+        return False
+    with Workspace("sheet") as workspace:
+        tmp_output = workspace.output_for(output_path)
+        command = build_contact_sheet_command(
+            editor.source_path, editor.edits, tmp_output,
+            duration=editor.video.duration,
+            text_image=write_text_image(editor, workspace),
+            frames=frames,
+            columns=columns,
+            height=height,
+        )
+        return _run(command, tmp_output, output_path, workspace)
@@ -0,0 +1,246 @@
+from .Config import Config
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# States of a room job, in pipeline order
+PENDING = "pending"
+DOWNLOADED = "downloaded"
+RENDERED = "rendered"
+UPLOADED = "uploaded"
+ARCHIVED = "archived"
+FAILED = "failed"
+
+STATES = (PENDING, DOWNLOADED, RENDERED, UPLOADED, ARCHIVED, FAILED)
+
+# State a job moves to once the stage working on it succeeds
+NEXT_STATE = {
+    PENDING: DOWNLOADED,
+    DOWNLOADED: RENDERED,
+    RENDERED: UPLOADED,
+    UPLOADED: ARCHIVED,
+}
+
+
+class JobStore:
+    """
+    Durable SQLite queue of room jobs moving through
+    pending -> downloaded -> rendered -> uploaded -> archived.
+
+    A worker claims a job of the state its stage consumes with a lease, so a
+    job is never worked on twice at the same time, and a job whose worker
+    crashed becomes claimable again once the lease expires. A job that fails
+    JOB_MAX_ATTEMPTS times is moved to the failed state.
+    """
+
+    def __init__(self, path=None, lease_seconds=None, max_attempts=None):
+        self.path = path or Config.get().jobs_db_path
+        self.lease_seconds = lease_seconds or Config.get().job_lease_seconds
+        self.max_attempts = max_attempts or Config.get().job_max_attempts
+        # Autocommit mode, transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    room_id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    room TEXT NOT NULL,
+                    input_path TEXT,
+                    output_path TEXT,
+                    account TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    lease_owner TEXT,
+                    lease_until REAL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, updated_at);
+            """)
+
+    def close(self):
+        self._conn.close()
+
+    def _transaction(self, statements):
+        """Run `statements(conn)` in a write transaction, returns its result"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self._conn)
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def add_rooms(self, rooms):
+        """Queue rooms not seen before, returns the number of new jobs"""
+        now = time.time()
+
+        def insert(conn):
+            added = 0
+            for room in rooms:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO jobs (room_id, state, room, updated_at) VALUES (?, ?, ?, ?)",
+                    (str(room.get("id")), PENDING, json.dumps(room), now),
+                )
+                added += cursor.rowcount
+            return added
+
+        return self._transaction(insert)
+
+    def claim(self, state, owner):
+        """
+        Lease the oldest job in `state` that nobody is working on
+        :return: the job as a dict, or None if there is none
+        """
+        now = time.time()
+
+        def lease(conn):
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE state = ? AND (lease_until IS NULL OR lease_until < ?) "
+                "ORDER BY updated_at LIMIT 1",
+                (state, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET lease_owner = ?, lease_until = ? WHERE room_id = ?",
+                (owner, now + self.lease_seconds, row["room_id"]),
+            )
+            return row
+
+        row = self._transaction(lease)
+        if row is None:
+            return None
+        job = dict(row)
+        job["room"] = json.loads(job["room"])
+        return job
+
+    def advance(self, room_id, **fields):
+        """Move a job to the next state, storing `fields` (input_path, output_path, account)"""
+        fields = {k: v for k, v in fields.items() if k in ("input_path", "output_path", "account")}
+
+        def update(conn):
+            state = conn.execute("SELECT state FROM jobs WHERE room_id = ?", (room_id,)).fetchone()["state"]
+            assignments = "".join(f", {name} = ?" for name in fields)
+            conn.execute(
+                "UPDATE jobs SET state = ?, attempts = 0, error = NULL, lease_owner = NULL, lease_until = NULL, "
+                f"updated_at = ?{assignments} WHERE room_id = ?",
+                (NEXT_STATE[state], time.time(), *fields.values(), room_id),
+            )
+            return NEXT_STATE[state]
+
+        return self._transaction(update)
+
+    def fail(self, room_id, error):
+        """Record a failed attempt, the job is retried until it reaches max_attempts"""
+
+        def update(conn):
+            attempts = conn.execute("SELECT attempts FROM jobs WHERE room_id = ?", (room_id,)).fetchone()[0] + 1
+            if attempts >= self.max_attempts:
+                conn.execute(
+                    "UPDATE jobs SET state = ?, attempts = ?, error = ?, lease_owner = NULL, lease_until = NULL, "
+                    "updated_at = ? WHERE room_id = ?",
+                    (FAILED, attempts, str(error), time.time(), room_id),
+                )
+                return FAILED
+            conn.execute(
+                "UPDATE jobs SET attempts = ?, error = ?, lease_owner = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE room_id = ?",
+                (attempts, str(error), time.time(), room_id),
+            )
+            return None
+
+        return self._transaction(update)
+
+    def reset_leases(self):
+        """Drop the leases left by a crashed run so its jobs are picked up right away"""
+        self._transaction(lambda conn: conn.execute("UPDATE jobs SET lease_owner = NULL, lease_until = NULL"))
+
+    def release(self, room_id):
+        """Give a claimed job back without counting an attempt"""
+        self._transaction(lambda conn: conn.execute(
+            "UPDATE jobs SET lease_owner = NULL, lease_until = NULL WHERE room_id = ?", (room_id,)
+        ))
+
+    def count(self, *states, leased=None):
+        """Number of jobs in any of `states`, only (un)leased ones if `leased` is True/False"""
+        query = f"SELECT COUNT(*) FROM jobs WHERE state IN ({','.join('?' * len(states))})"
+        params = list(states)
+        if leased is not None:
+            query += " AND lease_until IS NOT NULL AND lease_until >= ?" if leased \
+                else " AND (lease_until IS NULL OR lease_until < ?)"
+            params.append(time.time())
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()[0]
+
+    def summary(self):
+        """{state: number of jobs}"""
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {state: count for state, count in rows}
+
+
+def worker_name(stage, index):
+    """Lease owner name of a stage worker, unique across processes"""
+    return f"{stage}-{index}@{os.getpid()}"
+
+
+class Quota:
+    """Thread-safe budget of jobs a stage may still complete, e.g. the number of videos to download this run"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.done = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            if self.done + self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, succeeded=False):
+        with self._lock:
+            self.in_flight -= 1
+            if succeeded:
+                self.done += 1
+
+
+def run_stage(store, state, handler, worker, upstream_done, quota=None, poll_interval=1.0):
+    """
+    Worker loop of one pipeline stage: claim jobs in `state`, run `handler(job)` and
+    advance the job with the fields it returns (a falsy result or an exception is a failed attempt).
+    Returns once `upstream_done` is set and no job is left in `state`, or once `quota` is used up.
+    """
+    while True:
+        if quota is not None and not quota.reserve():
+            return
+        job = store.claim(state, worker)
+        if job is None:
+            if quota is not None:
+                quota.release()
+            if upstream_done.is_set() and store.count(state, leased=False) == 0 \
+                    and (quota is not None or store.count(state) == 0):
+                return
+            time.sleep(poll_interval)
+            continue
+
+        try:
+            fields = handler(job)
+            error = None if fields else f"{state} stage returned {fields!r}"
+        except Exception as e:
+            fields, error = None, str(e)
+
+        if error is None:
+            store.advance(job["room_id"], **(fields if isinstance(fields, dict) else {}))
+        elif store.fail(job["room_id"], error) == FAILED:
+            print(f"Job {job['room_id']} failed in state {state}: {error}")
+        if quota is not None:
+            quota.release(succeeded=error is None)
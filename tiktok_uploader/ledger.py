@@ -0,0 +1,76 @@
+import hashlib, json, os, threading, time
+from tiktok_uploader.Config import Config
+
+
+class UploadLedger:
+	"""Small on-disk record of an in-progress upload.
+
+	Stores the project, the upload node assigned by ApplyUploadInner and the parts
+	already accepted by it, so a retry can skip straight to the missing parts.
+	The ledger is keyed by account and by the video's path, size and mtime, so an
+	edited file never resumes an old upload."""
+
+	def __init__(self, path, data=None):
+		self.path = path
+		self.data = data or {}
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def for_video(video_path, session_user, ledger_dir=None):
+		ledger_dir = ledger_dir or Config.get().upload_ledger_dir
+		stat = os.stat(video_path)
+		key = f"{session_user}|{os.path.abspath(video_path)}|{stat.st_size}|{int(stat.st_mtime)}"
+		name = hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json"
+		ledger = UploadLedger(os.path.join(os.getcwd(), ledger_dir, name))
+		ledger.load()
+		return ledger
+
+	def load(self):
+		if not os.path.exists(self.path):
+			self.data = {}
+			return
+		try:
+			with open(self.path, "r") as f:
+				self.data = json.load(f)
+		except (OSError, ValueError):
+			print("[-] Ignoring unreadable upload ledger: ", self.path)
+			self.data = {}
+			return
+		if time.time() - self.data.get("created_at", 0) > Config.get().upload_ledger_ttl:
+			# Upload credentials have most likely expired, start from scratch.
+			self.discard()
+
+	def save(self):
+		os.makedirs(os.path.dirname(self.path), exist_ok=True)
+		tmp_path = self.path + ".tmp"
+		with open(tmp_path, "w") as f:
+			json.dump(self.data, f)
+		os.replace(tmp_path, self.path)
+
+	def update(self, **fields):
+		with self._lock:
+			self.data.setdefault("created_at", time.time())
+			self.data.update(fields)
+			self.save()
+
+	def discard(self):
+		self.data = {}
+		if os.path.exists(self.path):
+			os.remove(self.path)
+
+	def get(self, name, default=None):
+		return self.data.get(name, default)
+
+	@property
+	def has_upload(self):
+		return all(self.data.get(k) for k in ("upload_id", "store_uri", "upload_host", "session_key", "video_auth", "video_id"))
+
+	@property
+	def parts(self):
+		"""Completed parts as `{part_number: crc}`"""
+		return {int(k): v for k, v in self.data.get("parts", {}).items()}
+
+	def add_part(self, part_number, crc):
+		with self._lock:
+			self.data.setdefault("parts", {})[str(part_number)] = crc
+			self.save()
@@ -4,26 +4,38 @@ import requests
 from pathlib import Path
 import random
 from tiktok_uploader import tiktok
+from tiktok_uploader.Config import Config
+from tiktok_uploader.downloader import download_file, get_download_session, HostLimiter
+from tiktok_uploader.download_cache import get_download_store
+from tiktok_uploader.render_cache import get_render_cache
+from tiktok_uploader.rooms import fetch_rooms
+from tiktok_uploader import jobs
+from tiktok_uploader.jobs import JobStore, Quota, run_stage, worker_name
+from tiktok_uploader.pipeline import Pipeline, Stage
+from tiktok_uploader.scheduler import get_post_scheduler
+from tiktok_uploader.async_upload import AsyncUploadEngine
+import functools
+import os
 import shutil
+import sys
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from datetime import datetime
+from threading import Event, Thread
 
-def get_rooms_from_api(limit=100):
+def get_rooms_from_api(limit=None, changed_only=False):
     """
-    Lấy danh sách phòng từ API
-    :param limit: Số lượng phòng muốn lấy
+    Lấy danh sách phòng từ API (theo từng trang, có cache SQLite cục bộ)
+    :param limit: Số lượng phòng muốn lấy, mặc định lấy từ ROOMS_LIMIT trong Config (0 để lấy tất cả)
+    :param changed_only: Chỉ lấy các phòng mới hoặc đã thay đổi kể từ lần chạy trước
     :return: Danh sách phòng hoặc None nếu có lỗi
     """
+    if limit is None:
+        limit = Config.get().rooms_limit
     try:
-        url = f"https://staynow.id.vn/api/v1/rooms?limit={limit}"
-        response = requests.get(url)
-        if response.status_code == 200:
-            return response.json()  # API trả về trực tiếp danh sách phòng
-        else:
-            print(f"Lỗi khi gọi API: {response.status_code}")
-            return None
+        return fetch_rooms(changed_only=changed_only, max_rooms=limit or None)
     except Exception as e:
-        print(f"Lỗi kết nối API: {str(e)}")
+        print(f"Lỗi khi gọi API: {str(e)}")
         return None
 
 def isVideoValid(url):
@@ -32,20 +44,26 @@ def isVideoValid(url):
    else:
        return False
 
-def downloadFromStayNow(id, address, price, url):
+def downloadFromStayNow(id, address, price, url, session=None, limiter=None):
     try:
         # Đảm bảo thư mục VideoInputDirPath tồn tại
         input_dir = Path("VideoInputDirPath")
         input_dir.mkdir(exist_ok=True)
         
-        response = requests.get(url)
-        if response.status_code == 200:
-            with open(f"VideoInputDirPath/{id}_{address}_{price}.mp4", "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+        # Tải dạng stream vào file .part rồi đổi tên, tiếp tục tải nếu lần trước bị gián đoạn
+        output_path = f"VideoInputDirPath/{id}_{address}_{price}.mp4"
+        store = get_download_store()
+        if store is not None:
+            # Lấy từ kho đã tải nếu video chưa thay đổi, không tải lại
+            result = store.fetch(url, output_path, session=session, limiter=limiter)
+        else:
+            result = download_file(url, output_path, session=session, limiter=limiter)
+        if result and result.get("cached"):
+            print(f"Reused cached video from StayNow: {id}")
+            return output_path
+        if result:
             print(f"Downloaded video from StayNow: {id}")
-            return f"VideoInputDirPath/{id}.mp4"
+            return output_path
         else:
             print(f"Failed to download video from StayNow: {id}")
             return False
@@ -54,47 +72,85 @@ def downloadFromStayNow(id, address, price, url):
         return False
 
 
-def downloadVideo(list_url, address, price, id):
+def downloadVideo(list_url, address, price, id, session=None, limiter=None):
     for url in list_url:
         if isVideoValid(url):
-            result = downloadFromStayNow(id= id, address=address, price= price, url= url)
+            result = downloadFromStayNow(id= id, address=address, price= price, url= url, session=session, limiter=limiter)
             if result:
                 print(f"Download video: {url}")
-                return True
+                return result
             
         else:
             print(f"không phải video hợp lệ: {url}")
     return False
 
-def downAllVideo(ListRoom, total):
+def downloadRoom(room, session=None, limiter=None):
+    """Tải video đầu tiên hợp lệ của một phòng, trả về đường dẫn video hoặc False"""
+    room_items = room.get("room_items", [])
+
+    # 👉 Lấy images của room_item đầu tiên (nếu có)
+    if room_items:
+        list_url = room_items[0].get("images", [])
+    else:
+        list_url = []
+
+    address = room.get("address")
+    price = room.get("price")
+    room_id = room.get("id")
+    return downloadVideo(list_url, address, price, room_id, session=session, limiter=limiter)
+
+def downAllVideo(ListRoom, total, workers=None):
+    """
+    Tải video của các phòng cho tới khi đủ total video
+    :param workers: Số phòng tải song song, mặc định lấy từ DOWNLOAD_WORKERS trong Config
+    """
     count = 0  # Số video đã tải thành công
     index = 0  # Vị trí hiện tại trong danh sách phòng
     total_rooms = len(ListRoom)
-    
-    while count < total and index < total_rooms:
-        print(f"Đang xử lý phòng {index + 1}/{total_rooms}")
-        room = ListRoom[index]
-        room_items = room.get("room_items", [])
-
-        # 👉 Lấy images của room_item đầu tiên (nếu có)
-        if room_items:
-            list_url = room_items[0].get("images", [])
-        else:
-            list_url = []
 
-        address = room.get("address")
-        price = room.get("price")
-        room_id = room.get("id")
-        result = downloadVideo(list_url, address, price, room_id)
-        
-        
-        if result is True:
-            count += 1
-            print(f"Đã tải thành công {count}/{total} videos")
-        else:
-            print(f"Không tìm thấy video hợp lệ từ phòng {index + 1}")
-            
-        index += 1
+    if workers is None:
+        workers = Config.get().download_workers
+    # Một kết nối keep-alive dùng chung tới CDN, giới hạn số request song song mỗi host
+    session = get_download_session()
+    limiter = HostLimiter(Config.get().download_per_host)
+
+    if workers <= 1:
+        while count < total and index < total_rooms:
+            print(f"Đang xử lý phòng {index + 1}/{total_rooms}")
+            result = downloadRoom(ListRoom[index], session, limiter)
+
+            if result:
+                count += 1
+                print(f"Đã tải thành công {count}/{total} videos")
+            else:
+                print(f"Không tìm thấy video hợp lệ từ phòng {index + 1}")
+
+            index += 1
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            in_flight = {}
+            while True:
+                # Chỉ tải song song số phòng còn thiếu để dừng ngay khi đủ total video
+                while index < total_rooms and len(in_flight) < workers and count + len(in_flight) < total:
+                    print(f"Đang xử lý phòng {index + 1}/{total_rooms}")
+                    in_flight[executor.submit(downloadRoom, ListRoom[index], session, limiter)] = index
+                    index += 1
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    room_index = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"Lỗi khi tải phòng {room_index + 1}: {str(e)}")
+                        result = False
+                    if result:
+                        count += 1
+                        print(f"Đã tải thành công {count}/{total} videos")
+                    else:
+                        print(f"Không tìm thấy video hợp lệ từ phòng {room_index + 1}")
         
     if count < total:
         print(f"Chỉ tải được {count}/{total} videos vì đã hết danh sách phòng")
@@ -129,9 +185,93 @@ def get_random_music():
     random_music = random.choice(music_files)
     return str(random_music)
 
-def process_videos():
+def get_music_for(video_path):
+    """
+    Nhạc nền cho một video nguồn: chọn ngẫu nhiên lần đầu rồi ghi nhớ trong cache dựng video,
+    để lần chạy lại dùng đúng bài nhạc cũ và lấy được video đã dựng từ cache
+    """
+    cache = get_render_cache()
+    if cache is None:
+        return get_random_music()
+    music = cache.get_choice(video_path, "music")
+    if music and os.path.exists(music):
+        return music
+    music = get_random_music()
+    cache.set_choice(video_path, "music", music)
+    return music
+
+def render_pool(workers):
+    """
+    Process pool dựng video, mỗi process nạp lại cùng file config
+    (process tạo bằng spawn, ví dụ trên Windows, không giữ Config của process cha;
+    process tạo bằng fork giữ Config cũ và Config.load thay nó bằng bản mới)
+    """
+    path = Config.get().path
+    if not path:
+        return ProcessPoolExecutor(max_workers=workers)
+    return ProcessPoolExecutor(max_workers=workers, initializer=Config.load, initargs=(path,))
+
+def render_video(video_path, output_dir="VideosDirPath", ffmpeg_threads=None):
+    """
+    Dựng một video theo mẫu StayNow (tăng tốc, nhạc nền, chữ địa chỉ/giá)
+    Hàm ở mức module để có thể chạy trong process pool
+    :return: Đường dẫn video đầu ra, raise RuntimeError nếu lỗi
+    """
+    video_path = Path(video_path)
+    print(f"Đang xử lý video: {video_path.name}")
+
+    address = video_path.stem.split('_')[1]
+    price = format_price(video_path.stem.split('_')[2])
+    video_text = f"{address}/{price}"
+
+    output_path = f"{output_dir}/{video_path.name}"
+    video_editor = VideoEditor(video_path)
+    video_editor.change_speed(1.2)
+    video_editor.add_audio(get_music_for(video_path))
+    video_editor.add_text(str(video_text))
+    if not video_editor.save(output_path, threads=ffmpeg_threads):
+        raise RuntimeError(f"Không thể lưu video {output_path}")
+
+    print(f"Đã xử lý xong video: {video_path}")
+    return output_path
+
+def render_videos(input_videos, workers=1, ffmpeg_threads=None, output_dir="VideosDirPath"):
+    """
+    Dựng nhiều video, song song bằng process pool nếu workers > 1
+    :return: (results, failures) - {tên file: đường dẫn đầu ra}, {tên file: lỗi}
+    """
+    results = {}
+    failures = {}
+
+    if workers <= 1:
+        for video_path in input_videos:
+            try:
+                results[video_path.name] = render_video(video_path, output_dir, ffmpeg_threads)
+            except Exception as e:
+                print(f"Lỗi khi xử lý video {video_path.name}: {str(e)}")
+                failures[video_path.name] = str(e)
+        return results, failures
+
+    with render_pool(workers) as executor:
+        futures = {
+            executor.submit(render_video, str(video_path), output_dir, ffmpeg_threads): video_path
+            for video_path in input_videos
+        }
+        for future in as_completed(futures):
+            video_path = futures[future]
+            try:
+                results[video_path.name] = future.result()
+            except Exception as e:
+                print(f"Lỗi khi xử lý video {video_path.name}: {str(e)}")
+                failures[video_path.name] = str(e)
+    return results, failures
+
+def process_videos(workers=None, ffmpeg_threads=None):
     """
     Xử lý tất cả video trong thư mục VideoInputDirPath và lưu kết quả vào VideosDirPath
+    :param workers: Số process dựng video song song, mặc định lấy từ RENDER_WORKERS trong Config
+    :param ffmpeg_threads: Số thread của libx264 cho mỗi process, mặc định lấy từ RENDER_THREADS
+                           (0 = chia đều số core cho các process)
     """
     # Đảm bảo cả hai thư mục đều tồn tại
     input_dir = Path("VideoInputDirPath")
@@ -147,26 +287,22 @@ def process_videos():
         return False
 
     print(f"Tìm thấy {len(input_videos)} video cần xử lý")
-    
-    for video_path in input_videos:
-        try:
-            print(f"Đang xử lý video: {video_path.name}")
-            
-            address = video_path.stem.split('_')[1]
-            price = format_price(video_path.stem.split('_')[2])
-            video_text = f"{address}/{price}"
-
-            video_editor = VideoEditor(video_path)
-            video_editor.change_speed(1.2)
-            video_editor
-            video_editor.add_audio(get_random_music())
-            video_editor.add_text(str(video_text))
-            video_editor.save(f"VideosDirPath/{video_path.name}")
-            
-            print(f"Đã xử lý xong video: {video_path}")
-        except Exception as e:
-            print(f"Lỗi khi xử lý video {video_path.name}: {str(e)}")
-            continue
+
+    if workers is None:
+        workers = Config.get().render_workers
+    workers = max(1, min(workers, len(input_videos)))
+    if ffmpeg_threads is None:
+        ffmpeg_threads = Config.get().render_threads
+    if not ffmpeg_threads:
+        ffmpeg_threads = max(1, (os.cpu_count() or 1) // workers)
+    if workers > 1:
+        print(f"Dựng video song song với {workers} process, {ffmpeg_threads} thread ffmpeg mỗi process")
+
+    results, failures = render_videos(input_videos, workers, ffmpeg_threads, str(output_dir))
+
+    print(f"Đã xử lý thành công {len(results)}/{len(input_videos)} video")
+    for name, error in failures.items():
+        print(f"  - {name}: {error}")
 
     return True
 
@@ -286,8 +422,178 @@ def format_video_title(video_path: Path, include_hashtags=True):
     
     return title
 
-def upload_videos_to_tiktok():
-    """Upload videos to TikTok with increasing schedule time"""
+def make_upload_attempt(video: Path, progress="", max_retries=3):
+    """
+    Hàm thực hiện một lần upload video với tài khoản được PostScheduler giao: attempt(account, attempt_index).
+    Trả về kết quả của tiktok.upload_video (None là thành công) hoặc exception gặp phải.
+    Sau lỗi "invalid parameters" các lần thử sau dùng tiêu đề không có hashtag
+    """
+    state = {"include_hashtags": True}
+
+    def attempt_upload(current_cookie, attempt):
+        try:
+            # Format tiêu đề video với hashtag
+            title = format_video_title(video, include_hashtags=state["include_hashtags"])
+
+            print(f"\nĐang upload video {video.name} với tài khoản {current_cookie} (lần {attempt + 1}/{max_retries})")
+            print(f"Tiến độ: {progress}")
+            print(f"Tiêu đề: {title}")
+
+            # Upload video - không dùng schedule_time nữa
+            result = tiktok.upload_video(
+                session_user=current_cookie,
+                video=str(video.name),
+                title=title,
+                schedule_time=0,  # Luôn đăng ngay lập tức
+                allow_comment=1,
+                allow_duet=0,
+                allow_stitch=0,
+                visibility_type=0
+            )
+
+            # In ra giá trị trả về để debug
+            print(f"Giá trị trả về từ upload_video: {result}")
+        except (Exception, SystemExit) as e:
+            # upload_video thoát process khi thiếu cookies, chỉ tính là lần thử thất bại
+            print(f"Lỗi khi upload video {video.name}: {str(e).lower()}")
+            result = e
+
+        # Kiểm tra kết quả upload
+        if result is None:  # Nếu hàm trả về None là thành công (vì đã in "Published successfully")
+            print(f"Upload thành công video {video.name}")
+            return result
+
+        print(f"Upload thất bại video {video.name}")
+        if isinstance(result, str) and "invalid parameters" in result.lower():
+            print("Lỗi tham số không hợp lệ, có thể do tiêu đề quá dài")
+            # Thử lại với ít hashtag hơn
+            state["include_hashtags"] = False
+            print(f"Thử lại với tiêu đề không có hashtag: {format_video_title(video, include_hashtags=False)}")
+        return result
+
+    return attempt_upload
+
+def upload_video_with_retries(video: Path, accounts, progress="", max_retries=3, scheduler=None):
+    """
+    Upload một video, thử lại tối đa max_retries lần.
+    Mỗi lần thử dùng tài khoản có thể đăng sớm nhất theo PostScheduler (giới hạn tốc độ đăng,
+    thời gian nghỉ khi bị TikTok chặn "posting too fast") thay vì chờ cố định 10/20/30 giây
+    :param accounts: Một tài khoản hoặc danh sách tài khoản có thể dùng
+    :return: Tài khoản đã đăng thành công, hoặc False
+    """
+    if isinstance(accounts, str):
+        accounts = [accounts]
+    scheduler = scheduler or get_post_scheduler()
+    attempt_upload = make_upload_attempt(video, progress, max_retries)
+
+    for attempt in range(max_retries):
+        current_cookie, delay = scheduler.reserve(accounts)
+        result = False
+        try:
+            if delay > 0:
+                print(f"Tài khoản {current_cookie} có thể đăng sau {int(delay)} giây, đang chờ...")
+                time.sleep(delay)
+            result = attempt_upload(current_cookie, attempt)
+        finally:
+            # Cập nhật giới hạn tốc độ/thời gian nghỉ của tài khoản và trả tài khoản lại
+            scheduler.record(current_cookie, result)
+
+        if result is None:
+            return current_cookie
+
+    print(f"Đã thử {max_retries} lần nhưng không thành công với video {video.name}")
+    return False
+
+async def upload_video_async(engine, video: Path, progress="", max_retries=3):
+    """
+    Phiên bản asyncio của upload_video_with_retries, chạy trong AsyncUploadEngine:
+    thời gian chờ tài khoản được await trên event loop, phần upload chạy trong thread của engine
+    :return: Tài khoản đã đăng thành công, hoặc False
+    """
+    attempt_upload = make_upload_attempt(video, progress, max_retries)
+
+    for attempt in range(max_retries):
+        async with engine.reserve() as slot:
+            slot.result = await engine.call(attempt_upload, slot.account, attempt)
+        if slot.result is None:
+            return slot.account
+
+    print(f"Đã thử {max_retries} lần nhưng không thành công với video {video.name}")
+    return False
+
+def upload_batch_attempt(videos, current_cookie, progress=""):
+    """
+    Upload và đăng một lô video với một tài khoản (tiktok.upload_videos_batch)
+    :return: Kết quả của từng video (None là thành công) hoặc exception gặp phải
+    """
+    try:
+        print(f"\nĐang upload lô {len(videos)} video với tài khoản {current_cookie}")
+        print(f"Tiến độ: {progress}")
+        return tiktok.upload_videos_batch(
+            current_cookie,
+            [(video.name, format_video_title(video)) for video in videos],
+            schedule_time=0,
+            visibility_type=0
+        )
+    except (Exception, SystemExit) as e:
+        print(f"Lỗi khi upload lô video: {str(e).lower()}")
+        return [e] * len(videos)
+
+def upload_batch_with_retries(videos, accounts, progress="", max_retries=3, scheduler=None):
+    """
+    Upload media của nhiều video vào cùng một project của một tài khoản rồi đăng cả lô bằng một request
+    (tiktok.upload_videos_batch, đăng từng video nếu TikTok từ chối lô).
+    Video nào chưa đăng được trong lô sẽ được đăng lại riêng bằng upload_video_with_retries
+    :return: Số video đăng thành công
+    """
+    scheduler = scheduler or get_post_scheduler()
+    current_cookie, delay = scheduler.reserve(accounts, posts=len(videos))
+    results = [False] * len(videos)
+    try:
+        if delay > 0:
+            print(f"Tài khoản {current_cookie} có thể đăng sau {int(delay)} giây, đang chờ...")
+            time.sleep(delay)
+        results = upload_batch_attempt(videos, current_cookie, progress)
+    finally:
+        scheduler.record(current_cookie, next((result for result in results if result is not None), None))
+
+    succeeded = 0
+    for video, result in zip(videos, results):
+        if result is None:
+            print(f"Upload thành công video {video.name}")
+            succeeded += 1
+        elif upload_video_with_retries(video, accounts, progress, max_retries - 1, scheduler=scheduler):
+            succeeded += 1
+    return succeeded
+
+async def upload_batch_async(engine, videos, progress="", max_retries=3):
+    """
+    Phiên bản asyncio của upload_batch_with_retries, lô 1 video được upload như upload_video_async
+    :return: Số video đăng thành công
+    """
+    if len(videos) == 1:
+        return 1 if await upload_video_async(engine, videos[0], progress, max_retries) else 0
+
+    async with engine.reserve(posts=len(videos)) as slot:
+        results = await engine.call(upload_batch_attempt, videos, slot.account, progress)
+        slot.result = next((result for result in results if result is not None), None)
+
+    succeeded = 0
+    for video, result in zip(videos, results):
+        if result is None:
+            print(f"Upload thành công video {video.name}")
+            succeeded += 1
+        elif await upload_video_async(engine, video, progress, max_retries - 1):
+            succeeded += 1
+    return succeeded
+
+def upload_videos_to_tiktok(concurrency=None, batch_size=None):
+    """
+    Upload videos to TikTok with increasing schedule time
+    :param concurrency: Số video upload cùng lúc (mỗi tài khoản tối đa 1 video một lúc),
+                        mặc định lấy từ UPLOAD_CONCURRENCY trong Config
+    :param batch_size: Số video một tài khoản upload rồi đăng cùng lúc bằng một request, mặc định lấy từ UPLOAD_BATCH_SIZE
+    """
     try:
         # Kiểm tra thư mục VideosDirPath
         videos_dir = Path("VideosDirPath")
@@ -314,101 +620,53 @@ def upload_videos_to_tiktok():
         print(f"Tìm thấy {total_videos} video và {len(cookie_files)} tài khoản")
         print("Danh sách tài khoản:", cookie_files)
         
-        # Tính số nhóm upload (mỗi nhóm có số video = số cookie)
-        cookies_count = len(cookie_files)
-        total_groups = (len(videos) + cookies_count - 1) // cookies_count  # Làm tròn lên
-        
         start_time = time.time()
-        
-        # Xử lý từng nhóm video
-        for group in range(total_groups):
-            print(f"\n=== Đang xử lý nhóm {group + 1}/{total_groups} ===")
-            
-            # Tính thời gian còn lại ước tính
-            if group > 0:
-                elapsed_time = time.time() - start_time
-                avg_time_per_group = elapsed_time / group
-                remaining_groups = total_groups - group
-                estimated_remaining = avg_time_per_group * remaining_groups
-                print(f"Ước tính thời gian còn lại: {int(estimated_remaining/60)} phút {int(estimated_remaining%60)} giây")
-            
-            # Lấy các video cho nhóm hiện tại
-            start_idx = group * cookies_count
-            end_idx = min(start_idx + cookies_count, len(videos))
-            group_videos = videos[start_idx:end_idx]
-            
-            # Upload từng video trong nhóm với một cookie khác nhau
-            for i, video in enumerate(group_videos):
-                max_retries = 3
-                retry_count = 0
-                upload_success = False
-                
-                while retry_count < max_retries and not upload_success:
-                    try:
-                        # Format tiêu đề video với hashtag
-                        title = format_video_title(video)
-                        
-                        # Lấy cookie tương ứng
-                        current_cookie = cookie_files[i]
-                        print(f"\nĐang upload video {video.name} với tài khoản {current_cookie}")
-                        print(f"Tiến độ: {successful_uploads + failed_uploads + 1}/{total_videos}")
-                        print(f"Tiêu đề: {title}")
-                        
-                        # Upload video - không dùng schedule_time nữa
-                        result = tiktok.upload_video(
-                            session_user=current_cookie,
-                            video=str(video.name),
-                            title=title,
-                            schedule_time=0,  # Luôn đăng ngay lập tức
-                            allow_comment=1,
-                            allow_duet=0,
-                            allow_stitch=0,
-                            visibility_type=0
-                        )
-                        
-                        # In ra giá trị trả về để debug
-                        print(f"Giá trị trả về từ upload_video: {result}")
-                        
-                        # Kiểm tra kết quả upload
-                        if result is None:  # Nếu hàm trả về None là thành công (vì đã in "Published successfully")
-                            print(f"Upload thành công video {video.name}")
-                            upload_success = True
-                            successful_uploads += 1
-                            break
-                        else:
-                            print(f"Upload thất bại video {video.name}")
-                            if isinstance(result, str) and "invalid parameters" in result.lower():
-                                print("Lỗi tham số không hợp lệ, có thể do tiêu đề quá dài")
-                                # Thử lại với ít hashtag hơn
-                                title = format_video_title(video, include_hashtags=False)
-                                print(f"Thử lại với tiêu đề không có hashtag: {title}")
-                            
-                            # Tính thời gian chờ tăng dần
-                            retry_delay = (retry_count + 1) * 10  # 10s, 20s, 30s
-                            retry_count += 1
-                            if retry_count < max_retries:
-                                print(f"Thử lại lần {retry_count + 1} sau {retry_delay} giây...")
-                                time.sleep(retry_delay)
-                            
-                    except Exception as e:
-                        error_msg = str(e).lower()
-                        print(f"Lỗi khi upload video {video.name}: {error_msg}")
-                        
-                        # Tính thời gian chờ tăng dần cho cả lỗi kết nối
-                        retry_delay = (retry_count + 1) * 10
-                        if "connection" in error_msg or "timeout" in error_msg:
-                            print("Lỗi kết nối, đợi lâu hơn trước khi thử lại...")
-                            retry_delay *= 2  # Tăng gấp đôi thời gian chờ cho lỗi kết nối (20s, 40s, 60s)
-                        
-                        retry_count += 1
-                        if retry_count < max_retries:
-                            print(f"Thử lại lần {retry_count + 1} sau {retry_delay} giây...")
-                            time.sleep(retry_delay)
-                        continue
-                
-                if not upload_success:
-                    print(f"Đã thử {max_retries} lần nhưng không thành công với video {video.name}")
-                    failed_uploads += 1
+
+        if concurrency is None:
+            concurrency = Config.get().upload_concurrency
+        # Mỗi video được giao cho tài khoản có thể đăng sớm nhất, mỗi tài khoản chỉ đăng một video một lúc
+        scheduler = get_post_scheduler()
+
+        if batch_size is None:
+            batch_size = Config.get().upload_batch_size
+        batch_size = max(1, batch_size)
+        # Mỗi lô được đăng bằng một request, lô 1 video là đăng từng video như trước
+        batches = [videos[i:i + batch_size] for i in range(0, total_videos, batch_size)]
+
+        def batch_progress(batch, first_index):
+            if len(batch) == 1:
+                return f"{first_index + 1}/{total_videos}"
+            return f"{first_index + 1}-{first_index + len(batch)}/{total_videos}"
+
+        def upload_batch(batch, first_index):
+            if len(batch) == 1:
+                return 1 if upload_video_with_retries(batch[0], cookie_files, batch_progress(batch, first_index),
+                                                      scheduler=scheduler) else 0
+            return upload_batch_with_retries(batch, cookie_files, batch_progress(batch, first_index), scheduler=scheduler)
+
+        if concurrency > 1:
+            # Các tài khoản đăng song song trên một event loop asyncio, mỗi tài khoản tối đa 1 video một lúc
+            engine = AsyncUploadEngine(cookie_files, concurrency, scheduler)
+            print(f"Upload song song tối đa {engine.max_concurrency} {'lô' if batch_size > 1 else 'video'} cùng lúc")
+            jobs = [
+                functools.partial(upload_batch_async, videos=batch, progress=batch_progress(batch, idx * batch_size))
+                for idx, batch in enumerate(batches)
+            ]
+            for batch, succeeded in zip(batches, engine.run(jobs)):
+                successful_uploads += succeeded
+                failed_uploads += len(batch) - succeeded
+        else:
+            for idx, batch in enumerate(batches):
+                # Tính thời gian còn lại ước tính
+                done = successful_uploads + failed_uploads
+                if done > 0:
+                    elapsed_time = time.time() - start_time
+                    estimated_remaining = elapsed_time / done * (total_videos - done)
+                    print(f"Ước tính thời gian còn lại: {int(estimated_remaining/60)} phút {int(estimated_remaining%60)} giây")
+
+                succeeded = upload_batch(batch, idx * batch_size)
+                successful_uploads += succeeded
+                failed_uploads += len(batch) - succeeded
         
         # Sau khi upload hoàn tất tất cả video
         total_time = int(time.time() - start_time)
@@ -438,7 +696,170 @@ def count_cookies_files():
     print(f"Số file cookies: {count}")
     return count
 
+def archive_job_files(job, archive_dir=Path("ArchivedVideos")):
+    """Chuyển video đã upload của một job vào thư mục archive trong ngày và xóa video gốc"""
+    archive_path = archive_dir / datetime.now().strftime("%Y%m%d")
+    archive_path.mkdir(parents=True, exist_ok=True)
+    output = Path(job["output_path"])
+    if output.exists():
+        target_path = archive_path / output.name
+        counter = 1
+        while target_path.exists():
+            target_path = archive_path / f"{output.stem}_{counter}{output.suffix}"
+            counter += 1
+        shutil.move(str(output), str(target_path))
+    if job["input_path"] and os.path.exists(job["input_path"]):
+        os.remove(job["input_path"])
+    return True
+
+def run_jobs(total, rooms):
+    """
+    Chạy tải → dựng → upload → archive theo từng job lưu trong JobStore (SQLite).
+    Mỗi bước có worker riêng lấy việc từ store, nên video đầu tiên tải xong là được dựng ngay,
+    dựng xong là upload ngay. Nếu chương trình bị dừng giữa chừng, lần chạy sau tiếp tục
+    từ trạng thái đã lưu thay vì làm lại từ đầu.
+    :param total: Số video cần tải trong lần chạy này
+    """
+    store = JobStore()
+    store.reset_leases()
+    added = store.add_rooms(rooms)
+    print(f"Đã thêm {added} phòng mới vào hàng đợi, trạng thái hiện tại: {store.summary()}")
+
+    cookie_files = get_cookie_files()
+    if not cookie_files:
+        print("Không tìm thấy file cookie nào!")
+        return False
+
+    config = Config.get()
+    # Video đã tải/dựng từ lần chạy trước vẫn được tính vào total
+    quota = Quota(max(0, total - store.count(jobs.DOWNLOADED, jobs.RENDERED)))
+    session = get_download_session()
+    limiter = HostLimiter(config.download_per_host)
+    render_workers = max(1, config.render_workers)
+    ffmpeg_threads = config.render_threads or max(1, (os.cpu_count() or 1) // render_workers)
+    upload_workers = max(1, min(config.upload_concurrency, len(cookie_files)))
+    Path("VideosDirPath").mkdir(exist_ok=True)
+
+    pool = render_pool(render_workers) if render_workers > 1 else None
+
+    def download(job):
+        path = downloadRoom(job["room"], session, limiter)
+        return path and {"input_path": path}
+
+    def render(job):
+        if pool is not None:
+            output = pool.submit(render_video, job["input_path"], "VideosDirPath", ffmpeg_threads).result()
+        else:
+            output = render_video(job["input_path"], "VideosDirPath", ffmpeg_threads)
+        return {"output_path": output}
+
+    def upload(job):
+        # Tài khoản được PostScheduler chọn theo giới hạn tốc độ đăng
+        account = upload_video_with_retries(Path(job["output_path"]), cookie_files, progress=job["room_id"])
+        return account and {"account": account}
+
+    def start(stage, state, handler, count, upstream_done, done, quota=None):
+        threads = [
+            Thread(target=run_stage, args=(store, state, handler, worker_name(stage, i), upstream_done, quota))
+            for i in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+
+        def finish():
+            for thread in threads:
+                thread.join()
+            done.set()
+        Thread(target=finish).start()
+
+    start_time = time.time()
+    no_upstream = Event()
+    no_upstream.set()
+    downloaded, rendered, uploaded, archived = Event(), Event(), Event(), Event()
+    try:
+        start("download", jobs.PENDING, download, config.download_workers, no_upstream, downloaded, quota)
+        start("render", jobs.DOWNLOADED, render, render_workers, downloaded, rendered)
+        start("upload", jobs.RENDERED, upload, upload_workers, rendered, uploaded)
+        start("archive", jobs.UPLOADED, archive_job_files, 1, uploaded, archived)
+        archived.wait()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    total_time = int(time.time() - start_time)
+    print(f"\n=== Hoàn tất sau {total_time//60} phút {total_time%60} giây ===")
+    print(f"Trạng thái các job: {store.summary()}")
+    store.close()
+    return True
+
+def run_pipeline(total, rooms):
+    """
+    Chạy tải, dựng và upload cùng lúc trong một process, nối với nhau bằng hàng đợi có giới hạn.
+    Bước nào chậm hơn sẽ làm đầy hàng đợi phía trước và các bước trước phải chờ (backpressure),
+    nên tổng thời gian xấp xỉ thời gian của bước chậm nhất thay vì tổng của cả ba bước.
+    :param total: Số video cần tải
+    """
+    cookie_files = get_cookie_files()
+    if not cookie_files:
+        print("Không tìm thấy file cookie nào!")
+        return False
+
+    config = Config.get()
+    session = get_download_session()
+    limiter = HostLimiter(config.download_per_host)
+    render_workers = max(1, config.render_workers)
+    ffmpeg_threads = config.render_threads or max(1, (os.cpu_count() or 1) // render_workers)
+    upload_workers = max(1, min(config.upload_concurrency, len(cookie_files)))
+    Path("VideosDirPath").mkdir(exist_ok=True)
+
+    uploaded = []
+
+    def download(room):
+        return downloadRoom(room, session, limiter) or None
+
+    pool = render_pool(render_workers) if render_workers > 1 else None
+
+    def render(input_path):
+        if pool is not None:
+            return pool.submit(render_video, input_path, "VideosDirPath", ffmpeg_threads).result()
+        return render_video(input_path, "VideosDirPath", ffmpeg_threads)
+
+    def upload(output_path):
+        # Mỗi tài khoản chỉ upload một video một lúc, PostScheduler chọn tài khoản đăng được sớm nhất
+        progress = f"{len(uploaded) + 1}/{total}"
+        if upload_video_with_retries(Path(output_path), cookie_files, progress):
+            uploaded.append(output_path)
+            return output_path
+        return None
+
+    start_time = time.time()
+    pipeline = Pipeline([
+        Stage("download", download, workers=config.download_workers, limit=total),
+        Stage("render", render, workers=render_workers),
+        Stage("upload", upload, workers=upload_workers),
+    ])
+    try:
+        pipeline.run(rooms)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    total_time = int(time.time() - start_time)
+    print(f"\n=== Hoàn tất sau {total_time//60} phút {total_time%60} giây ===")
+    print(f"Đã tải: {pipeline.stages[0].done}/{total}")
+    print(f"Đã dựng: {pipeline.stages[1].done}")
+    print(f"Upload thành công: {len(uploaded)}")
+    for stage in pipeline.stages:
+        for item, error in stage.failures:
+            print(f"  - [{stage.name}] {item if isinstance(item, str) else item.get('id')}: {error}")
+
+    cleanup_after_upload(should_archive=True)
+    return True
+
 if __name__ == "__main__":
+    # Đọc cấu hình (số worker, cache, lịch đăng...) như cli.py
+    Config.load("./config.txt")
+
     # Bước 1: Tải video từ API
     cookies_count = count_cookies_files()
     if cookies_count == 0:
@@ -446,12 +867,32 @@ if __name__ == "__main__":
         exit(1)
         
     total = 3 * cookies_count  
-    ListRoom = get_rooms_from_api()
+    # --changed-only: chỉ lấy các phòng mới hoặc đã thay đổi kể từ lần chạy trước
+    changed_only = "--changed-only" in sys.argv[1:]
+    ListRoom = get_rooms_from_api(changed_only=changed_only)
     
+    if ListRoom is not None and not ListRoom and changed_only:
+        print("Không có phòng mới hoặc thay đổi kể từ lần chạy trước")
+        exit(0)
+
     if not ListRoom:
         print("Không thể lấy danh sách phòng từ API")
         exit(1)
 
+    if "--jobs" in sys.argv[1:]:
+        # Chạy các bước song song theo job, có thể tiếp tục sau khi bị dừng
+        if not run_jobs(total, ListRoom):
+            exit(1)
+        print("\nHoàn thành tất cả các bước!")
+        exit(0)
+
+    if "--pipeline" in sys.argv[1:]:
+        # Tải, dựng và upload chồng lên nhau thay vì lần lượt từng bước
+        if not run_pipeline(total, ListRoom):
+            exit(1)
+        print("\nHoàn thành tất cả các bước!")
+        exit(0)
+
     if not downAllVideo(ListRoom, total):
         print("Lỗi khi tải video từ API")
         exit(1)
@@ -0,0 +1,162 @@
+import mmap, os, random, time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from tiktok_uploader.bot_utils import crc32, print_error
+
+
+# Size of a single part of the multipart upload (5 MB).
+PART_SIZE = 5242880
+
+
+class VideoParts:
+	"""Memory-mapped view of a video file split into upload parts.
+
+	Parts are only materialised when read, so iterating over a large video keeps
+	at most one part (plus the one being sent) in memory."""
+
+	def __init__(self, path, part_size=PART_SIZE):
+		self.path = path
+		self.part_size = part_size
+		self.file_size = os.path.getsize(path)
+		self._file = None
+		self._mmap = None
+
+	def __enter__(self):
+		self.open()
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	def __len__(self):
+		return (self.file_size + self.part_size - 1) // self.part_size
+
+	def open(self):
+		if self._file is None:
+			self._file = open(self.path, "rb")
+			# mmap cannot map an empty file.
+			if self.file_size > 0:
+				self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+	def close(self):
+		if self._mmap is not None:
+			self._mmap.close()
+			self._mmap = None
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+
+	def read(self, part_number):
+		"""Read part `part_number` (1-based) from the mapped file."""
+		if part_number < 1 or part_number > len(self):
+			raise IndexError(f"Part {part_number} out of range (1-{len(self)})")
+		self.open()
+		start = (part_number - 1) * self.part_size
+		return self._mmap[start: start + self.part_size]
+
+	def __iter__(self):
+		"""Yield `(part_number, chunk, crc)` for every part, computing the CRC32 while streaming."""
+		for part_number in range(1, len(self) + 1):
+			chunk = self.read(part_number)
+			yield part_number, chunk, crc32(chunk)
+
+
+def part_url(upload_host, store_uri, upload_id, part_number):
+	return f"https://{upload_host}/{store_uri}?partNumber={part_number}&uploadID={upload_id}&phase=transfer"
+
+
+def check_part_response(r, crc):
+	"""Validate the upload node's answer for a single part.
+
+	The node replies with `{"code": 2000, "data": {"crc32": ...}}` on success; a
+	different code or a CRC that does not match the one we sent means the part
+	has to be sent again."""
+	if r.status_code != 200:
+		return False
+	try:
+		body = r.json()
+	except ValueError:
+		return True
+	if not isinstance(body, dict):
+		return True
+	if body.get("code", 2000) != 2000:
+		return False
+	returned_crc = (body.get("data") or {}).get("crc32")
+	return returned_crc is None or str(returned_crc).lower() == crc
+
+
+def upload_part(session, parts, part_number, upload_host, store_uri, upload_id, video_auth, retries=3, backoff=1.0):
+	"""Upload a single part, retrying with exponential backoff.
+
+	Returns the CRC32 of the part, or None if every attempt failed."""
+	chunk = parts.read(part_number)
+	crc = crc32(chunk)
+	url = part_url(upload_host, store_uri, upload_id, part_number)
+	headers = {
+		"Authorization": video_auth,
+		"Content-Type": "application/octet-stream",
+		"Content-Disposition": 'attachment; filename="undefined"',
+		"Content-Crc32": crc,
+	}
+	for attempt in range(retries + 1):
+		try:
+			r = session.post(url, headers=headers, data=chunk)
+			if check_part_response(r, crc):
+				return crc
+			print_error(url, r)
+		except Exception as e:
+			print(f"[-] Part {part_number} failed: {str(e)}")
+		if attempt < retries:
+			delay = backoff * (2 ** attempt) + random.uniform(0, backoff)
+			print(f"[-] Retrying part {part_number} in {delay:.1f}s ({attempt + 1}/{retries})")
+			time.sleep(delay)
+	return None
+
+
+def upload_parts(session, parts, upload_host, store_uri, upload_id, video_auth, workers=4, retries=3, backoff=1.0, completed=None, on_part=None):
+	"""Upload every part of `parts` with at most `workers` parts in flight.
+
+	Parts are only read when a worker picks them up, so memory stays bounded by
+	the number of workers. Parts listed in `completed` (`{part_number: crc}`) are
+	not sent again, and `on_part(part_number, crc)` is called for every part the
+	upload node accepts. Returns the list of CRCs ordered by part number, or
+	None if a part could not be uploaded."""
+	completed = completed or {}
+	crcs = [completed.get(n) for n in range(1, len(parts) + 1)]
+	pending = iter([n for n in range(1, len(parts) + 1) if crcs[n - 1] is None])
+	if completed:
+		print(f"Resuming upload: {len(parts) - sum(c is None for c in crcs)}/{len(parts)} parts already sent")
+	in_flight = {}
+	failed = False
+
+	with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+		def submit_next():
+			part_number = next(pending, None)
+			if part_number is None:
+				return False
+			future = executor.submit(upload_part, session, parts, part_number, upload_host, store_uri, upload_id, video_auth, retries, backoff)
+			in_flight[future] = part_number
+			return True
+
+		for _ in range(max(1, workers)):
+			if not submit_next():
+				break
+
+		while in_flight:
+			done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+			for future in done:
+				part_number = in_flight.pop(future)
+				crc = future.result()
+				if crc is None:
+					print(f"[-] Could not upload part {part_number}/{len(parts)}")
+					failed = True
+				else:
+					crcs[part_number - 1] = crc
+					if on_part:
+						on_part(part_number, crc)
+				# Stop feeding new parts once one has failed for good.
+				if not failed:
+					submit_next()
+
+	if failed:
+		return None
+	return crcs
@@ -0,0 +1,140 @@
+from .Config import Config
+import queue
+import threading
+
+# Marks the end of a stage's input
+_DONE = object()
+
+
+class Stage:
+    """
+    One step of a Pipeline: `func(item)` runs on `workers` threads and returns the
+    item handed to the next stage (None drops it). Once `limit` items went through,
+    the stage stops taking new ones and the pipeline stops feeding its source.
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=None, limit=None):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.limit = limit
+        self.done = 0
+        self.in_flight = 0
+        self.failures = []
+        self._cond = threading.Condition()
+
+    def _reserve(self):
+        """Wait until an item may be processed, False once the limit is reached"""
+        if self.limit is None:
+            return True
+        with self._cond:
+            # Items in flight may still fail, so wait for them before giving up
+            while self.done < self.limit and self.done + self.in_flight >= self.limit:
+                self._cond.wait()
+            if self.done >= self.limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def _release(self, succeeded):
+        with self._cond:
+            if self.limit is not None:
+                self.in_flight -= 1
+            if succeeded:
+                self.done += 1
+            self._cond.notify_all()
+
+    @property
+    def exhausted(self):
+        return self.limit is not None and self.done >= self.limit
+
+
+class Pipeline:
+    """
+    In-process producer/consumer pipeline: the stages run at the same time and
+    hand their items over through bounded queues. A stage that falls behind fills
+    its input queue, which blocks the stages before it (backpressure), so at most
+    `queue_size` items wait between two stages and the whole batch takes about
+    as long as its slowest stage.
+    """
+
+    def __init__(self, stages, queue_size=None):
+        self.stages = stages
+        self.queue_size = queue_size or Config.get().pipeline_queue_size
+        self.queues = [queue.Queue(maxsize=stage.queue_size or self.queue_size) for stage in stages]
+        self.results = []
+        self._stop_feeding = threading.Event()
+
+    def _feed(self, items):
+        first = self.queues[0]
+        for item in items:
+            if self._stop_feeding.is_set():
+                break
+            # put() with a timeout so a stage reaching its limit also unblocks the feeder
+            while not self._stop_feeding.is_set():
+                try:
+                    first.put(item, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+        for _ in range(self.stages[0].workers):
+            first.put(_DONE)
+
+    def _work(self, index):
+        stage = self.stages[index]
+        inbox = self.queues[index]
+        outbox = self.queues[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                return
+            if not stage._reserve():
+                # Limit reached: drain what is left without processing it
+                self._stop_feeding.set()
+                continue
+            try:
+                result = stage.func(item)
+            except Exception as e:
+                print(f"[{stage.name}] failed: {str(e)}")
+                stage.failures.append((item, str(e)))
+                result = None
+            stage._release(succeeded=result is not None)
+            if stage.exhausted:
+                self._stop_feeding.set()
+            if result is None:
+                continue
+            if outbox is not None:
+                outbox.put(result)
+            else:
+                self.results.append(result)
+
+    def _run_stage(self, index):
+        stage = self.stages[index]
+        threads = [
+            threading.Thread(target=self._work, args=(index,), name=f"{stage.name}-{i}")
+            for i in range(stage.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if index + 1 < len(self.stages):
+            for _ in range(self.stages[index + 1].workers):
+                self.queues[index + 1].put(_DONE)
+
+    def run(self, items):
+        """
+        Push `items` through every stage
+        :return: the items that came out of the last stage
+        """
+        runners = [threading.Thread(target=self._feed, args=(items,), name="pipeline-feed")]
+        runners += [
+            threading.Thread(target=self._run_stage, args=(i,), name=f"pipeline-{stage.name}")
+            for i, stage in enumerate(self.stages)
+        ]
+        for runner in runners:
+            runner.start()
+        for runner in runners:
+            runner.join()
+        return self.results
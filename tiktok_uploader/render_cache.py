@@ -0,0 +1,148 @@
+from .Config import Config
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+# Edit fields that reference files, fingerprinted by content instead of by path
+_FILE_FIELDS = ("path", "font")
+
+# Content digests of files already hashed by this process, by (path, size, mtime)
+_digests = {}
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """sha256 of a file's content, memoized while the file is unchanged"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    memo_key = (path, stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _digests:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        _digests[memo_key] = digest.hexdigest()
+    return _digests[memo_key]
+
+
+def recipe(edits):
+    """Canonical form of an edit list, file references replaced by their content digest"""
+    canonical = []
+    for edit in edits:
+        edit = dict(edit)
+        for field in _FILE_FIELDS:
+            if field in edit and os.path.isfile(str(edit[field])):
+                edit[field] = file_digest(edit[field])
+        canonical.append(edit)
+    return canonical
+
+
+class RenderCache:
+    """
+    Cache of rendered videos, keyed by the content of the source video and
+    the edits applied to it, so an unchanged input is never rendered twice.
+    Outputs are stored as <key><ext> and hard-linked (or copied) into place,
+    the cache is trimmed to `max_bytes`, least recently used outputs first.
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root or Config.get().render_cache_dir
+        self.max_bytes = max_bytes or Config.get().render_cache_max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def key(source_path, edits, **settings):
+        """Fingerprint of a render: source content, edit recipe and output settings"""
+        payload = json.dumps(
+            {"source": file_digest(source_path), "edits": recipe(edits), "settings": settings},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _choices_path(self, source_path):
+        # Dot-prefixed, so eviction leaves it alone
+        return os.path.join(self.root, ".choices", f"{file_digest(source_path)}.json")
+
+    def get_choice(self, source_path, name):
+        """Random choice (e.g. the music track) remembered for the source video, None if there is none"""
+        try:
+            with open(self._choices_path(source_path), "r") as f:
+                return json.load(f).get(name)
+        except (OSError, ValueError):
+            return None
+
+    def set_choice(self, source_path, name, value):
+        """Remember a random choice made for the source video, so a re-run renders the same recipe"""
+        path = self._choices_path(source_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            with open(path, "r") as f:
+                choices = json.load(f)
+        except (OSError, ValueError):
+            choices = {}
+        choices[name] = value
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(choices, f)
+        os.replace(tmp_path, path)
+
+    def _entry_path(self, key, ext):
+        return os.path.join(self.root, f"{key}{ext}")
+
+    def get(self, key, output_path):
+        """Place the cached output of `key` at `output_path`, returns False on a miss"""
+        entry_path = self._entry_path(key, os.path.splitext(output_path)[1])
+        if not os.path.exists(entry_path):
+            return False
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        try:
+            os.link(entry_path, output_path)
+        except OSError:
+            shutil.copyfile(entry_path, output_path)
+        # Mark the entry as recently used for eviction
+        os.utime(entry_path)
+        return True
+
+    def put(self, key, output_path):
+        """Store a freshly rendered output under `key`"""
+        entry_path = self._entry_path(key, os.path.splitext(output_path)[1])
+        # Several render processes may share the cache, publish the entry atomically
+        tmp_path = os.path.join(self.root, f".{uuid.uuid4().hex}.tmp")
+        try:
+            os.link(output_path, tmp_path)
+        except OSError:
+            shutil.copyfile(output_path, tmp_path)
+        os.replace(tmp_path, entry_path)
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        for name in os.listdir(self.root):
+            if name.startswith("."):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.root, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def get_render_cache():
+    """RenderCache from Config, None when RENDER_CACHE_DIR is empty"""
+    if not Config.get().render_cache_dir:
+        return None
+    return RenderCache()
@@ -0,0 +1,204 @@
+from .Config import Config
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import requests
+
+
+class RoomCache:
+    """
+    Local SQLite cache of StayNow rooms.
+
+    Keeps every room seen with a fingerprint of its data (to detect updates),
+    the ETag/Last-Modified of every fetched page (for conditional requests) and
+    the time of each run, so a run can ask for the rooms changed since the last one.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or Config.get().rooms_cache_path
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS rooms (
+                    id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    first_seen REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    room_ids TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    started_at REAL NOT NULL,
+                    finished_at REAL
+                );
+            """)
+
+    def close(self):
+        self._conn.close()
+
+    def start_run(self):
+        with self._lock, self._conn:
+            return self._conn.execute("INSERT INTO runs (started_at) VALUES (?)", (time.time(),)).lastrowid
+
+    def finish_run(self, run_id):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE runs SET finished_at = ? WHERE id = ?", (time.time(), run_id))
+
+    def last_run_finished_at(self, before_run=None):
+        """End time of the last finished run (before `before_run`), 0 if there is none"""
+        query = "SELECT MAX(finished_at) FROM runs WHERE finished_at IS NOT NULL"
+        params = ()
+        if before_run is not None:
+            query += " AND id < ?"
+            params = (before_run,)
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+        return row[0] or 0
+
+    @staticmethod
+    def fingerprint(room):
+        return hashlib.sha1(json.dumps(room, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def upsert(self, room):
+        """Store `room`, returns True if it is new or its data changed"""
+        room_id = str(room.get("id"))
+        fingerprint = self.fingerprint(room)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT fingerprint FROM rooms WHERE id = ?", (room_id,)).fetchone()
+            if row is None:
+                self._conn.execute(
+                    "INSERT INTO rooms (id, data, fingerprint, first_seen, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (room_id, json.dumps(room), fingerprint, now, now),
+                )
+                return True
+            if row["fingerprint"] != fingerprint:
+                self._conn.execute(
+                    "UPDATE rooms SET data = ?, fingerprint = ?, updated_at = ? WHERE id = ?",
+                    (json.dumps(room), fingerprint, now, room_id),
+                )
+                return True
+        return False
+
+    def get_rooms(self, room_ids):
+        with self._lock:
+            rows = {
+                row["id"]: json.loads(row["data"])
+                for row in self._conn.execute(
+                    f"SELECT id, data FROM rooms WHERE id IN ({','.join('?' * len(room_ids))})", room_ids
+                )
+            }
+        return [rows[room_id] for room_id in room_ids if room_id in rows]
+
+    def changed_since(self, timestamp):
+        """Rooms created or updated after `timestamp`"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM rooms WHERE updated_at > ? ORDER BY updated_at", (timestamp,)
+            ).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def page(self, url):
+        with self._lock:
+            return self._conn.execute("SELECT * FROM pages WHERE url = ?", (url,)).fetchone()
+
+    def save_page(self, url, etag, last_modified, room_ids):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, room_ids) VALUES (?, ?, ?, ?)",
+                (url, etag, last_modified, json.dumps(room_ids)),
+            )
+
+
+def _page_items(body):
+    """The API returns the rooms directly, but also accept a {"data": [...]} envelope"""
+    if isinstance(body, dict):
+        body = body.get("data") or body.get("rooms") or []
+    return body if isinstance(body, list) else []
+
+
+def iter_rooms(cache, session=None, page_size=None, max_pages=1000, max_rooms=None):
+    """
+    Stream rooms page by page from the StayNow API (`?limit=&page=`).
+
+    Every page is requested with If-None-Match/If-Modified-Since; on 304 its
+    rooms are served from the cache. Fetched rooms are upserted into the cache.
+    Stops after `max_rooms` rooms (None for every room), at the first short or
+    empty page, or when the API repeats a page.
+    """
+    session = session or requests
+    page_size = page_size or Config.get().rooms_page_size
+    if max_rooms is not None:
+        page_size = min(page_size, max_rooms)
+    base_url = Config.get().rooms_api_url
+    previous_ids = None
+    remaining = max_rooms
+
+    for page in range(1, max_pages + 1):
+        url = f"{base_url}?limit={page_size}&page={page}"
+        headers = {}
+        cached = cache.page(url)
+        if cached is not None:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        response = session.get(url, headers=headers, timeout=30)
+        if response.status_code == 304 and cached is not None:
+            room_ids = json.loads(cached["room_ids"])
+            rooms = cache.get_rooms(room_ids)
+        elif response.status_code == 200:
+            rooms = _page_items(response.json())
+            room_ids = [str(room.get("id")) for room in rooms]
+            for room in rooms:
+                cache.upsert(room)
+            cache.save_page(url, response.headers.get("ETag"), response.headers.get("Last-Modified"), room_ids)
+        else:
+            raise RuntimeError(f"Rooms API returned HTTP {response.status_code} for {url}")
+
+        if not room_ids or room_ids == previous_ids:
+            # Empty page, or the API ignores the page parameter
+            return
+        if remaining is not None:
+            rooms = rooms[:remaining]
+            remaining -= len(rooms)
+        yield from rooms
+        if len(room_ids) < page_size or remaining == 0:
+            return
+        previous_ids = room_ids
+
+
+def fetch_rooms(cache=None, changed_only=False, page_size=None, max_rooms=None):
+    """
+    Fetch the rooms, updating the local cache
+    :param changed_only: only return rooms created or updated since the last finished run,
+                         every page is checked (unchanged pages are answered with 304)
+    :param max_rooms: maximum number of rooms returned (the first ones of the API, or the first
+                      changed ones), None for every room
+    """
+    own_cache = cache is None
+    cache = cache or RoomCache()
+    try:
+        run_id = cache.start_run()
+        since = cache.last_run_finished_at(before_run=run_id)
+        rooms = list(iter_rooms(cache, page_size=page_size, max_rooms=None if changed_only else max_rooms))
+        cache.finish_run(run_id)
+        if changed_only:
+            fetched = {str(room.get("id")) for room in rooms}
+            rooms = [room for room in cache.changed_since(since) if str(room.get("id")) in fetched]
+            return rooms if max_rooms is None else rooms[:max_rooms]
+        return rooms
+    finally:
+        if own_cache:
+            cache.close()
@@ -0,0 +1,167 @@
+from .Config import Config
+import json
+import os
+import re
+import threading
+import time
+
+# Failure messages meaning the account (or its IP) is posting too often
+_THROTTLE_PATTERNS = (
+    "posting too fast",
+    "take a rest",
+    "too many requests",
+    "rate limit",
+    "frequency",
+    "http 429",
+)
+
+# "try again in 5 minutes", "retry after 30 seconds"...
+_RETRY_AFTER = re.compile(r"(?:in|after)\s+(\d+)\s*(second|sec|s|minute|min|m|hour|h)\w*", re.IGNORECASE)
+_UNITS = {"s": 1, "sec": 1, "second": 1, "m": 60, "min": 60, "minute": 60, "h": 3600, "hour": 3600}
+
+# Cap of the exponential backoff after repeated generic failures
+_MAX_FAILURE_BACKOFF = 300
+
+
+def parse_throttle(result):
+    """
+    Backoff hint from a failed upload_video result
+    :return: seconds to wait if the failure is a throttle, 0 if it is one without a delay, None otherwise
+    """
+    if not isinstance(result, str):
+        return None
+    message = result.lower()
+    if not any(pattern in message for pattern in _THROTTLE_PATTERNS):
+        return None
+    retry_after = _RETRY_AFTER.search(message)
+    if retry_after:
+        return int(retry_after.group(1)) * _UNITS[retry_after.group(2).lower()]
+    return 0
+
+
+class PostScheduler:
+    """
+    Decides which account posts next and when.
+
+    Every account has a cooldown set when TikTok throttles it ("You are posting
+    too fast") or an upload fails. With POST_INTERVAL > 0 it also has a token bucket
+    (POST_BURST posts, refilled at one post per POST_INTERVAL seconds); 0, the
+    default, does not limit the posting rate. `reserve` hands out the idle account
+    that can post soonest instead of sleeping on a fixed one.
+    The state is saved to POST_SCHEDULE_PATH so it survives restarts.
+
+    Buckets are per account only: uploads never go through a proxy (main.py does
+    not pass one to upload_video), so there is no per-proxy budget to share.
+    """
+
+    def __init__(self, path=None, interval=None, burst=None, throttle_cooldown=None):
+        config = Config.get()
+        self.path = path or config.post_schedule_path
+        self.interval = config.post_interval if interval is None else interval
+        self.burst = burst or config.post_burst
+        self.throttle_cooldown = throttle_cooldown or config.post_throttle_cooldown
+        self._busy = set()
+        self._cond = threading.Condition()
+        self._state = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._state, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def _bucket(self, account, now):
+        """State of `account` with its tokens refilled up to `now`"""
+        bucket = self._state.setdefault(account, {
+            "tokens": self.burst, "updated_at": now, "cooldown_until": 0, "throttles": 0, "failures": 0,
+        })
+        if self.interval > 0:
+            elapsed = max(0, now - bucket["updated_at"])
+            bucket["tokens"] = min(self.burst, bucket["tokens"] + elapsed / self.interval)
+        else:
+            bucket["tokens"] = self.burst
+        bucket["updated_at"] = now
+        return bucket
+
+    def ready_at(self, account, now=None):
+        """Earliest time `account` may post"""
+        now = now or time.time()
+        bucket = self._bucket(account, now)
+        ready = max(now, bucket["cooldown_until"])
+        if bucket["tokens"] < 1:
+            ready = max(ready, now + (1 - bucket["tokens"]) * self.interval)
+        return ready
+
+    def reserve(self, accounts, posts=1):
+        """
+        Pick the idle account of `accounts` that can post soonest and take `posts` of its tokens,
+        blocks while every account is busy
+        :return: (account, seconds to wait before posting)
+        """
+        with self._cond:
+            while True:
+                idle = [account for account in accounts if account not in self._busy]
+                if idle:
+                    break
+                self._cond.wait()
+            now = time.time()
+            account = min(idle, key=lambda a: self.ready_at(a, now))
+            delay = max(0, self.ready_at(account, now) - now)
+            if self.interval > 0:
+                # Tokens can go negative, the next post then waits for the refill
+                self._state[account]["tokens"] -= posts
+            self._busy.add(account)
+            self._save()
+            return account, delay
+
+    def record(self, account, result):
+        """
+        Update the state of `account` after an upload and make it available again
+        :param result: upload_video result (None on success) or the exception raised
+        """
+        with self._cond:
+            now = time.time()
+            throttle = parse_throttle(result if isinstance(result, str) else None)
+            bucket = self._bucket(account, now)
+            if result is None:
+                bucket["throttles"] = 0
+                bucket["failures"] = 0
+            elif throttle is not None:
+                # Back off harder each time TikTok throttles again
+                bucket["throttles"] += 1
+                cooldown = throttle or self.throttle_cooldown * 2 ** (bucket["throttles"] - 1)
+                bucket["cooldown_until"] = max(bucket["cooldown_until"], now + cooldown)
+                if self.interval > 0:
+                    bucket["tokens"] = min(bucket["tokens"], 0)
+                print(f"[-] {account} is throttled, cooling down for {int(cooldown)}s")
+            else:
+                # Generic failure: 10s, 20s, 40s... (twice as long for connection errors)
+                bucket["failures"] += 1
+                cooldown = min(_MAX_FAILURE_BACKOFF, 10 * 2 ** (bucket["failures"] - 1))
+                if isinstance(result, Exception) and any(
+                        word in str(result).lower() for word in ("connection", "timeout")):
+                    cooldown *= 2
+                bucket["cooldown_until"] = max(bucket["cooldown_until"], now + cooldown)
+            self._busy.discard(account)
+            self._save()
+            self._cond.notify_all()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_post_scheduler():
+    """PostScheduler shared by all upload workers of the process"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PostScheduler()
+        return _scheduler
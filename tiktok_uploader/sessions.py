@@ -0,0 +1,100 @@
+import os, threading
+import requests
+from requests.adapters import HTTPAdapter
+from fake_useragent import FakeUserAgentError, UserAgent
+from tiktok_uploader.cookies import load_cookies_from_file
+from tiktok_uploader.Config import Config
+
+
+class AccountSession:
+	"""Keep-alive `requests.Session` of a single TikTok account.
+
+	The session keeps its connection pools, its user agent and the cookies TikTok
+	sets along the way (msToken, ...) between uploads of the same account."""
+
+	def __init__(self, session_user, cookies, proxy=None, fallback_user_agent=None):
+		self.session_user = session_user
+		self.proxy = proxy
+		self.session_id = next((c["value"] for c in cookies if c["name"] == 'sessionid'), None)
+		self.dc_id = next((c["value"] for c in cookies if c["name"] == 'tt-target-idc'), None)
+
+		try:
+			self.user_agent = UserAgent().random
+		except FakeUserAgentError:
+			self.user_agent = fallback_user_agent
+			print("[-] Could not get random user agent, using default")
+
+		self.session = requests.Session()
+		# Parts are uploaded in parallel, size the pools so no connection is thrown away.
+		pool_size = max(10, Config.get().upload_workers + 2)
+		adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+		self.session.mount("https://", adapter)
+		self.session.mount("http://", adapter)
+		self.session.verify = True
+		if self.session_id:
+			self.session.cookies.set("sessionid", self.session_id, domain=".tiktok.com")
+		if self.dc_id:
+			self.session.cookies.set("tt-target-idc", self.dc_id, domain=".tiktok.com")
+		self.session.headers.update({
+			'User-Agent': self.user_agent,
+			'Accept': 'application/json, text/plain, */*',
+		})
+
+		# Setting proxy if provided.
+		if proxy:
+			self.session.proxies = {
+				"http": proxy,
+				"https": proxy
+			}
+
+	def close(self):
+		self.session.close()
+
+
+class SessionPool:
+	"""Account sessions keyed by `(session_user, proxy)`.
+
+	Cookie files are only unpickled again when they change on disk (e.g. after a
+	new login), in which case the account gets a fresh session."""
+
+	def __init__(self):
+		self._sessions = {}
+		self._cookie_mtimes = {}
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def _cookie_mtime(session_user):
+		path = os.path.join(os.getcwd(), Config.get().cookies_dir, f"tiktok_session-{session_user}.cookie")
+		try:
+			return os.path.getmtime(path)
+		except OSError:
+			return None
+
+	def get(self, session_user, proxy=None, fallback_user_agent=None):
+		key = (session_user, proxy or None)
+		mtime = self._cookie_mtime(session_user)
+		with self._lock:
+			account = self._sessions.get(key)
+			if account is not None and self._cookie_mtimes.get(key) == mtime:
+				return account
+			if account is not None:
+				account.close()
+			cookies = load_cookies_from_file(f"tiktok_session-{session_user}")
+			account = AccountSession(session_user, cookies, proxy, fallback_user_agent)
+			self._sessions[key] = account
+			self._cookie_mtimes[key] = mtime
+			return account
+
+	def close(self):
+		with self._lock:
+			for account in self._sessions.values():
+				account.close()
+			self._sessions = {}
+			self._cookie_mtimes = {}
+
+
+_pool = SessionPool()
+
+
+def get_session_pool():
+	return _pool
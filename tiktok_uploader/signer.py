@@ -0,0 +1,226 @@
+import atexit, itertools, json, os, queue, subprocess, threading
+from tiktok_uploader.bot_utils import subprocess_jsvmp
+from tiktok_uploader.Config import Config
+
+
+_SIGNATURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tiktok-signature")
+
+
+class SignerProcess:
+	"""Client for a resident `node tiktok-signature/worker.js` process.
+
+	The worker keeps its browser (and one page per user agent) open between
+	requests, so only the first signature for a user agent pays for a cold start.
+	Requests and responses are exchanged as JSON lines over stdin/stdout."""
+
+	def __init__(self, js_path=None, timeout=60):
+		self.js_path = js_path or os.path.join(_SIGNATURE_DIR, "worker.js")
+		self.timeout = timeout
+		self._ids = itertools.count(1)
+		self._lines = queue.Queue()
+		self._proc = subprocess.Popen(
+			["node", self.js_path],
+			stdin=subprocess.PIPE,
+			stdout=subprocess.PIPE,
+			text=True,
+			encoding="utf-8",
+			bufsize=1,
+		)
+		self._reader = threading.Thread(target=self._read_stdout, daemon=True)
+		self._reader.start()
+		ready = self._next_line(self.timeout)
+		if ready is None or ready.get("status") != "ready":
+			self.close()
+			raise RuntimeError("Signature worker did not start")
+
+	def _read_stdout(self):
+		for line in self._proc.stdout:
+			self._lines.put(line)
+		# EOF: the worker exited.
+		self._lines.put(None)
+
+	def _next_line(self, timeout):
+		try:
+			line = self._lines.get(timeout=timeout)
+		except queue.Empty:
+			return None
+		if line is None:
+			return None
+		try:
+			return json.loads(line)
+		except json.JSONDecodeError:
+			return {}
+
+	@property
+	def alive(self):
+		return self._proc.poll() is None
+
+	def sign(self, url, user_agent):
+		"""Sign `url` for `user_agent`.
+
+		Returns the raw JSON output (same format as browser.js), or None on failure."""
+		request_id = next(self._ids)
+		try:
+			self._proc.stdin.write(json.dumps({"id": request_id, "url": url, "user_agent": user_agent}) + "\n")
+			self._proc.stdin.flush()
+		except (BrokenPipeError, OSError):
+			return None
+
+		while True:
+			response = self._next_line(self.timeout)
+			if response is None:
+				# Timed out or the worker died, it cannot be trusted anymore.
+				self.close()
+				return None
+			if response.get("id") != request_id:
+				# Stale answer to a request that previously timed out.
+				continue
+			if response.get("status") != "ok":
+				print(f"[-] Signature worker error: {response.get('error')}")
+				return None
+			del response["id"]
+			return json.dumps(response)
+
+	def close(self):
+		if self._proc.poll() is None:
+			try:
+				self._proc.stdin.close()
+				self._proc.wait(timeout=10)
+			except (OSError, subprocess.TimeoutExpired):
+				self._proc.kill()
+
+
+class SubprocessSigner:
+	"""Starts a new `node tiktok-signature/browser.js` process for every signature."""
+
+	def __init__(self, js_path=None):
+		self.js_path = js_path or os.path.join(_SIGNATURE_DIR, "browser.js")
+
+	def sign(self, url, user_agent):
+		return subprocess_jsvmp(self.js_path, user_agent, url) or None
+
+	def close(self):
+		pass
+
+
+class StubSigner:
+	"""Offline signer returning fixed, well-formed signatures (for tests)."""
+
+	def __init__(self, x_bogus="DFSzswVLStub", signature="_02B4Z6wo00001stub"):
+		self.x_bogus = x_bogus
+		self.signature = signature
+		self.requests = []
+
+	def sign(self, url, user_agent):
+		self.requests.append((url, user_agent))
+		return json.dumps({
+			"status": "ok",
+			"data": {
+				"signature": self.signature,
+				"verify_fp": "verify_stub",
+				"signed_url": f"{url}&_signature={self.signature}&X-Bogus={self.x_bogus}",
+				"x-tt-params": "",
+				"x-bogus": self.x_bogus,
+				"navigator": {"user_agent": user_agent},
+			},
+		})
+
+	def close(self):
+		pass
+
+
+class SignerPool:
+	"""Pool of warm signers shared by all uploads of the process.
+
+	Signers are started lazily (or up front with `warm`) and borrowed for the
+	duration of a single `sign` call; a signer whose worker died is replaced."""
+
+	def __init__(self, size=2, factory=SignerProcess):
+		self.size = max(1, size)
+		self.factory = factory
+		self._idle = queue.Queue()
+		self._started = 0
+		self._lock = threading.Lock()
+		self._all = []
+
+	def _acquire(self):
+		while True:
+			try:
+				return self._idle.get_nowait()
+			except queue.Empty:
+				pass
+			with self._lock:
+				if self._started < self.size:
+					self._started += 1
+					try:
+						signer = self.factory()
+					except Exception:
+						self._started -= 1
+						raise
+					self._all.append(signer)
+					return signer
+			try:
+				return self._idle.get(timeout=1)
+			except queue.Empty:
+				# A busy signer may have died meanwhile, check again whether one can be started.
+				continue
+
+	def _release(self, signer):
+		if getattr(signer, "alive", True):
+			self._idle.put(signer)
+		else:
+			with self._lock:
+				self._started -= 1
+				self._all.remove(signer)
+
+	def warm(self):
+		"""Start every signer of the pool up front."""
+		signers = [self._acquire() for _ in range(self.size - self._idle.qsize())]
+		for signer in signers:
+			self._release(signer)
+
+	def sign(self, url, user_agent):
+		try:
+			signer = self._acquire()
+		except Exception as e:
+			print(f"[-] Could not start signature worker: {str(e)}")
+			return None
+		try:
+			return signer.sign(url, user_agent)
+		finally:
+			self._release(signer)
+
+	def close(self):
+		with self._lock:
+			for signer in self._all:
+				signer.close()
+			self._all = []
+			self._started = 0
+		self._idle = queue.Queue()
+
+
+_signer = None
+_signer_lock = threading.Lock()
+
+
+def get_signer():
+	"""Process-wide signer selected by the SIGNER_MODE option (pool, subprocess or stub)."""
+	global _signer
+	with _signer_lock:
+		if _signer is None:
+			mode = Config.get().signer_mode
+			if mode == "stub":
+				_signer = StubSigner()
+			elif mode == "subprocess":
+				_signer = SubprocessSigner()
+			else:
+				_signer = SignerPool(Config.get().signer_pool_size)
+			atexit.register(_signer.close)
+		return _signer
+
+
+def set_signer(signer):
+	"""Replace the process-wide signer, e.g. with a `StubSigner` in offline tests."""
+	global _signer
+	with _signer_lock:
+		_signer = signer
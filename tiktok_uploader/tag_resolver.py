@@ -0,0 +1,139 @@
+import json, os, re, threading, time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from tiktok_uploader.Config import Config
+
+
+_HEADERS = {
+	'authority': 'www.tiktok.com',
+	'accept': '*/*',
+	'accept-language': 'q=0.9,en-US;q=0.8,en;q=0.7,zh-CN;q=0.6,zh;q=0.5,vi;q=0.4',
+	'user-agent': "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+}
+
+
+class TagResolver:
+	"""
+	Resolves @mentions and #hashtags to TikTok ids, with a persistent TTL cache.
+
+	Lookups missing from the cache are made concurrently, @mentions through the
+	lightweight user detail API (the profile HTML page is only a fallback).
+	A failed lookup is not cached, so it is retried by the next upload.
+	"""
+
+	def __init__(self, path=None, ttl=None, workers=None):
+		self.path = path or Config.get().tag_cache_path
+		self.ttl = ttl or Config.get().tag_cache_ttl
+		self.workers = workers or Config.get().tag_lookup_workers
+		self._lock = threading.Lock()
+		try:
+			with open(self.path, "r") as f:
+				self._cache = json.load(f)
+		except (OSError, ValueError):
+			self._cache = {}
+
+	def _save(self):
+		tmp_path = self.path + ".tmp"
+		with open(tmp_path, "w") as f:
+			json.dump(self._cache, f)
+		os.replace(tmp_path, self.path)
+
+	def _resolve(self, kind, names, lookup, session):
+		"""{name: value} for `names`, calling lookup(name, session) concurrently for the cache misses"""
+		now = time.time()
+		results = {}
+		with self._lock:
+			for name in names:
+				entry = self._cache.get(f"{kind}:{name}")
+				if entry and entry["expires"] > now:
+					results[name] = entry["value"]
+		misses = list(dict.fromkeys(name for name in names if name not in results))
+		if not misses:
+			return results
+
+		with ThreadPoolExecutor(max_workers=min(self.workers, len(misses))) as executor:
+			values = list(executor.map(lambda name: lookup(name, session), misses))
+		with self._lock:
+			for name, value in zip(misses, values):
+				results[name] = value
+				if value is not None:
+					self._cache[f"{kind}:{name}"] = {"value": value, "expires": now + self.ttl}
+			self._save()
+		return results
+
+	def user_ids(self, usernames, session):
+		"""{username: user id}, None for the users that could not be looked up"""
+		return self._resolve("user", usernames, _lookup_user_id, session)
+
+	def hashtags(self, tags, session):
+		"""{tag: verified hashtag name}, None if the suggestion request failed"""
+		return self._resolve("tag", tags, _lookup_hashtag, session)
+
+	def users(self, keywords, session):
+		"""{keyword: [unique id, uid]} from the user search, None if the request failed"""
+		return self._resolve("search", keywords, _search_user, session)
+
+
+def _lookup_user_id(username, session):
+	url = "https://www.tiktok.com/api/user/detail/"
+	try:
+		r = session.get(url, params={"uniqueId": username, "aid": 1988}, headers=_HEADERS, timeout=15)
+		if r.status_code == 200:
+			user_id = r.json().get("userInfo", {}).get("user", {}).get("id")
+			if user_id:
+				return user_id
+	except Exception as e:
+		print(f"[-] User detail lookup of @{username} failed: {str(e)}")
+
+	# Fall back to the profile page
+	try:
+		r = session.get("https://www.tiktok.com/@" + username, headers=_HEADERS, timeout=30)
+		match = re.search(r'webapp\.user-detail":\{"userInfo":\{"user":\{"id":"(\d+)"', r.text)
+		if match:
+			return match.group(1)
+	except Exception as e:
+		print(f"[-] Profile lookup of @{username} failed: {str(e)}")
+	return None
+
+
+def _lookup_hashtag(tag, session):
+	url = "https://www.tiktok.com/api/upload/challenge/sug/"
+	try:
+		r = session.get(url, params={"keyword": tag})
+	except requests.RequestException as e:
+		print(f"[-] Hashtag lookup of #{tag} failed: {str(e)}")
+		return None
+	if r.status_code != 200:
+		return None
+	try:
+		return r.json()["sug_list"][0]["cha_name"]
+	except (ValueError, KeyError, IndexError, TypeError):
+		return tag
+
+
+def _search_user(keyword, session):
+	url = "https://us.tiktok.com/api/upload/search/user/"
+	try:
+		r = session.get(url, params={"keyword": keyword})
+	except requests.RequestException as e:
+		print(f"[-] User search of {keyword} failed: {str(e)}")
+		return None
+	if r.status_code != 200:
+		return None
+	try:
+		user_info = r.json()["user_list"][0]["user_info"]
+		return [user_info["unique_id"], user_info["uid"]]
+	except (ValueError, KeyError, IndexError, TypeError):
+		return [keyword, ""]
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_tag_resolver():
+	global _resolver
+	with _resolver_lock:
+		if _resolver is None:
+			_resolver = TagResolver()
+		return _resolver
@@ -0,0 +1,116 @@
+from .Config import Config
+from .compositor import premultiply
+from moviepy import ImageClip, TextClip
+from PIL import Image
+import hashlib
+import json
+import numpy as np
+import os
+import threading
+import uuid
+
+# Sprites kept in memory per process
+_MAX_MEMORY_SPRITES = 256
+
+
+class TextSprite:
+    """Rasterised text: an RGBA image rendered once and composited as a static image"""
+
+    def __init__(self, rgba):
+        self.rgba = rgba
+        self._premultiplied = None
+
+    @property
+    def size(self):
+        return self.rgba.shape[1], self.rgba.shape[0]
+
+    @property
+    def premultiplied(self):
+        """(colour * alpha, 1 - alpha) as float32, ready to be blended onto a frame"""
+        if self._premultiplied is None:
+            self._premultiplied = premultiply(self.rgba)
+        return self._premultiplied
+
+    def clip(self, duration):
+        """Static moviepy clip of the sprite, its alpha channel becomes the mask"""
+        return ImageClip(self.rgba, transparent=True).with_duration(duration)
+
+
+class TextSpriteCache:
+    """
+    Cache of rendered text, keyed by the text and every TextClip option (font, size,
+    colours, stroke, width...). Sprites are kept in memory and as PNG files on disk,
+    so a batch of videos sharing the same captions only pays font layout once.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = Config.get().text_sprite_dir if directory is None else directory
+        if self.directory:
+            # The cache is shared by the process, it must not follow later changes of working directory
+            self.directory = os.path.abspath(self.directory)
+            os.makedirs(self.directory, exist_ok=True)
+        self._sprites = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(options):
+        options = dict(options)
+        font = options.get("font")
+        if font and os.path.isfile(font):
+            # A replaced font file gives new sprites
+            stat = os.stat(font)
+            options["font"] = [os.path.abspath(font), stat.st_size, stat.st_mtime_ns]
+        payload = json.dumps(options, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def render(options):
+        """Rasterise TextClip(**options) into an RGBA array"""
+        text_clip = TextClip(**options)
+        rgb = text_clip.get_frame(0)
+        if text_clip.mask is not None:
+            alpha = (text_clip.mask.get_frame(0) * 255).round().astype(np.uint8)
+        else:
+            alpha = np.full(rgb.shape[:2], 255, dtype=np.uint8)
+        text_clip.close()
+        return np.dstack([rgb.astype(np.uint8), alpha])
+
+    def get(self, **options):
+        """TextSprite of TextClip(**options), rendered only on the first request"""
+        key = self.key(options)
+        with self._lock:
+            sprite = self._sprites.get(key)
+        if sprite is not None:
+            return sprite
+
+        path = os.path.join(self.directory, f"{key}.png") if self.directory else None
+        if path and os.path.exists(path):
+            with Image.open(path) as image:
+                rgba = np.array(image.convert("RGBA"))
+        else:
+            rgba = self.render(options)
+            if path:
+                # Written under a temporary name so parallel renders never read a partial file
+                tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+                Image.fromarray(rgba).save(tmp_path, format="PNG")
+                os.replace(tmp_path, path)
+
+        sprite = TextSprite(rgba)
+        with self._lock:
+            if len(self._sprites) >= _MAX_MEMORY_SPRITES:
+                self._sprites.pop(next(iter(self._sprites)))
+            self._sprites[key] = sprite
+        return sprite
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_text_sprite_cache():
+    """TextSpriteCache shared by the editors of the process"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TextSpriteCache()
+        return _cache
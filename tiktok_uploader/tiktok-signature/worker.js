@@ -0,0 +1,93 @@
+// Worker.js
+// Long-lived signer used by tiktok_uploader/signer.py.
+// Reads one JSON request per line on stdin: {"id": 1, "url": "...", "user_agent": "..."}
+// and writes one JSON response per line on stdout, in the same format as browser.js.
+const readline = require("readline");
+const { chromium } = require("playwright-chromium");
+const Signer = require("./index");
+
+// Maximum number of user agents kept warm at the same time.
+const MAX_SIGNERS = 8;
+
+let browser = null;
+// One initialised signer (browser context + page) per user agent.
+const signers = {};
+
+async function getSigner(url, userAgent) {
+  if (!browser) {
+    browser = await chromium.launch(new Signer(null, userAgent).options);
+  }
+  if (!signers[userAgent]) {
+    const cached = Object.keys(signers);
+    if (cached.length >= MAX_SIGNERS) {
+      // Evict the oldest user agent.
+      const oldest = signers[cached[0]];
+      delete signers[cached[0]];
+      await oldest.context.close();
+    }
+    const signer = new Signer(url, userAgent, browser);
+    await signer.init();
+    signers[userAgent] = signer;
+  }
+  return signers[userAgent];
+}
+
+async function handle(request) {
+  try {
+    const signer = await getSigner(request.url, request.user_agent);
+    const sign = await signer.sign(request.url);
+    const navigator = await signer.navigator();
+    return {
+      id: request.id,
+      status: "ok",
+      data: {
+        ...sign,
+        navigator: navigator,
+      },
+    };
+  } catch (err) {
+    // Drop the signer so the next request starts from a fresh page.
+    if (signers[request.user_agent]) {
+      signers[request.user_agent].context.close().catch(() => {});
+      delete signers[request.user_agent];
+    }
+    return { id: request.id, status: "error", error: String(err) };
+  }
+}
+
+async function shutdown() {
+  for (const userAgent of Object.keys(signers)) {
+    await signers[userAgent].context.close();
+  }
+  if (browser) {
+    await browser.close();
+  }
+  process.exit(0);
+}
+
+const rl = readline.createInterface({ input: process.stdin });
+// Requests are signed one at a time, in the order they arrive.
+let queue = Promise.resolve();
+
+rl.on("line", (line) => {
+  if (!line.trim()) {
+    return;
+  }
+  queue = queue.then(async () => {
+    let request;
+    try {
+      request = JSON.parse(line);
+    } catch (err) {
+      process.stdout.write(JSON.stringify({ status: "error", error: "Invalid JSON request" }) + "\n");
+      return;
+    }
+    const response = await handle(request);
+    process.stdout.write(JSON.stringify(response) + "\n");
+  });
+});
+
+rl.on("close", () => {
+  queue.then(shutdown);
+});
+
+process.stdout.write(JSON.stringify({ status: "ready" }) + "\n");
@@ -5,6 +5,11 @@ from requests_auth_aws_sigv4 import AWSSigV4
 from tiktok_uploader.cookies import load_cookies_from_file
 from tiktok_uploader.Browser import Browser
 from tiktok_uploader.bot_utils import *
+from tiktok_uploader.multipart import VideoParts, upload_parts
+from tiktok_uploader.ledger import UploadLedger
+from tiktok_uploader.signer import get_signer
+from tiktok_uploader.sessions import get_session_pool
+from tiktok_uploader.scheduler import parse_throttle
 from tiktok_uploader import Config, Video, eprint
 from dotenv import load_dotenv
 
@@ -47,26 +52,88 @@ def login(login_name: str):
 
 # Local Code...
 def upload_video(session_user, video, title, schedule_time=0, allow_comment=1, allow_duet=0, allow_stitch=0, visibility_type=0, brand_organic_type=0, branded_content_type=0, ai_label=0, proxy=None):
-	try:
-		user_agent = UserAgent().random
-	except FakeUserAgentError as e:
-		user_agent = _UA
-		print("[-] Could not get random user agent, using default")
-
-	cookies = load_cookies_from_file(f"tiktok_session-{session_user}")
-	session_id = next((c["value"] for c in cookies if c["name"] == 'sessionid'), None)
-	dc_id = next((c["value"] for c in cookies if c["name"] == 'tt-target-idc'), None)
-	
-	if not session_id:
+	account = get_account(session_user, proxy)
+
+	print("Uploading video...")
+	if not check_post_params(title, schedule_time, visibility_type):
+		return False
+
+	media = upload_media(account, session_user, video)
+	if not media:
+		return False
+	return publish(account, media, title, schedule_time)
+
+
+def upload_videos_batch(session_user, videos, schedule_time=0, visibility_type=0, proxy=None):
+	"""
+	Upload the media of several videos of one account into a single project, then publish
+	them all with one signed project/post request (see build_batch_post_data).
+	If TikTok refuses the batch, every video is published on its own, each with a new
+	project; a throttled batch ("posting too fast") is returned as is, single posts
+	would be throttled too.
+	:param videos: list of (video file name, title)
+	:return: one upload_video-like result per video, None meaning published
+	"""
+	account = get_account(session_user, proxy)
+	results = [False] * len(videos)
+	project = create_project(account.session)
+	if project is None:
+		return results
+
+	items = []
+	for index, (video, title) in enumerate(videos):
+		print(f"Uploading video {index + 1}/{len(videos)} of the batch...")
+		if not check_post_params(title, schedule_time, visibility_type):
+			continue
+		media = upload_media(account, session_user, video, project=project)
+		if media:
+			items.append((index, media, title))
+
+	refused = False
+	if len(items) > 1:
+		print(f"Publishing {len(items)} videos with one post request...")
+		result = publish_batch(account, project[0], [(media, title) for _, media, title in items], schedule_time)
+		if result is None or (isinstance(result, str) and parse_throttle(result) is not None):
+			for index, _, _ in items:
+				results[index] = result
+			return results
+		print("[-] Batch publish refused, publishing the videos one by one...")
+		refused = True
+
+	for position, (index, media, title) in enumerate(items):
+		if refused:
+			# The refused batch may have used up its project, post each video from a new one
+			single_project = create_project(account.session)
+			if single_project is None:
+				continue
+			media["creation_id"], media["project_id"] = single_project
+			media["ledger"].update(creation_id=media["creation_id"], project_id=media["project_id"], batch=False)
+		results[index] = publish(account, media, title, schedule_time)
+		if isinstance(results[index], str) and parse_throttle(results[index]) is not None:
+			# Posting the others would be throttled as well, their media stays in the ledger
+			for later_index, _, _ in items[position + 1:]:
+				results[later_index] = results[index]
+			break
+	return results
+
+
+def get_account(session_user, proxy=None):
+	"""Pooled keep-alive session of this account, reused across uploads."""
+	account = get_session_pool().get(session_user, proxy, fallback_user_agent=_UA)
+
+	if not account.session_id:
 		eprint("No cookie with Tiktok session id found: use login to save session id")
 		sys.exit(1)
-	if not dc_id:
+	if not account.dc_id:
 		print("[WARNING]: Please login, tiktok datacenter id must be allocated, or may fail")
-		dc_id = "useast2a"
+		account.dc_id = "useast2a"
+		account.session.cookies.set("tt-target-idc", account.dc_id, domain=".tiktok.com")
 	print("User successfully logged in.")
-	print(f"Tiktok Datacenter Assigned: {dc_id}")
-	
-	print("Uploading video...")
+	print(f"Tiktok Datacenter Assigned: {account.dc_id}")
+	return account
+
+
+def check_post_params(title, schedule_time=0, visibility_type=0):
 	# Parameter validation,
 	if schedule_time and (schedule_time > 864000 or schedule_time < 900):
 		print("[-] Cannot schedule video in more than 10 days or less than 20 minutes")
@@ -79,87 +146,70 @@ def upload_video(session_user, video, title, schedule_time=0, allow_comment=1, a
 		return False
 
 	# Check video length - 1 minute max, takes too long to run this.
+	return True
 
 
-	# Creating Session
-	session = requests.Session()
-	session.cookies.set("sessionid", session_id, domain=".tiktok.com")
-	session.cookies.set("tt-target-idc", dc_id, domain=".tiktok.com")
-	session.verify = True
-
-	headers = {
-		'User-Agent': user_agent,
-		'Accept': 'application/json, text/plain, */*',
-	}
-	session.headers.update(headers)
-
-	# Setting proxy if provided.
-	if proxy:
-		session.proxies = {
-			"http": proxy,
-			"https": proxy
-		}
-
+def create_project(session):
+	"""
+	Create an upload project
+	:return: (creation_id, project_id) or None
+	"""
 	creation_id = generate_random_string(21, True)
 	project_url = f"https://www.tiktok.com/api/v1/web/project/create/?creation_id={creation_id}&type=1&aid=1988"
 	r = session.post(project_url)
 
 	if not assert_success(project_url, r):
-		return False
+		return None
 
 	# get project_id
-	project_id = r.json()["project"]["project_id"]
-	video_id, session_key, upload_id, crcs, upload_host, store_uri, video_auth, aws_auth = upload_to_tiktok(video, session)
-
-	url = f"https://{upload_host}/{store_uri}?uploadID={upload_id}&phase=finish&uploadmode=part"
-	headers = {
-		"Authorization": video_auth,
-		"Content-Type": "text/plain;charset=UTF-8",
-	}
-	data = ",".join([f"{i + 1}:{crcs[i]}" for i in range(len(crcs))])
-
-	if proxy:
-		r = requests.post(url, headers=headers, data=data, proxies=session.proxies)
-		if not assert_success(url, r):
-			return False
+	return creation_id, r.json()["project"]["project_id"]
+
+
+def upload_media(account, session_user, video, project=None):
+	"""
+	Upload the media of `video`, resuming from the ledger
+	:param project: (creation_id, project_id) shared by the videos of a batch, a project of
+	                its own is created (or resumed from the ledger) when None
+	:return: {"video", "creation_id", "project_id", "video_id", "ledger"} or False
+	"""
+	session = account.session
+
+	# Ledger of a previous, interrupted attempt at uploading this video with this account.
+	ledger = UploadLedger.for_video(os.path.join(os.getcwd(), Config.get().videos_dir, video), session_user)
+
+	if project is not None:
+		creation_id, project_id = project
+		if ledger.get("project_id") != project_id:
+			ledger.update(creation_id=creation_id, project_id=project_id, batch=True)
+	elif ledger.get("project_id") and not ledger.get("batch"):
+		creation_id = ledger.get("creation_id")
+		project_id = ledger.get("project_id")
 	else:
-		r = requests.post(url, headers=headers, data=data)
-		if not assert_success(url, r):
+		# The project of an unpublished batch is not reused for a single post
+		project = create_project(session)
+		if project is None:
 			return False
-	#
-	# url = f"https://www.tiktok.com/top/v1?Action=CommitUploadInner&Version=2020-11-19&SpaceName=tiktok"
-	# data = '{"SessionKey":"' + session_key + '","Functions":[{"name":"GetMeta"}]}'
-
-	# ApplyUploadInner
-	url = f"https://www.tiktok.com/top/v1?Action=CommitUploadInner&Version=2020-11-19&SpaceName=tiktok"
-	data = '{"SessionKey":"' + session_key + '","Functions":[{"name":"GetMeta"}]}'
+		creation_id, project_id = project
+		ledger.update(creation_id=creation_id, project_id=project_id, batch=False)
 
-	r = session.post(url, auth=aws_auth, data=data)
-	if not assert_success(url, r):
-		return False
-
-	# publish video
-	url = "https://www.tiktok.com"
-	headers = {
-		"user-agent": user_agent
-	}
-
-	r = session.head(url, headers=headers)
-	if not assert_success(url, r):
-		return False
-
-	headers = {
-		"content-type": "application/json",
-		"user-agent": user_agent
-	}
-	brand = ""
+	if ledger.get("committed"):
+		# Media was fully uploaded and committed by a previous attempt, only publishing is left.
+		print("Video already uploaded, publishing from ledger...")
+		video_id = ledger.get("video_id")
+	else:
+		upload_result = upload_to_tiktok(video, session, ledger)
+		if not upload_result:
+			return False
+		video_id, session_key, upload_id, crcs, upload_host, store_uri, video_auth, aws_auth = upload_result
 
-	if brand and brand[-1] == ",":
-		brand = brand[:-1]
-	markup_text, text_extra = convert_tags(title, session)
+		if not finish_upload(session, ledger, upload_host, store_uri, upload_id, video_auth, crcs, session_key, aws_auth):
+			return False
 
+	return {"video": video, "creation_id": creation_id, "project_id": project_id, "video_id": video_id, "ledger": ledger}
 
 
+def build_post_data(media, title, text_extra, schedule_time=0):
+	"""project/post payload publishing the uploaded `media` (see upload_media)"""
 	# Added for showing history of data changes...
 
 	# When uploading fails please check data payload is correct...
@@ -241,7 +291,7 @@ def upload_video(session_user, video, title, schedule_time=0, allow_comment=1, a
 
 	data = {
 		"post_common_info": {
-			"creation_id": creation_id,
+			"creation_id": media["creation_id"],
 			"enter_post_page_from": 1,
 			"post_type": 3
 		},
@@ -255,7 +305,7 @@ def upload_video(session_user, video, title, schedule_time=0, allow_comment=1, a
 				"anchors": [],
 				"vedit_common_info": {
 					"draft": "",
-					"video_id": video_id
+					"video_id": media["video_id"]
 				},
 				"privacy_setting_info": {
 					"visibility_type": 0,
@@ -268,7 +318,7 @@ def upload_video(session_user, video, title, schedule_time=0, allow_comment=1, a
 		"single_post_req_list": [
 			{
 				"batch_index": 0,
-				"video_id": video_id,
+				"video_id": media["video_id"],
 				"is_long_video": 0,
 				"single_post_feature_info": {
 					"text": title,
@@ -280,20 +330,92 @@ def upload_video(session_user, video, title, schedule_time=0, allow_comment=1, a
 			}
 		]
 	}
-
-
 	# Add schedule_time to the payload if it's provided
 	if schedule_time > 0:
 		data["feature_common_info_list"][0]["schedule_time"] = schedule_time + int(time.time())
-	
+	return data
+
+
+def build_batch_post_data(creation_id, items, schedule_time=0):
+	"""
+	project/post payload publishing several videos uploaded into the project `creation_id`:
+	one feature_common_info_list and one single_post_req_list entry per video, with increasing batch_index
+	:param items: list of (media, title, text_extra)
+	"""
+	posts = [build_post_data(media, title, text_extra, schedule_time) for media, title, text_extra in items]
+	data = posts[0]
+	data["post_common_info"]["creation_id"] = creation_id
+	data["feature_common_info_list"] = [post["feature_common_info_list"][0] for post in posts]
+	data["single_post_req_list"] = [post["single_post_req_list"][0] for post in posts]
+	for batch_index, single_post in enumerate(data["single_post_req_list"]):
+		single_post["batch_index"] = batch_index
+	return data
+
+
+def publish(account, media, title, schedule_time=0):
+	"""
+	Publish uploaded media with a signed project/post request
+	:param media: result of upload_media
+	:return: None if published, TikTok's status message (or False) otherwise
+	"""
+	markup_text, text_extra = convert_tags(title, account.session)
+	result = post_project(account, build_post_data(media, title, text_extra, schedule_time), schedule_time)
+	if result is None:
+		media["ledger"].discard()
+	return result
+
+
+def publish_batch(account, creation_id, items, schedule_time=0):
+	"""
+	Publish several videos of the project `creation_id` with one signed project/post request
+	:param items: list of (media, title), media uploaded with upload_media(..., project=...)
+	:return: None if published, TikTok's status message (or False) otherwise
+	"""
+	tagged = []
+	for media, title in items:
+		markup_text, text_extra = convert_tags(title, account.session)
+		tagged.append((media, title, text_extra))
+	result = post_project(account, build_batch_post_data(creation_id, tagged, schedule_time), schedule_time)
+	if result is None:
+		for media, _ in items:
+			media["ledger"].discard()
+	return result
+
+
+def post_project(account, data, schedule_time=0):
+	"""
+	Send a project/post payload, signed by the signer pool
+	:return: None if published, TikTok's status message, "HTTP <code>" or False otherwise
+	"""
+	session = account.session
+	user_agent = account.user_agent
+
+	# publish video
+	url = "https://www.tiktok.com"
+	headers = {
+		"user-agent": user_agent
+	}
+
+	r = session.head(url, headers=headers)
+	if not assert_success(url, r):
+		return False
+
+	headers = {
+		"content-type": "application/json",
+		"user-agent": user_agent
+	}
+	brand = ""
+
+	if brand and brand[-1] == ",":
+		brand = brand[:-1]
+
 	uploaded = False
 	while True:
 		mstoken = session.cookies.get("msToken")
 		# xbogus = subprocess_jsvmp(os.path.join(os.getcwd(), "tiktok_uploader", "./x-bogus.js"), user_agent, f"app_name=tiktok_web&channel=tiktok_web&device_platform=web&aid=1988&msToken={mstoken}")
 		# /tiktok/web/project/post/v1/
-		js_path = os.path.join(os.getcwd(), "tiktok_uploader", "tiktok-signature", "browser.js")
 		sig_url = f"https://www.tiktok.com/api/v1/web/project/post/?app_name=tiktok_web&channel=tiktok_web&device_platform=web&aid=1988&msToken={mstoken}"
-		signatures = subprocess_jsvmp(js_path, user_agent, sig_url)
+		signatures = get_signer().sign(sig_url, user_agent)
 		if signatures is None:
 			print("[-] Failed to generate signatures")
 			return False
@@ -321,7 +443,8 @@ def upload_video(session_user, video, title, schedule_time=0, allow_comment=1, a
 		if not assertSuccess(url, r):
 			print("[-] Published failed, try later again")
 			printError(url, r)
-			return False
+			# Surfaced to the caller so throttling (HTTP 429) can be backed off
+			return f"HTTP {r.status_code}"
 
 		if r.json()["status_code"] == 0:
 			print(f"Published successfully {'| Scheduled for ' + str(schedule_time) if schedule_time else ''}")
@@ -330,7 +453,8 @@ def upload_video(session_user, video, title, schedule_time=0, allow_comment=1, a
 		else:
 			print("[-] Publish failed to Tiktok, trying again...")
 			printError(url, r)
-			return False
+			# e.g. "You are posting too fast. Take a rest.", parsed by the post scheduler
+			return r.json().get("status_msg") or False
 		#
 		# try:
 		# 	if r.json()["status_msg"] == "You are posting too fast. Take a rest.":
@@ -365,60 +489,104 @@ def upload_video(session_user, video, title, schedule_time=0, allow_comment=1, a
 	# 		print("Response ", j)
 
 
-def upload_to_tiktok(video_file, session):
-	url = "https://www.tiktok.com/api/v1/video/upload/auth/?aid=1988"
-	r = session.get(url)
+def finish_upload(session, ledger, upload_host, store_uri, upload_id, video_auth, crcs, session_key, aws_auth):
+	url = f"https://{upload_host}/{store_uri}?uploadID={upload_id}&phase=finish&uploadmode=part"
+	headers = {
+		"Authorization": video_auth,
+		"Content-Type": "text/plain;charset=UTF-8",
+	}
+	data = ",".join([f"{i + 1}:{crcs[i]}" for i in range(len(crcs))])
+
+	# Sent on the account session so the connection to the upload host is reused.
+	r = session.post(url, headers=headers, data=data)
 	if not assert_success(url, r):
+		# The upload node rejected the parts (or its credentials expired), the next attempt starts over.
+		ledger.discard()
 		return False
+	#
+	# url = f"https://www.tiktok.com/top/v1?Action=CommitUploadInner&Version=2020-11-19&SpaceName=tiktok"
+	# data = '{"SessionKey":"' + session_key + '","Functions":[{"name":"GetMeta"}]}'
 
-	aws_auth = AWSSigV4(
-		"vod",
-		region="ap-singapore-1",
-		aws_access_key_id=r.json()["video_token_v5"]["access_key_id"],
-		aws_secret_access_key=r.json()["video_token_v5"]["secret_acess_key"],
-		aws_session_token=r.json()["video_token_v5"]["session_token"],
-	)
-	with open(os.path.join(os.getcwd(), Config.get().videos_dir, video_file), "rb") as f:
-		video_content = f.read()
-	file_size = len(video_content)
-	url = f"https://www.tiktok.com/top/v1?Action=ApplyUploadInner&Version=2020-11-19&SpaceName=tiktok&FileType=video&IsInner=1&FileSize={file_size}&s=g158iqx8434"
+	# ApplyUploadInner
+	url = f"https://www.tiktok.com/top/v1?Action=CommitUploadInner&Version=2020-11-19&SpaceName=tiktok"
+	data = '{"SessionKey":"' + session_key + '","Functions":[{"name":"GetMeta"}]}'
 
-	r = session.get(url, auth=aws_auth)
+	r = session.post(url, auth=aws_auth, data=data)
 	if not assert_success(url, r):
+		ledger.discard()
 		return False
 
-	# upload chunks
-	upload_node = r.json()["Result"]["InnerUploadAddress"]["UploadNodes"][0]
-	video_id = upload_node["Vid"]
-	store_uri = upload_node["StoreInfos"][0]["StoreUri"]
-	video_auth = upload_node["StoreInfos"][0]["Auth"]
-	upload_host = upload_node["UploadHost"]
-	session_key = upload_node["SessionKey"]
-	chunk_size = 5242880
-	chunks = []
-	i = 0
-	while i < file_size:
-		chunks.append(video_content[i: i + chunk_size])
-		i += chunk_size
-	crcs = []
-	upload_id = str(uuid.uuid4())
-	for i in range(len(chunks)):
-		chunk = chunks[i]
-		crc = crc32(chunk)
-		crcs.append(crc)
-		url = f"https://{upload_host}/{store_uri}?partNumber={i + 1}&uploadID={upload_id}&phase=transfer"
-		headers = {
-			"Authorization": video_auth,
-			"Content-Type": "application/octet-stream",
-			"Content-Disposition": 'attachment; filename="undefined"',
-			"Content-Crc32": crc,
-		}
+	ledger.update(committed=True)
+	return True
+
 
-		r = session.post(url, headers=headers, data=chunk)
+def upload_to_tiktok(video_file, session, ledger=None):
+	video_path = os.path.join(os.getcwd(), Config.get().videos_dir, video_file)
+	file_size = os.path.getsize(video_path)
+
+	if ledger is not None and ledger.has_upload:
+		# Resume: the upload node and its credentials are already known.
+		print("Resuming previous upload from ledger...")
+		aws_token = ledger.get("aws_token")
+		video_id = ledger.get("video_id")
+		store_uri = ledger.get("store_uri")
+		video_auth = ledger.get("video_auth")
+		upload_host = ledger.get("upload_host")
+		session_key = ledger.get("session_key")
+		upload_id = ledger.get("upload_id")
+	else:
+		url = "https://www.tiktok.com/api/v1/video/upload/auth/?aid=1988"
+		r = session.get(url)
+		if not assert_success(url, r):
+			return False
+		aws_token = r.json()["video_token_v5"]
+
+		url = f"https://www.tiktok.com/top/v1?Action=ApplyUploadInner&Version=2020-11-19&SpaceName=tiktok&FileType=video&IsInner=1&FileSize={file_size}&s=g158iqx8434"
+		r = session.get(url, auth=aws_auth_from_token(aws_token))
+		if not assert_success(url, r):
+			return False
+
+		# upload chunks
+		upload_node = r.json()["Result"]["InnerUploadAddress"]["UploadNodes"][0]
+		video_id = upload_node["Vid"]
+		store_uri = upload_node["StoreInfos"][0]["StoreUri"]
+		video_auth = upload_node["StoreInfos"][0]["Auth"]
+		upload_host = upload_node["UploadHost"]
+		session_key = upload_node["SessionKey"]
+		upload_id = str(uuid.uuid4())
+		if ledger is not None:
+			ledger.update(
+				aws_token=aws_token, video_id=video_id, store_uri=store_uri, video_auth=video_auth,
+				upload_host=upload_host, session_key=session_key, upload_id=upload_id, parts={},
+			)
+
+	aws_auth = aws_auth_from_token(aws_token)
+	# Parts are read lazily from a memory map, so only the parts in flight are held in memory.
+	with VideoParts(video_path) as parts:
+		crcs = upload_parts(
+			session, parts, upload_host, store_uri, upload_id, video_auth,
+			workers=Config.get().upload_workers,
+			retries=Config.get().upload_part_retries,
+			completed=ledger.parts if ledger is not None else None,
+			on_part=ledger.add_part if ledger is not None else None,
+		)
+	if crcs is None:
+		print("[-] Failed to upload video parts")
+		return False
 
 	return video_id, session_key, upload_id, crcs, upload_host, store_uri, video_auth, aws_auth
 
 
+def aws_auth_from_token(aws_token):
+	return AWSSigV4(
+		"vod",
+		region="ap-singapore-1",
+		aws_access_key_id=aws_token["access_key_id"],
+		aws_secret_access_key=aws_token["secret_acess_key"],
+		aws_session_token=aws_token["session_token"],
+	)
+
+
 
 
 if __name__ == "__main__":